@@ -26,116 +26,88 @@ except ImportError as e:
 
 # Try to import Claude API
 try:
-    from anthropic import Anthropic
+    import anthropic  # noqa: F401 - calls go through the shared client in async_runtime
     from knot import Knot
     CLAUDE_AVAILABLE = True
 except ImportError as e:
     CLAUDE_AVAILABLE = False
     print(f"Warning: Claude API not available: {e}. AI matching will use fallback logic.")
 
-from tools import find_available_hosts # Import your mock database tool
+from tools import find_available_hosts, parse_stay, listings_version, add_listing_listener, get_listing_by_id # Import your mock database tool
+from matcher import rank_for_stay, rank_many_for_stays
+from cache import SingleFlight, TTLCache
+from async_runtime import get_dedalus_client, create_message
 
 # Ensure DEDALUS_API_KEY is set in your environment or .env file
 load_dotenv() # Load environment variables from .env file
 
+# Ranked matches for repeated (query, dates) pairs; keys include the listings version,
+# so any listing write makes older entries unreachable
+match_cache = TTLCache(
+    maxsize=int(os.getenv("ROOMIE_MATCH_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("ROOMIE_MATCH_CACHE_TTL", "300"))
+)
+# Free the stale entries right away when a listing changes in this process
+add_listing_listener(lambda event: match_cache.clear())
+# Identical match requests arriving while the agent is still working share its answer
+match_flights = SingleFlight()
+
+# Batch matching: visitors packed into each Claude call, and how many of its
+# TF-IDF candidates each visitor brings to it
+BATCH_VISITORS_PER_CALL = int(os.getenv("ROOMIE_BATCH_VISITORS_PER_CALL", "8"))
+BATCH_CANDIDATES_PER_VISITOR = int(os.getenv("ROOMIE_BATCH_CANDIDATES", "5"))
+# Output tokens allowed per candidate Claude ranks, and the model's output limit
+# (4096 for the default claude-3-haiku); batches are cut so a reply fits under it
+BATCH_TOKENS_PER_CANDIDATE = 100
+MAX_OUTPUT_TOKENS = int(os.getenv("ROOMIE_MAX_OUTPUT_TOKENS", "4096"))
+
+# TF-IDF answers given because the agent call failed are only cached for this many
+# seconds, so one transient error isn't served for the full match_cache TTL
+FALLBACK_CACHE_TTL = float(os.getenv("ROOMIE_MATCH_FALLBACK_TTL", "15"))
+
+class FailedAgentResult(str):
+    """The run_matching_agent JSON string, when it is the TF-IDF stand-in for a failed agent call."""
+
+def normalize_query(visitor_query: str) -> str:
+    """Lowercase words only, so trivially different phrasings share a cache entry."""
+    return " ".join(re.findall(r"[a-z0-9']+", (visitor_query or "").lower()))
+
+def match_cache_key(visitor_query: str, date_needed: str, method: str = "agent") -> tuple:
+    """`method` keeps rankings produced different ways (agent, batched Claude, TF-IDF only) apart."""
+    return (method, normalize_query(visitor_query), tuple(parse_stay(date_needed)), listings_version())
+
+async def run_matching_agent_cached(visitor_query: str, date_needed: str) -> str:
+    """
+    run_matching_agent, answered from match_cache when the same request was seen
+    recently, and shared with any identical request still waiting on the agent.
+    """
+    # The listings version check may reload listings: off the event loop
+    key = await asyncio.to_thread(match_cache_key, visitor_query, date_needed)
+    result = match_cache.get(key)
+    if result is None:
+        result = await match_flights.do(key, lambda: _run_matching_agent_and_cache(key, visitor_query, date_needed))
+    return result
+
+async def _run_matching_agent_and_cache(key: tuple, visitor_query: str, date_needed: str) -> str:
+    result = await run_matching_agent(visitor_query, date_needed)
+    match_cache.set(key, result, ttl=FALLBACK_CACHE_TTL if isinstance(result, FailedAgentResult) else None)
+    return result
+
+def fallback_matching(visitor_query: str, date_needed: str, default_reasoning: str) -> str:
+    """
+    Rank the hosts available on date_needed with the TF-IDF matcher (no LLM needed).
+    Returns the same {"ranked_matches": [...]} JSON string as the agent.
+    """
+    nights = parse_stay(date_needed)
+    return json.dumps({"ranked_matches": rank_for_stay(visitor_query, nights, default_reasoning=default_reasoning)})
+
 async def run_matching_agent(visitor_query: str, date_needed: str) -> str:
     """
     Runs the Dedalus AI agent to find and rank the most compatible host.
     Falls back to simple matching if dedalus_labs is not available.
     """
     if not DEDALUS_AVAILABLE:
-        # Fallback: improved matching with conflict detection
-        import json
-        hosts_json = find_available_hosts(visitor_date_range=date_needed)
-        hosts = json.loads(hosts_json) if isinstance(hosts_json, str) else hosts_json
-        
-        # Define keyword opposites/conflicts
-        opposites = {
-            'quiet': ['loud', 'noisy', 'party', 'social', 'night owl', 'late night'],
-            'loud': ['quiet', 'silent', 'peaceful', 'calm', 'early', 'early bedtime'],
-            'early': ['late', 'night owl', 'late night', 'night'],
-            'late': ['early', 'early riser', 'early bedtime', 'morning'],
-            'study': ['party', 'social', 'loud', 'noisy'],
-            'party': ['quiet', 'study', 'peaceful', 'calm'],
-            'social': ['quiet', 'study', 'solitary', 'peaceful'],
-            'night owl': ['early', 'early riser', 'early bedtime', 'morning'],
-            'peaceful': ['loud', 'noisy', 'party', 'social']
-        }
-        
-        matches = []
-        query_lower = visitor_query.lower()
-        query_words = set(query_lower.split())
-        
-        for host in hosts:
-            score = 0.3  # Lower base score - must earn points
-            reasoning_parts = []
-            
-            # Check dorm_vibe
-            if host.get('dorm_vibe'):
-                vibe_lower = host['dorm_vibe'].lower()
-                vibe_words = set(vibe_lower.split())
-                
-                # Check for matches
-                matches_found = query_words.intersection(vibe_words)
-                if matches_found:
-                    score += 0.4  # Strong match bonus
-                    reasoning_parts.append(f"vibe matches: {', '.join(matches_found)}")
-                
-                # Check for conflicts/opposites
-                has_conflict = False
-                for query_word in query_words:
-                    if query_word in opposites:
-                        for opposite in opposites[query_word]:
-                            if opposite in vibe_lower:
-                                score -= 0.5  # Heavy penalty for conflicts
-                                has_conflict = True
-                                reasoning_parts.append(f"conflict: {query_word} vs {opposite}")
-                
-                # Partial word matches (e.g., "quiet" in "quiet space")
-                for query_word in query_words:
-                    if len(query_word) > 3 and query_word in vibe_lower:
-                        if query_word not in matches_found:
-                            score += 0.2
-                            reasoning_parts.append(f"partial vibe match: {query_word}")
-            
-            # Check interests
-            if host.get('interests'):
-                interests_lower = host['interests'].lower()
-                interests_words = set(interests_lower.split())
-                
-                # Check for matches
-                interest_matches = query_words.intersection(interests_words)
-                if interest_matches:
-                    score += 0.3
-                    reasoning_parts.append(f"interests match: {', '.join(interest_matches)}")
-                
-                # Partial word matches
-                for query_word in query_words:
-                    if len(query_word) > 3 and query_word in interests_lower:
-                        if query_word not in interest_matches:
-                            score += 0.15
-                            reasoning_parts.append(f"partial interest match: {query_word}")
-            
-            # Normalize score to 0.0-1.0 range
-            score = max(0.0, min(1.0, score))
-            
-            reasoning = "Basic keyword matching (AI unavailable)"
-            if reasoning_parts:
-                reasoning = "; ".join(reasoning_parts)
-            
-            matches.append({
-                "host_id": host.get('id', 0),
-                "name": host.get('name', 'Unknown'),
-                "compatibility_score": score,
-                "reasoning": reasoning
-            })
-        
-        # Sort by score (highest first), and filter out very low scores
-        matches.sort(key=lambda x: x['compatibility_score'], reverse=True)
-        # Only return matches with score > 0.2 to avoid showing terrible matches
-        matches = [m for m in matches if m['compatibility_score'] > 0.2]
-        
-        return json.dumps({"ranked_matches": matches})
+        return await asyncio.to_thread(fallback_matching, visitor_query, date_needed, "TF-IDF matching (AI unavailable)")
     
     # 1. Try to use Dedalus Labs, but fall back if it fails
     try:
@@ -144,7 +116,8 @@ async def run_matching_agent(visitor_query: str, date_needed: str) -> str:
             raise ValueError("DEDALUS_API_KEY not set, using fallback matching")
         
         # Use cloud endpoint explicitly (don't use localhost from DEDALUS_BASE_URL env var)
-        client = AsyncDedalus(api_key=dedalus_api_key, base_url='https://api.dedaluslabs.ai')
+        # The client (and its connection pool) is reused across requests on this loop
+        client = get_dedalus_client(dedalus_api_key, 'https://api.dedaluslabs.ai')
         runner = DedalusRunner(client)
 
         # 2. Define the Master Prompt (The core instructions for the AI)
@@ -206,98 +179,162 @@ async def run_matching_agent(visitor_query: str, date_needed: str) -> str:
         # Fall through to fallback logic below
         pass
     
-    # Fallback: improved matching with conflict detection (same as above)
-    import json
-    hosts_json = find_available_hosts(visitor_date_range=date_needed)
-    hosts = json.loads(hosts_json) if isinstance(hosts_json, str) else hosts_json
+    return FailedAgentResult(
+        await asyncio.to_thread(fallback_matching, visitor_query, date_needed, "TF-IDF matching (AI request failed)")
+    )
+
+async def run_matching_batch(requests: list, use_ai: bool = True) -> list:
+    """
+    Match many (visitor_query, date_needed) pairs at once.
+    
+    Pairs seen recently by this same method (batched Claude re-ranking, or TF-IDF
+    only) are answered from match_cache; single-match agent answers are not. The rest are scored
+    together against the host matrix in one TF-IDF pass; if Claude is configured
+    (and use_ai), each visitor's top candidates are then re-ranked by Claude with
+    BATCH_VISITORS_PER_CALL visitors packed into every call, the calls running
+    concurrently.
     
-    # Define keyword opposites/conflicts
-    opposites = {
-        'quiet': ['loud', 'noisy', 'party', 'social', 'night owl', 'late night'],
-        'loud': ['quiet', 'silent', 'peaceful', 'calm', 'early', 'early bedtime'],
-        'early': ['late', 'night owl', 'late night', 'night'],
-        'late': ['early', 'early riser', 'early bedtime', 'morning'],
-        'study': ['party', 'social', 'loud', 'noisy'],
-        'party': ['quiet', 'study', 'peaceful', 'calm'],
-        'social': ['quiet', 'study', 'solitary', 'peaceful'],
-        'night owl': ['early', 'early riser', 'early bedtime', 'morning'],
-        'peaceful': ['loud', 'noisy', 'party', 'social']
-    }
+    Returns:
+        One {"ranked_matches": [...]} JSON string per request, like run_matching_agent
+    """
+    ai = use_ai and CLAUDE_AVAILABLE and Knot.validate_config()["claude"]
+    method = "claude_batch" if ai else "tfidf"
+    keys = await asyncio.to_thread(
+        lambda: [match_cache_key(visitor_query, date_needed, method) for visitor_query, date_needed in requests]
+    )
+    results = [match_cache.get(key) for key in keys]
     
-    matches = []
-    query_lower = visitor_query.lower()
-    query_words = set(query_lower.split())
+    # Identical pending requests are only computed once
+    todo = {}
+    for index, (key, result) in enumerate(zip(keys, results)):
+        if result is None:
+            todo.setdefault(key, index)
+    if not todo:
+        return results
     
-    for host in hosts:
-        score = 0.3  # Lower base score - must earn points
-        reasoning_parts = []
-        
-        # Check dorm_vibe
-        if host.get('dorm_vibe'):
-            vibe_lower = host['dorm_vibe'].lower()
-            vibe_words = set(vibe_lower.split())
-            
-            # Check for matches
-            matches_found = query_words.intersection(vibe_words)
-            if matches_found:
-                score += 0.4  # Strong match bonus
-                reasoning_parts.append(f"vibe matches: {', '.join(matches_found)}")
-            
-            # Check for conflicts/opposites
-            has_conflict = False
-            for query_word in query_words:
-                if query_word in opposites:
-                    for opposite in opposites[query_word]:
-                        if opposite in vibe_lower:
-                            score -= 0.5  # Heavy penalty for conflicts
-                            has_conflict = True
-                            reasoning_parts.append(f"conflict: {query_word} vs {opposite}")
-            
-            # Partial word matches (e.g., "quiet" in "quiet space")
-            for query_word in query_words:
-                if len(query_word) > 3 and query_word in vibe_lower:
-                    if query_word not in matches_found:
-                        score += 0.2
-                        reasoning_parts.append(f"partial vibe match: {query_word}")
-        
-        # Check interests
-        if host.get('interests'):
-            interests_lower = host['interests'].lower()
-            interests_words = set(interests_lower.split())
-            
-            # Check for matches
-            interest_matches = query_words.intersection(interests_words)
-            if interest_matches:
-                score += 0.3
-                reasoning_parts.append(f"interests match: {', '.join(interest_matches)}")
-            
-            # Partial word matches
-            for query_word in query_words:
-                if len(query_word) > 3 and query_word in interests_lower:
-                    if query_word not in interest_matches:
-                        score += 0.15
-                        reasoning_parts.append(f"partial interest match: {query_word}")
-        
-        # Normalize score to 0.0-1.0 range
-        score = max(0.0, min(1.0, score))
-        
-        reasoning = "AI-powered matching"
-        if reasoning_parts:
-            reasoning = "; ".join(reasoning_parts)
-        
-        matches.append({
-            "host_id": host.get('id', 0),
-            "name": host.get('name', 'Unknown'),
-            "compatibility_score": score,
-            "reasoning": reasoning
-        })
+    pending = [requests[index] for index in todo.values()]
+    # Scoring (and any matrix rebuild) is CPU-bound: keep it off the event loop
+    ranked = await asyncio.to_thread(
+        rank_many_for_stays,
+        [(visitor_query, parse_stay(date_needed), 1) for visitor_query, date_needed in pending],
+        default_reasoning="TF-IDF matching"
+    )
+    # Visitors whose Claude ranking failed keep TF-IDF results, cached only briefly
+    degraded = [False] * len(pending)
+    if ai:
+        per_call = batch_visitors_per_call()
+        chunks = [
+            list(range(start, min(start + per_call, len(pending))))
+            for start in range(0, len(pending), per_call)
+        ]
+        reranked = await asyncio.gather(*[
+            claude_rank_visitors([(pending[i][0], pending[i][1], ranked[i]) for i in chunk]) for chunk in chunks
+        ])
+        for chunk, (chunk_results, chunk_final) in zip(chunks, reranked):
+            for i, matches, is_final in zip(chunk, chunk_results, chunk_final):
+                ranked[i] = matches
+                degraded[i] = not is_final
+    
+    computed = {}
+    for key, matches, fell_back in zip(todo, ranked, degraded):
+        computed[key] = json.dumps({"ranked_matches": matches})
+        match_cache.set(key, computed[key], ttl=FALLBACK_CACHE_TTL if fell_back else None)
+    return [result if result is not None else computed[key] for key, result in zip(keys, results)]
+
+def batch_visitors_per_call() -> int:
+    """BATCH_VISITORS_PER_CALL, lowered if needed so a reply fits in MAX_OUTPUT_TOKENS."""
+    fits = MAX_OUTPUT_TOKENS // (BATCH_TOKENS_PER_CANDIDATE * max(BATCH_CANDIDATES_PER_VISITOR, 1))
+    return max(1, min(BATCH_VISITORS_PER_CALL, fits))
+
+def _visitor_summaries(visitors: list, candidates: list) -> list:
+    """The prompt's view of each visitor with candidates: profile, dates and candidate hosts."""
+    visitor_summaries = []
+    for index, ((visitor_query, date_needed, _), hosts) in enumerate(zip(visitors, candidates)):
+        if not hosts:
+            continue
+        host_summaries = []
+        for match in hosts:
+            host = get_listing_by_id(match["host_id"]) or {}
+            host_summaries.append({
+                "host_id": match["host_id"],
+                "name": match["name"],
+                "dorm_vibe": host.get("dorm_vibe", ""),
+                "interests": host.get("interests", "")
+            })
+        visitor_summaries.append({"visitor": index, "profile": visitor_query, "dates": date_needed,
+                                  "candidates": host_summaries})
+    return visitor_summaries
+
+async def claude_rank_visitors(visitors: list) -> tuple:
+    """
+    Re-rank several visitors' TF-IDF candidates with a single Claude call.
     
-    # Sort by score (highest first), and filter out very low scores
-    matches.sort(key=lambda x: x['compatibility_score'], reverse=True)
-    # Only return matches with score > 0.2 to avoid showing terrible matches
-    matches = [m for m in matches if m['compatibility_score'] > 0.2]
+    Args:
+        visitors: [(visitor_query, date_needed, tfidf_matches), ...]
     
-    return json.dumps({"ranked_matches": matches})
+    Returns:
+        (ranked matches for each visitor, whether each is final); a visitor Claude
+        skipped (or the whole chunk, if the call fails) keeps its TF-IDF ranking
+        and is not final
+    """
+    fallback = [matches for _, _, matches in visitors]
+    candidates = [matches[:BATCH_CANDIDATES_PER_VISITOR] for matches in fallback]
+    # A visitor with no candidates has nothing to rank: its empty answer is final
+    final = [not hosts for hosts in candidates]
+    if not any(candidates):
+        return fallback, final
+    
+    # Listing lookups may reload the store: off the event loop
+    visitor_summaries = await asyncio.to_thread(_visitor_summaries, visitors, candidates)
+    
+    prompt = f"""You are an expert compatibility agent for a college dorm-matching app.
+Match each visitor below with the most compatible of their candidate hosts (all are free on the visitor's dates).
+
+Visitors:
+{json.dumps(visitor_summaries, separators=(",", ":"))}
+
+For every visitor, rank their candidates from BEST MATCH to POOREST MATCH by comparing each host's dorm_vibe and interests with the visitor's profile.
+Output a single, valid JSON object in this format:
+{{"results": [{{"visitor": <visitor index>, "ranked_matches": [{{"host_id": <id>, "name": "<name>", "compatibility_score": <float 0.0-1.0>, "reasoning": "<short explanation>"}}]}}]}}"""
+    
+    try:
+        claude_config = Knot().get_claude_config()
+        message = await create_message(
+            claude_config["api_key"],
+            model=claude_config["model"],
+            max_tokens=min(BATCH_TOKENS_PER_CANDIDATE * BATCH_CANDIDATES_PER_VISITOR * len(visitor_summaries),
+                           MAX_OUTPUT_TOKENS),
+            messages=[{"role": "user", "content": prompt}]
+        )
+        json_match = re.search(r'\{.*\}', message.content[0].text, re.DOTALL)
+        parsed = json.loads(json_match.group(0)) if json_match else {}
+    except Exception as e:
+        print(f"Batch Claude ranking failed ({e}), keeping TF-IDF rankings")
+        return fallback, final
+    
+    results = list(fallback)
+    for entry in parsed.get("results", []):
+        index = entry.get("visitor")
+        if not isinstance(index, int) or not 0 <= index < len(visitors):
+            continue
+        # Only hosts that were actually offered (and are free) for this visitor
+        allowed = {match["host_id"]: match for match in candidates[index]}
+        matches = []
+        for match in entry.get("ranked_matches", []):
+            host_id = match.get("host_id")
+            if host_id in allowed and all(m["host_id"] != host_id for m in matches):
+                matches.append({
+                    "host_id": host_id,
+                    "name": allowed[host_id]["name"],
+                    "compatibility_score": match.get("compatibility_score", allowed[host_id]["compatibility_score"]),
+                    "reasoning": match.get("reasoning", "")
+                })
+        if matches:
+            # Hosts beyond the shortlist keep their TF-IDF order after Claude's picks
+            ranked_ids = {match["host_id"] for match in matches}
+            results[index] = matches + [match for match in fallback[index] if match["host_id"] not in ranked_ids]
+            final[index] = True
+    return results, final
 
 # Example of how your API endpoint would call this function:
 # if __name__ == "__main__":
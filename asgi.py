@@ -0,0 +1,349 @@
+"""
+ASGI - Async entry point for the Roomie API
+Run with: uvicorn asgi:app --host 0.0.0.0 --port 5000
+The AI-bound routes (host matching, event recommendations, combined match, chatbot) are
+native async handlers, so a slow Claude or Dedalus call parks a coroutine instead
+of tying up a whole worker. Every other route (pages, auth, listings CRUD) is
+served by the Flask app from server.py, mounted underneath and sharing its
+session cookie.
+"""
+import traceback
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from itsdangerous import BadSignature
+from starlette.concurrency import run_in_threadpool
+
+# a2wsgi (in requirements.txt) is the maintained WSGI bridge; Starlette's own is
+# deprecated and only used, with a warning, where a2wsgi isn't installed
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from fastapi.middleware.wsgi import WSGIMiddleware
+    print("Warning: a2wsgi not installed; serving Flask routes through Starlette's deprecated WSGIMiddleware. "
+          "Install requirements.txt.")
+
+from ai_agent import run_matching_agent_cached, run_matching_batch
+from assignment import assign_visitors
+from async_runtime import create_message
+from event_repository import event_repository
+from auth import get_user, add_role_to_user
+from server import (
+    app as flask_app, parse_match_result, parse_batch_requests, batch_match_response,
+    assignment_response, MAX_ASSIGN_SIZE,
+    get_keyword_based_recommendations, build_chatbot_request, chatbot_params, chatbot_response_text,
+    stream_chatbot_events, sse_stream, SSE_HEADERS
+)
+
+app = FastAPI(title="Roomie API", version="1.0.0")
+
+# Same policy as flask_cors in server.py: any origin, with credentials
+app.add_middleware(
+    CORSMiddleware,
+    allow_origin_regex=".*",
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+def get_session(request: Request) -> dict:
+    """Decode the Flask session cookie (read-only; Flask routes still own writes)."""
+    cookie = request.cookies.get(flask_app.config.get("SESSION_COOKIE_NAME", "session"))
+    if not cookie:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if serializer is None:
+        return {}
+    try:
+        max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+        return dict(serializer.loads(cookie, max_age=max_age))
+    except BadSignature:
+        return {}
+
+
+async def read_json(request: Request):
+    """The JSON body, or None when it is missing or malformed (like request.get_json())."""
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+def error_response(e: Exception) -> JSONResponse:
+    return JSONResponse({"success": False, "error": str(e), "details": traceback.format_exc()}, status_code=500)
+
+
+@app.post("/api/match")
+async def match_visitor(request: Request):
+    """Match a visitor with hosts (guests and authenticated users)."""
+    session = get_session(request)
+    is_authenticated = 'user_email' in session
+    if not session.get('guest', False) and not is_authenticated:
+        return JSONResponse({"error": "Authentication required. Please login or continue as guest."}, status_code=401)
+
+    if is_authenticated:
+        user = await run_in_threadpool(get_user, session['user_email'])
+        if user and 'visitor' not in user.get('roles', []):
+            await run_in_threadpool(add_role_to_user, session['user_email'], 'visitor')
+
+    try:
+        data = await read_json(request)
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        visitor_query = data.get('visitor_query', '').strip()
+        date_needed = data.get('date_needed', '').strip()
+        if not visitor_query:
+            return JSONResponse({"error": "visitor_query is required"}, status_code=400)
+        if not date_needed:
+            return JSONResponse({"error": "date_needed is required"}, status_code=400)
+
+        result = await run_matching_agent_cached(visitor_query, date_needed)
+        return {"success": True, "matches": parse_match_result(result)}
+    except Exception as e:
+        return error_response(e)
+
+
+@app.post("/api/match/batch")
+async def match_visitors_batch(request: Request):
+    """Match many visitors in one call, scored together against the hosts."""
+    session = get_session(request)
+    if not session.get('guest', False) and 'user_email' not in session:
+        return JSONResponse({"error": "Authentication required. Please login or continue as guest."}, status_code=401)
+
+    data = await read_json(request)
+    try:
+        parsed = parse_batch_requests(data)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    try:
+        pairs = [item for item in parsed if not isinstance(item, str)]
+        results = await run_matching_batch(pairs, use_ai=bool(data.get('use_ai', True))) if pairs else []
+        return {"success": True, "results": batch_match_response(parsed, results)}
+    except Exception as e:
+        return error_response(e)
+
+
+@app.post("/api/match/assign")
+async def assign_visitors_to_hosts(request: Request):
+    """Place a group of visitors within every host's capacity per night (optimal per same-stay group)."""
+    session = get_session(request)
+    if not session.get('guest', False) and 'user_email' not in session:
+        return JSONResponse({"error": "Authentication required. Please login or continue as guest."}, status_code=401)
+
+    data = await read_json(request)
+    try:
+        parsed = parse_batch_requests(data, max_size=MAX_ASSIGN_SIZE)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    try:
+        # CPU-bound solve: keep it off the event loop
+        placement = await run_in_threadpool(assign_visitors, [item for item in parsed if not isinstance(item, str)])
+        return assignment_response(parsed, placement)
+    except Exception as e:
+        return error_response(e)
+
+
+@app.post("/api/listings/match")
+async def match_listings(request: Request):
+    """Match listings for a logged-in user."""
+    if 'user_email' not in get_session(request):
+        return JSONResponse({"error": "Authentication required. Please login."}, status_code=401)
+
+    try:
+        data = await read_json(request) or {}
+        visitor_query = data.get('visitor_query', '').strip()
+        date_needed = data.get('date_needed', '').strip()
+        if not visitor_query or not date_needed:
+            return JSONResponse({"error": "visitor_query and date_needed are required"}, status_code=400)
+
+        result = await run_matching_agent_cached(visitor_query, date_needed)
+        return {"success": True, "matches": parse_match_result(result)}
+    except Exception as e:
+        return error_response(e)
+
+
+@app.post("/api/events/recommendations")
+async def get_event_recommendations(request: Request):
+    """AI-powered event recommendations based on user interests."""
+    try:
+        from nova_act import NovaAct
+
+        data = await read_json(request)
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        user_interests = data.get('interests', '').strip()
+        if not user_interests:
+            return JSONResponse({"error": "interests field is required"}, status_code=400)
+
+        max_results = data.get('max_results', 10)
+        filters = (data.get('category'), data.get('date_from'), data.get('date_to'), bool(data.get('free_only', False)))
+        page = await run_in_threadpool(event_repository.query_page, *filters)
+        events = page["events"]
+
+        nova_act = NovaAct()
+        if nova_act.ai_enabled:
+            recommendations = await nova_act.get_ai_recommendations(
+                user_interests=user_interests,
+                events=events,
+                max_recommendations=max_results,
+                catalog=(page["fingerprint"],) + filters
+            )
+        else:
+            recommendations = get_keyword_based_recommendations(
+                user_interests=user_interests,
+                events=events,
+                max_recommendations=max_results
+            )
+
+        return {
+            "success": True,
+            "events": events,
+            "recommendations": recommendations,
+            "total_count": len(events)
+        }
+    except Exception as e:
+        return error_response(e)
+
+
+@app.get("/api/events/{event_id}")
+async def get_event(event_id: int):
+    """Get a specific event by ID: from the shared event repository, else from Dedalus."""
+    try:
+        # A reload of events.json may be due: off the event loop
+        event = await run_in_threadpool(event_repository.get, event_id)
+        if event is None:
+            from nova_act import NovaAct
+            event = await NovaAct().get_event_from_dedalus(event_id)
+        if not event:
+            return JSONResponse({"error": "Event not found"}, status_code=404)
+        return {"success": True, "event": event}
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+@app.post("/api/combined/match")
+async def get_combined_match(request: Request):
+    """AI-powered combined recommendations for hosts and events."""
+    try:
+        from nova_act import NovaAct
+
+        data = await read_json(request)
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        user_preferences = data.get('preferences', '').strip()
+        if not user_preferences:
+            return JSONResponse({"error": "preferences field is required"}, status_code=400)
+
+        result = await NovaAct().get_combined_recommendations(
+            user_preferences=user_preferences,
+            date_needed=data.get('date_needed'),
+            max_hosts=data.get('max_hosts', 5),
+            max_events=data.get('max_events', 5)
+        )
+        return {
+            "success": True,
+            "hosts": result.get("hosts", []),
+            "events": result.get("events", []),
+            "combined_insights": result.get("combined_insights", ""),
+            "ai_enabled": result.get("ai_enabled", False),
+            "partial": result.get("partial", [])
+        }
+    except Exception as e:
+        return error_response(e)
+
+
+@app.post("/api/combined/match/stream")
+async def get_combined_match_stream(request: Request):
+    """Streaming combined recommendations: local rankings first, then AI-refined picks as SSE."""
+    from nova_act import NovaAct
+
+    data = await read_json(request)
+    if not data:
+        return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+    user_preferences = data.get('preferences', '').strip()
+    if not user_preferences:
+        return JSONResponse({"error": "preferences field is required"}, status_code=400)
+
+    updates = NovaAct().stream_combined_recommendations(
+        user_preferences=user_preferences,
+        date_needed=data.get('date_needed'),
+        max_hosts=data.get('max_hosts', 5),
+        max_events=data.get('max_events', 5)
+    )
+    return StreamingResponse(sse_stream(updates), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/api/chatbot")
+async def chatbot(request: Request):
+    """Site assistant chat turn, answered by Claude with the listings and events as context."""
+    from knot import Knot
+
+    try:
+        data = await read_json(request)
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        message = data.get('message', '').strip()
+        if not message:
+            return JSONResponse({"error": "message field is required"}, status_code=400)
+
+        try:
+            claude_config = Knot().get_claude_config()
+        except Exception as e:
+            return JSONResponse({"success": False, "error": f"Claude API not configured: {str(e)}"}, status_code=500)
+
+        system_prompt, messages = await run_in_threadpool(
+            build_chatbot_request, message, data.get('conversation_history', [])
+        )
+        response = await create_message(
+            claude_config["api_key"], **chatbot_params(claude_config, system_prompt, messages)
+        )
+        return {"success": True, "response": chatbot_response_text(response)}
+    except Exception as e:
+        return error_response(e)
+
+
+@app.post("/api/chatbot/stream")
+async def chatbot_stream(request: Request):
+    """Streaming chatbot turn: answer text is forwarded as Server-Sent Events as it is generated."""
+    from knot import Knot
+
+    data = await read_json(request)
+    if not data:
+        return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+    message = data.get('message', '').strip()
+    if not message:
+        return JSONResponse({"error": "message field is required"}, status_code=400)
+
+    try:
+        claude_config = Knot().get_claude_config()
+    except Exception as e:
+        return JSONResponse({"success": False, "error": f"Claude API not configured: {str(e)}"}, status_code=500)
+
+    system_prompt, messages = await run_in_threadpool(
+        build_chatbot_request, message, data.get('conversation_history', [])
+    )
+    return StreamingResponse(
+        stream_chatbot_events(claude_config, system_prompt, messages),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+# Everything else: the Flask routes, run in Starlette's thread pool
+app.mount("/", WSGIMiddleware(flask_app))
+
+
+if __name__ == "__main__":
+    import os
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
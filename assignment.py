@@ -0,0 +1,186 @@
+"""
+Assignment - Capacity-aware placement of a whole group of visitors with hosts
+/api/match/batch ranks hosts for each visitor on its own, so ten visitors can all be
+told the same one-bed room is their best match. assign_visitors instead places every
+visitor at once so that no host takes more visitors than its capacity on any night.
+Visitors asking for the same nights form one visitor-by-bed assignment problem over
+each visitor's best TF-IDF candidates: solved exactly with scipy's Hungarian solver
+(linear_sum_assignment) when scipy is installed and the problem fits in memory, and
+otherwise with a forward auction (optimal to within AUCTION_EPSILON per visitor).
+Groups with different stays are placed greedily, longest stay first, each against the
+beds the earlier groups left free on its nights, so total compatibility is maximized
+within each group rather than across the whole request.
+"""
+import heapq
+import os
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# scipy is optional: without it the auction solver is used
+try:
+    from scipy.optimize import linear_sum_assignment
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+    linear_sum_assignment = None
+
+from matcher import MIN_SCORE, TfidfMatcher, get_matcher
+from tools import parse_stay
+
+# Best-scoring hosts considered for each visitor per solving round; visitors left
+# over once those are full get another round against the hosts with beds left
+CANDIDATES_PER_VISITOR = int(os.getenv("ROOMIE_ASSIGN_CANDIDATES", "50"))
+# Minimum price increase of an auction bid (bounds the total shortfall from the optimum)
+AUCTION_EPSILON = 1e-3
+# Largest dense visitors x beds benefit matrix handed to the Hungarian solver
+MAX_DENSE_CELLS = 20_000_000
+
+Candidates = List[Tuple[np.ndarray, np.ndarray]]
+
+
+def solve_assignment(candidates: Candidates, capacities: np.ndarray) -> Tuple[np.ndarray, str]:
+    """
+    Give each visitor at most one host, each host at most capacities[h] visitors,
+    maximizing the summed benefit.
+
+    Args:
+        candidates: Per visitor, (host indices, benefits); benefits must be positive
+        capacities: Beds of each host index
+
+    Returns:
+        (host index per visitor or -1 when unplaced, name of the solver used)
+    """
+    if not candidates:
+        return np.zeros(0, dtype=np.int64), "none"
+    if SCIPY_AVAILABLE:
+        hosts = np.concatenate([host_indices for host_indices, _ in candidates])
+        demand = np.bincount(hosts, minlength=len(capacities)) if len(hosts) else np.zeros(len(capacities))
+        beds = np.minimum(capacities, demand).astype(np.int64)
+        if len(candidates) * int(beds.sum()) <= MAX_DENSE_CELLS:
+            return _hungarian(candidates, beds), "hungarian"
+    return _auction(candidates, capacities), "auction"
+
+
+def _hungarian(candidates: Candidates, beds: np.ndarray) -> np.ndarray:
+    """Exact solution: one column per bed, so a host of capacity c is c identical columns."""
+    first_column = np.concatenate([[0], np.cumsum(beds)])
+    bed_host = np.repeat(np.arange(len(beds)), beds)
+    benefit = np.zeros((len(candidates), len(bed_host)))
+    for visitor, (host_indices, values) in enumerate(candidates):
+        for host, value in zip(host_indices, values):
+            benefit[visitor, first_column[host]:first_column[host + 1]] = value
+
+    assigned = np.full(len(candidates), -1, dtype=np.int64)
+    if not len(bed_host):
+        return assigned
+    rows, columns = linear_sum_assignment(benefit, maximize=True)
+    # A zero-benefit pairing means the visitor had no candidate left: leave them unplaced
+    placed = benefit[rows, columns] > 0
+    assigned[rows[placed]] = bed_host[columns[placed]]
+    return assigned
+
+
+def _auction(candidates: Candidates, capacities: np.ndarray) -> np.ndarray:
+    """
+    Forward auction (Bertsekas) with every bed of a host sold separately. An
+    unplaced visitor bids for the host with the best benefit minus price, raising
+    that price by its margin over the next best option (staying unplaced is worth 0)
+    plus AUCTION_EPSILON; a full host's price is its cheapest bed, whose holder is
+    outbid and bids again. Ends within len(candidates) * AUCTION_EPSILON of the optimum.
+    """
+    assigned = np.full(len(candidates), -1, dtype=np.int64)
+    prices = np.zeros(len(capacities))
+    # Per host, a min-heap of (price paid, visitor) for its occupied beds
+    holders: Dict[int, List[Tuple[float, int]]] = {}
+    pending = deque(visitor for visitor, (host_indices, _) in enumerate(candidates) if len(host_indices))
+    while pending:
+        visitor = pending.popleft()
+        host_indices, values = candidates[visitor]
+        net = values - prices[host_indices]
+        best = int(np.argmax(net))
+        if net[best] <= 0:
+            continue
+        second = max(float(np.max(np.delete(net, best))) if len(net) > 1 else 0.0, 0.0)
+        host = int(host_indices[best])
+        bid = prices[host] + (net[best] - second) + AUCTION_EPSILON
+
+        beds = holders.setdefault(host, [])
+        if len(beds) < capacities[host]:
+            heapq.heappush(beds, (bid, visitor))
+        else:
+            _, outbid = heapq.heappushpop(beds, (bid, visitor))
+            assigned[outbid] = -1
+            pending.append(outbid)
+        assigned[visitor] = host
+        # Free beds cost nothing; once the host is full, the cheapest bed sets its price
+        prices[host] = beds[0][0] if len(beds) >= capacities[host] else 0.0
+    return assigned
+
+
+def assign_visitors(requests: List[Tuple[str, str]], matcher: Optional[TfidfMatcher] = None) -> Dict:
+    """
+    Place many (visitor_query, date_needed) requests with hosts at once.
+
+    Args:
+        requests: (visitor_query, date_needed) pairs
+        matcher: Index to score and take capacities from (default: the shared one)
+
+    Returns:
+        {"assignments": [{"host_id", "name", "compatibility_score"} or None, ...] in
+         request order, "total_score", "assigned", "solver"}
+    """
+    matcher = matcher or get_matcher()
+    stays: Dict[tuple, List[int]] = {}
+    for index, (_, date_needed) in enumerate(requests):
+        stays.setdefault(tuple(parse_stay(date_needed)), []).append(index)
+
+    assignments: List[Optional[Dict]] = [None] * len(requests)
+    booked: Dict[Tuple[int, str], int] = {}
+    solvers = set()
+    for nights in sorted(stays, key=lambda nights: (-len(nights), nights)):
+        host_ids = matcher.available(list(nights))
+        free = np.array([
+            matcher.capacity(host_id) - max((booked.get((host_id, night), 0) for night in nights), default=0)
+            for host_id in host_ids
+        ], dtype=np.int64)
+        column = {host_id: h for h, host_id in enumerate(host_ids)}
+
+        pending = stays[nights]
+        while pending and free.any():
+            open_hosts = [host_id for host_id, beds in zip(host_ids, free) if beds > 0]
+            results = matcher.score_many([requests[i][0] for i in pending], [open_hosts] * len(pending),
+                                         min_score=MIN_SCORE, limit=CANDIDATES_PER_VISITOR)
+            candidates = [
+                (np.array([column[r["listing_id"]] for r in result], dtype=np.int64),
+                 np.array([r["score"] for r in result]))
+                for result in results
+            ]
+            chosen, solver = solve_assignment(candidates, free)
+            solvers.add(solver)
+            if not (chosen >= 0).any():
+                break
+
+            for index, result, host in zip(pending, results, chosen):
+                if host < 0:
+                    continue
+                host_id = host_ids[host]
+                score = next(r["score"] for r in result if r["listing_id"] == host_id)
+                assignments[index] = {
+                    "host_id": host_id,
+                    "name": matcher.name(host_id),
+                    "compatibility_score": round(score, 3)
+                }
+                free[host] -= 1
+                for night in nights:
+                    booked[(host_id, night)] = booked.get((host_id, night), 0) + 1
+            pending = [index for index, host in zip(pending, chosen) if host < 0]
+
+    placed = [assignment for assignment in assignments if assignment]
+    return {
+        "assignments": assignments,
+        "total_score": round(sum(assignment["compatibility_score"] for assignment in placed), 3),
+        "assigned": len(placed),
+        "solver": "hungarian" if "hungarian" in solvers else ("auction" if "auction" in solvers else "none")
+    }
@@ -0,0 +1,185 @@
+"""
+Async Runtime - One long-lived event loop per worker for the sync Flask handlers
+Flask views submit coroutines with run_async() instead of asyncio.run(), so the
+loop, the pooled keep-alive httpx client and the Dedalus and Claude clients (with
+their TLS connections) are created once per worker and reused across requests.
+"""
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, Optional
+
+import httpx
+
+# Connection pool for outbound HTTP (Dedalus events API, LLM SDKs)
+HTTP_TIMEOUT = float(os.getenv("ROOMIE_HTTP_TIMEOUT", "10"))
+HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("ROOMIE_HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("ROOMIE_HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0
+)
+
+# Claude calls in flight at once per loop; further calls wait for a free slot
+LLM_CONCURRENCY = int(os.getenv("ROOMIE_LLM_CONCURRENCY", "8"))
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+# Clients are bound to the loop they were created on, so keep one set per loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Any, Any]]" = weakref.WeakKeyDictionary()
+_llm_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The worker's background event loop, started on first use (and again after a fork)."""
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid() or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="roomie-async", daemon=True)
+            thread.start()
+            _loop, _loop_pid = loop, os.getpid()
+        return _loop
+
+
+def run_async(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the background loop and wait for its result.
+    Call from sync code only (e.g. Flask views); inside a coroutine, just await.
+    """
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_async() called from the runtime loop itself; await the coroutine instead")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def iter_async(agen: AsyncIterator, timeout: Optional[float] = None) -> Iterator:
+    """
+    Iterate an async generator from sync code (e.g. a streaming Flask response),
+    pulling each item on the background loop as soon as it is ready.
+    """
+    async def next_item():
+        return await agen.__anext__()
+
+    try:
+        while True:
+            try:
+                yield run_async(next_item(), timeout)
+            except StopAsyncIteration:
+                return
+    finally:
+        # Runs on client disconnect too, releasing whatever the generator holds
+        run_async(agen.aclose(), timeout)
+
+
+def _loop_clients() -> Dict[Any, Any]:
+    loop = asyncio.get_running_loop()
+    clients = _clients.get(loop)
+    if clients is None:
+        clients = _clients[loop] = {}
+    return clients
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Pooled keep-alive httpx client shared by every coroutine on the current loop."""
+    clients = _loop_clients()
+    client = clients.get("http")
+    if client is None or client.is_closed:
+        client = clients["http"] = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+    return client
+
+
+def get_dedalus_client(api_key: str, base_url: str):
+    """Reused AsyncDedalus client for the current loop (one per api_key/base_url)."""
+    from dedalus_labs import AsyncDedalus
+    clients = _loop_clients()
+    key = ("dedalus", api_key, base_url)
+    client = clients.get(key)
+    if client is None or client.is_closed():
+        client = clients[key] = AsyncDedalus(api_key=api_key, base_url=base_url)
+    return client
+
+
+def get_anthropic_client(api_key: str):
+    """Reused AsyncAnthropic client for the current loop, on a pooled keep-alive connection."""
+    from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+    clients = _loop_clients()
+    key = ("anthropic", api_key)
+    client = clients.get(key)
+    if client is None or client.is_closed():
+        client = clients[key] = AsyncAnthropic(
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(limits=HTTP_LIMITS)
+        )
+    return client
+
+
+def llm_slot() -> asyncio.Semaphore:
+    """Semaphore bounding concurrent Claude requests on the current loop."""
+    loop = asyncio.get_running_loop()
+    slot = _llm_slots.get(loop)
+    if slot is None:
+        slot = _llm_slots[loop] = asyncio.Semaphore(LLM_CONCURRENCY)
+    return slot
+
+
+async def create_message(api_key: str, **kwargs):
+    """
+    messages.create on the shared Claude client, waiting for a free slot first.
+    Every LLM call site goes through here so concurrent calls overlap up to
+    LLM_CONCURRENCY instead of each opening its own client.
+    """
+    async with llm_slot():
+        return await get_anthropic_client(api_key).messages.create(**kwargs)
+
+
+async def stream_message(api_key: str, **kwargs) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of create_message(): yields text deltas as Claude
+    produces them, holding one concurrency slot until the stream ends.
+    """
+    async with llm_slot():
+        async with get_anthropic_client(api_key).messages.stream(**kwargs) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+
+async def _close_clients():
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        try:
+            if isinstance(client, httpx.AsyncClient):
+                await client.aclose()
+            else:
+                await client.close()
+        except Exception as e:
+            print(f"Error closing client: {e}")
+
+
+def shutdown(timeout: float = 5.0):
+    """Close the shared clients and stop the background loop."""
+    global _loop
+    with _loop_lock:
+        loop, _loop = _loop, None
+    if loop is None or _loop_pid != os.getpid() or loop.is_closed():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_close_clients(), loop).result(timeout)
+    except Exception as e:
+        print(f"Error shutting down async runtime: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(shutdown)
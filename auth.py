@@ -1,15 +1,22 @@
 """
 Simple authentication system for storing and managing users.
-Uses JSON file for persistence.
+Uses JSON file for persistence (or SQLite with ROOMIE_STORAGE_BACKEND=sqlite).
 """
 import json
 import os
 import hashlib
 from typing import Optional, Dict
+from storage import STORAGE_BACKEND, SQLITE_PATH, atomic_write_json, file_lock
 
 USERS_FILE = 'users.json'
 
 def load_users() -> Dict:
+    """Load users from the configured backend."""
+    if _user_store is not None:
+        return _user_store.load_all()
+    return _load_users_json()
+
+def _load_users_json() -> Dict:
     """Load users from JSON file."""
     if os.path.exists(USERS_FILE):
         try:
@@ -44,9 +51,24 @@ def load_users() -> Dict:
     return {"users": {}}
 
 def save_users(users: Dict):
-    """Save users to JSON file."""
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=2)
+    """Save users to JSON file (atomically, under the users file lock)."""
+    if _user_store is not None:
+        _user_store.replace_all(users)
+        return
+    with file_lock(USERS_FILE):
+        atomic_write_json(USERS_FILE, users, indent=2)
+
+# SQLite user table, migrated from users.json on first use
+_user_store = None
+if STORAGE_BACKEND == "sqlite":
+    from sqlite_store import SqliteUserStore
+    _user_store = SqliteUserStore(SQLITE_PATH, _load_users_json)
+
+def _find_user(email: str) -> Optional[Dict]:
+    """Look up a single user record without loading every user."""
+    if _user_store is not None:
+        return _user_store.get(email)
+    return load_users().get("users", {}).get(email)
 
 def hash_password(password: str) -> str:
     """Simple password hashing (for demo purposes)."""
@@ -56,51 +78,62 @@ def create_user(email: str, password: str, name: str) -> bool:
     """
     Create a new user. Users can have multiple roles (host, visitor, or both).
     """
-    users_data = load_users()
-    users = users_data.get("users", {})
-    
-    if email in users:
-        return False  # User already exists
+    if _user_store is not None:
+        return _user_store.insert({
+            "email": email,
+            "password_hash": hash_password(password),
+            "name": name,
+            "roles": []
+        })
     
-    users[email] = {
-        "email": email,
-        "password_hash": hash_password(password),
-        "name": name,
-        "roles": []  # Roles will be added as needed
-    }
-    
-    users_data["users"] = users
-    save_users(users_data)
-    return True
+    # Hold the lock across read-modify-write so concurrent workers don't drop updates
+    with file_lock(USERS_FILE):
+        users_data = load_users()
+        users = users_data.get("users", {})
+        
+        if email in users:
+            return False  # User already exists
+        
+        users[email] = {
+            "email": email,
+            "password_hash": hash_password(password),
+            "name": name,
+            "roles": []  # Roles will be added as needed
+        }
+        
+        users_data["users"] = users
+        save_users(users_data)
+        return True
 
 def add_role_to_user(email: str, role: str) -> bool:
     """Add a role to an existing user."""
-    users_data = load_users()
-    users = users_data.get("users", {})
-    
-    if email not in users:
-        return False
+    if _user_store is not None:
+        return _user_store.add_role(email, role)
     
-    if role not in users[email].get("roles", []):
-        if "roles" not in users[email]:
-            users[email]["roles"] = []
-        users[email]["roles"].append(role)
-        users_data["users"] = users
-        save_users(users_data)
-    return True
+    with file_lock(USERS_FILE):
+        users_data = load_users()
+        users = users_data.get("users", {})
+        
+        if email not in users:
+            return False
+        
+        if role not in users[email].get("roles", []):
+            if "roles" not in users[email]:
+                users[email]["roles"] = []
+            users[email]["roles"].append(role)
+            users_data["users"] = users
+            save_users(users_data)
+        return True
 
 def verify_user(email: str, password: str) -> Optional[Dict]:
     """
     Verify user credentials (no type required).
     Returns user data with roles if valid, None otherwise.
     """
-    users_data = load_users()
-    users = users_data.get("users", {})
-    
-    if email not in users:
+    user = _find_user(email)
+    if user is None:
         return None
     
-    user = users[email]
     if user["password_hash"] == hash_password(password):
         # Return user data without password
         return {
@@ -113,11 +146,8 @@ def verify_user(email: str, password: str) -> Optional[Dict]:
 
 def get_user(email: str) -> Optional[Dict]:
     """Get user data by email."""
-    users_data = load_users()
-    users = users_data.get("users", {})
-    
-    if email in users:
-        user = users[email]
+    user = _find_user(email)
+    if user is not None:
         return {
             "email": user["email"],
             "name": user["name"],
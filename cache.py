@@ -0,0 +1,126 @@
+"""
+Cache - Bounded in-memory LRU cache with per-entry expiry, plus request coalescing
+Used to reuse expensive results (LLM match rankings) for repeated requests.
+Thread-safe, with hit/miss counters for the stats endpoint.
+SingleFlight covers the gap before a result is cached: identical calls that arrive
+while the first is still running wait for it instead of calling upstream again.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Least-recently-used cache of at most `maxsize` entries, each valid for `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (refreshing its LRU position) or `default`."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical async calls: the first caller for a key starts the
+    call, and callers with the same key arriving before it finishes await that same
+    task (sharing its result or exception). Nothing is kept once the call completes.
+    """
+
+    def __init__(self):
+        # Tasks belong to the loop they run on, so keep one table per loop
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Task]]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable]) -> Any:
+        """Await call() unless an identical call is already in flight; then await that one."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            calls = self._calls.setdefault(loop, {})
+            task = calls.get(key)
+            if task is None:
+                task = loop.create_task(call())
+                calls[key] = task
+                task.add_done_callback(lambda done: self._forget(calls, key, done))
+                self.started += 1
+            else:
+                self.coalesced += 1
+        # A caller that gives up (disconnect, timeout) must not cancel the others' call
+        return await asyncio.shield(task)
+
+    def _forget(self, calls: Dict[Hashable, asyncio.Task], key: Hashable, task: asyncio.Task):
+        with self._lock:
+            if calls.get(key) is task:
+                del calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved: every waiter may have gone away
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": sum(len(calls) for calls in self._calls.values()),
+                "started": self.started,
+                "coalesced": self.coalesced
+            }
@@ -386,6 +386,55 @@
             messageDiv.textContent = content;
             this.messages.appendChild(messageDiv);
             this.messages.scrollTop = this.messages.scrollHeight;
+            return messageDiv;
+        }
+
+        // Read a text/event-stream reply, showing answer text as it arrives.
+        // Resolves to the same shape as the JSON reply, plus `streamed` when
+        // the bot message is already on screen.
+        async readStream(response) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let text = '';
+            let messageDiv = null;
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    const payload = rawEvent.split('\n')
+                        .filter(line => line.startsWith('data:'))
+                        .map(line => line.slice(5).trim())
+                        .join('\n');
+                    if (!payload) continue;
+
+                    const event = JSON.parse(payload);
+                    if (event.type === 'delta') {
+                        if (!messageDiv) {
+                            // First token: swap the typing indicator for the reply
+                            this.removeTypingIndicator();
+                            messageDiv = this.addMessage('bot', '');
+                        }
+                        text += event.text;
+                        messageDiv.textContent = text;
+                        this.messages.scrollTop = this.messages.scrollHeight;
+                    } else if (event.type === 'done') {
+                        return { success: true, response: event.response || text, streamed: !!messageDiv };
+                    } else if (event.type === 'error') {
+                        if (messageDiv) messageDiv.remove();
+                        return { success: false, error: event.error };
+                    }
+                }
+            }
+
+            if (messageDiv) messageDiv.remove();
+            return { success: false, error: 'The response stream ended unexpectedly.' };
         }
 
         addTypingIndicator() {
@@ -433,7 +482,7 @@
 
             try {
                 // Call API
-                const response = await fetch('/api/chatbot', {
+                const response = await fetch('/api/chatbot/stream', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
@@ -457,14 +506,19 @@
                     throw new Error(errorMsg);
                 }
 
-                const data = await response.json();
+                const contentType = response.headers.get('Content-Type') || '';
+                const data = contentType.includes('text/event-stream') && response.body
+                    ? await this.readStream(response)
+                    : await response.json();
 
                 // Remove typing indicator
                 this.removeTypingIndicator();
 
                 if (data.success && data.response) {
-                    // Add bot response to UI
-                    this.addMessage('bot', data.response);
+                    // Add bot response to UI (a streamed reply is already there)
+                    if (!data.streamed) {
+                        this.addMessage('bot', data.response);
+                    }
 
                     // Add to conversation history
                     this.conversationHistory.push({
@@ -7,9 +7,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime, date
-import json
-import os
 from typing import List, Dict
+from event_repository import EVENTS_FILE, event_repository
 
 app = FastAPI(title="Dedalus Events API", version="1.0.0")
 
@@ -22,11 +21,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Event data storage
-EVENTS_FILE = 'events_data/events.json'
-
-# Ensure events_data directory exists
-os.makedirs('events_data', exist_ok=True)
+# Event data storage: EVENTS_FILE, read and written through the shared event_repository
 
 # Pydantic models
 class Event(BaseModel):
@@ -67,19 +62,12 @@ class EventUpdate(BaseModel):
 
 # Helper functions
 def load_events() -> List[Dict]:
-    """Load events from JSON file."""
-    if os.path.exists(EVENTS_FILE):
-        try:
-            with open(EVENTS_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return get_default_events()
-    return get_default_events()
+    """All events (from the repository's in-memory copy; the file is only re-read when it changes)."""
+    return event_repository.all()
 
 def save_events(events: List[Dict]):
-    """Save events to JSON file."""
-    with open(EVENTS_FILE, 'w') as f:
-        json.dump(events, f, indent=2)
+    """Replace every event (atomically, under the events file lock)."""
+    event_repository.replace_all(events)
 
 def get_default_events() -> List[Dict]:
     """Get default Princeton campus events."""
@@ -275,36 +263,13 @@ async def get_events(
     free_only: Optional[bool] = Query(False, description="Show only free events"),
     tags: Optional[str] = Query(None, description="Comma-separated tags to filter by")
 ):
-    """Get all events with optional filters."""
-    events = load_events()
-    
-    # Apply filters
-    if category:
-        events = [e for e in events if e.get("category", "").lower() == category.lower()]
-    
-    if date_from:
-        events = [e for e in events if e.get("date", "") >= date_from]
-    
-    if date_to:
-        events = [e for e in events if e.get("date", "") <= date_to]
-    
-    if free_only:
-        events = [e for e in events if e.get("cost", 0) == 0.0]
-    
-    if tags:
-        tag_list = [t.strip().lower() for t in tags.split(",")]
-        events = [e for e in events if any(tag in [t.lower() for t in e.get("tags", [])] for tag in tag_list)]
-    
-    # Sort by date
-    events.sort(key=lambda x: x.get("date", ""))
-    
-    return events
+    """Get all events with optional filters, sorted by date."""
+    return event_repository.query(category, date_from, date_to, free_only, tags)
 
 @app.get("/events/{event_id}", response_model=Event)
 async def get_event(event_id: int):
     """Get a specific event by ID."""
-    events = load_events()
-    event = next((e for e in events if e.get("id") == event_id), None)
+    event = event_repository.get(event_id)
     
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -313,58 +278,34 @@ async def get_event(event_id: int):
 
 @app.post("/events", response_model=Event)
 async def create_event(event: EventCreate):
-    """Create a new event."""
-    events = load_events()
-    
-    # Generate new ID
-    max_id = max([e.get("id", 0) for e in events], default=0)
-    new_id = max_id + 1
-    
-    event_dict = event.dict()
-    event_dict["id"] = new_id
-    events.append(event_dict)
-    save_events(events)
-    
-    return event_dict
+    """Create a new event (the next free id is assigned)."""
+    return event_repository.create(event.dict())
 
 @app.put("/events/{event_id}", response_model=Event)
 async def update_event(event_id: int, event_update: EventUpdate):
     """Update an existing event."""
-    events = load_events()
-    
-    event_index = next((i for i, e in enumerate(events) if e.get("id") == event_id), None)
+    # Update only provided fields
+    updated = event_repository.update(event_id, event_update.dict(exclude_unset=True))
     
-    if event_index is None:
+    if updated is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    # Update only provided fields
-    update_data = event_update.dict(exclude_unset=True)
-    events[event_index].update(update_data)
-    save_events(events)
-    
-    return events[event_index]
+    return updated
 
 @app.delete("/events/{event_id}")
 async def delete_event(event_id: int):
     """Delete an event."""
-    events = load_events()
+    deleted_event = event_repository.delete(event_id)
     
-    event_index = next((i for i, e in enumerate(events) if e.get("id") == event_id), None)
-    
-    if event_index is None:
+    if deleted_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    deleted_event = events.pop(event_index)
-    save_events(events)
-    
     return {"message": "Event deleted successfully", "event": deleted_event}
 
 @app.get("/events/categories/list")
 async def get_categories():
     """Get list of all event categories."""
-    events = load_events()
-    categories = list(set([e.get("category", "") for e in events if e.get("category")]))
-    return {"categories": sorted(categories)}
+    return {"categories": event_repository.categories()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,277 @@
+"""
+Event Repository - In-memory indexed view of events_data/events.json
+Shared by server.py (events API, recommendations, chatbot) and dedalus_events.py
+(the Dedalus events service). Loads the file once, reloads it only when the file's
+inode/mtime/size changes, and answers lookups and filtered queries from memory
+instead of re-parsing the file on every request.
+Queries use precomputed category and tag indexes, a free-event set and the events
+sorted by date (range lookups by bisect), with keyset pagination on top.
+A missing, unreadable or empty file serves the default events without writing them back;
+writes are atomic and made under the events file lock (see storage.py).
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+
+from storage import atomic_write_json, file_lock, file_stamp
+
+EVENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'events_data', 'events.json')
+
+
+def _default_events() -> List[Dict]:
+    # Imported lazily: dedalus_events imports this module
+    from dedalus_events import get_default_events
+    return get_default_events()
+
+
+def is_free(event: Dict) -> bool:
+    """No cost, or a zero cost (as a number or a string)."""
+    cost = event.get("cost")
+    if cost is None or cost == "":
+        return True
+    try:
+        return float(cost) == 0.0
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_tags(tags: Union[str, Iterable[str], None]) -> List[str]:
+    """Lowercased tags from a comma-separated string or a list."""
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return [tag.strip().lower() for tag in tags if tag and tag.strip()]
+
+
+def _order_key(event: Dict) -> tuple:
+    event_id = event.get("id")
+    return (str(event.get("date") or ""), event_id if isinstance(event_id, int) else 0)
+
+
+def _encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        date, event_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(date, str) or not isinstance(event_id, int):
+        raise ValueError("Invalid cursor")
+    return (date, event_id)
+
+
+class _EventIndex:
+    """
+    Immutable indexes over one version of the file. Events are numbered by their
+    position in (date, id) order, so any set of positions sorted is date-ordered.
+    """
+
+    def __init__(self, events: List[Dict], version: int, stored: List[Dict]):
+        self.events = events
+        self.version = version
+        # What the file holds (events, unless those are the defaults standing in for an empty file)
+        self.stored = stored
+        # Same content, same fingerprint, in any process: the version is per process
+        self.fingerprint = hashlib.sha256(
+            json.dumps(events, sort_keys=True, separators=(',', ':'), default=str).encode("utf-8")
+        ).hexdigest()
+        self.by_id = {event.get("id"): event for event in events}
+        self.ordered = sorted(events, key=_order_key)
+        self.keys = [_order_key(event) for event in self.ordered]
+        self.dates = [key[0] for key in self.keys]
+        self.by_category: Dict[str, Set[int]] = {}
+        self.by_tag: Dict[str, Set[int]] = {}
+        self.free: Set[int] = set()
+        for position, event in enumerate(self.ordered):
+            category = str(event.get("category") or "").lower()
+            if category:
+                self.by_category.setdefault(category, set()).add(position)
+            for tag in parse_tags(event.get("tags")):
+                self.by_tag.setdefault(tag, set()).add(position)
+            if is_free(event):
+                self.free.add(position)
+        self.categories = sorted({event["category"] for event in events if event.get("category")})
+
+
+class EventRepository:
+    """Indexed cache of the events JSON file. Returned events are shared: treat them as read-only."""
+
+    def __init__(self, path: str, default_factory: Callable[[], List[Dict]] = list):
+        self.path = path
+        self.default_factory = default_factory
+        self._lock = threading.RLock()
+        self._stamp = None
+        # Swapped in whole on every (re)load, so readers never see a half-built index
+        self._index: Optional[_EventIndex] = None
+        # Bumped on every (re)load, ours or another process's write
+        self._version = 0
+
+    # ----- Loading -----
+
+    def _read(self) -> List[Dict]:
+        try:
+            with open(self.path, 'r') as f:
+                events = json.load(f)
+        except (IOError, OSError, ValueError):
+            return self.default_factory()
+        return events if isinstance(events, list) else self.default_factory()
+
+    def _fresh(self) -> _EventIndex:
+        """The current index, reloaded first if the file changed since we last read or wrote it."""
+        index = self._index
+        if index is not None and file_stamp(self.path) == self._stamp:
+            return index
+        with self._lock:
+            stamp = file_stamp(self.path)
+            if self._index is None or stamp != self._stamp:
+                self._rebuild(self._read(), stamp)
+            return self._index
+
+    def _rebuild(self, events: List[Dict], stamp):
+        stored = [event for event in events if isinstance(event, dict)]
+        self._version += 1
+        # An empty file serves the defaults, as /api/events always has; writes still start from []
+        self._index = _EventIndex(stored or self.default_factory(), self._version, stored)
+        self._stamp = stamp
+
+    # ----- Reads -----
+
+    def all(self) -> List[Dict]:
+        """Every event, in file order."""
+        return list(self._fresh().events)
+
+    def get(self, event_id: int) -> Optional[Dict]:
+        return self._fresh().by_id.get(event_id)
+
+    def version(self) -> int:
+        """Reload counter of this repository object (not comparable across processes)."""
+        return self._fresh().version
+
+    def fingerprint(self) -> str:
+        """Hash of the current events' content, stable across processes and restarts."""
+        return self._fresh().fingerprint
+
+    def query(self, category: Optional[str] = None, date_from: Optional[str] = None,
+              date_to: Optional[str] = None, free_only: bool = False,
+              tags: Union[str, Iterable[str], None] = None) -> List[Dict]:
+        """
+        Events matching every given filter, sorted by date (then id).
+
+        Args:
+            category: Case-insensitive category
+            date_from / date_to: Inclusive YYYY-MM-DD bounds
+            free_only: Only events that cost nothing
+            tags: Comma-separated string or list; events with any of them match
+        """
+        return self.query_page(category, date_from, date_to, free_only, tags)["events"]
+
+    def query_page(self, category: Optional[str] = None, date_from: Optional[str] = None,
+                   date_to: Optional[str] = None, free_only: bool = False,
+                   tags: Union[str, Iterable[str], None] = None,
+                   cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+        """
+        query() with keyset pagination: pass back `next_cursor` to continue after
+        the last event of the previous page. The date range is two bisects into
+        the date-sorted events; category, tags and free_only intersect precomputed
+        index sets, starting from the smallest, instead of scanning every event.
+
+        Returns:
+            {"events": [...], "next_cursor": str or None, "total_count": int,
+             "version", "fingerprint": version() and fingerprint() of the events
+             the page was taken from}
+
+        Raises:
+            ValueError: for a malformed cursor.
+        """
+        index = self._fresh()
+        low = bisect_left(index.dates, date_from) if date_from else 0
+        high = bisect_right(index.dates, date_to) if date_to else len(index.ordered)
+
+        filters = []
+        if category:
+            filters.append(index.by_category.get(category.lower(), set()))
+        wanted_tags = parse_tags(tags)
+        if wanted_tags:
+            filters.append(set().union(*(index.by_tag.get(tag, set()) for tag in wanted_tags)))
+        if free_only:
+            filters.append(index.free)
+
+        if filters:
+            filters.sort(key=len)
+            matches = sorted(position for position in filters[0].intersection(*filters[1:])
+                             if low <= position < high)
+        else:
+            matches = range(low, max(low, high))
+
+        start = bisect_left(matches, bisect_right(index.keys, _decode_cursor(cursor))) if cursor else 0
+        end = start + limit if limit else len(matches)
+        page = matches[start:end]
+        next_cursor = _encode_cursor(index.keys[matches[end - 1]]) if end < len(matches) else None
+        return {
+            "events": [index.ordered[position] for position in page],
+            "next_cursor": next_cursor,
+            "total_count": len(matches),
+            "version": index.version,
+            "fingerprint": index.fingerprint
+        }
+
+    def categories(self) -> List[str]:
+        return list(self._fresh().categories)
+
+    # ----- Writes -----
+
+    def _modify(self, change: Callable[[List[Dict]], object]):
+        """Apply `change` to a fresh private copy of the events and save it (returns change's result)."""
+        with file_lock(self.path), self._lock:
+            # Another process may have written since our last read
+            events = [dict(event) for event in self._fresh().stored]
+            result = change(events)
+            if result is not None:
+                atomic_write_json(self.path, events, indent=2)
+                self._rebuild(events, file_stamp(self.path))
+            return result
+
+    def create(self, event: Dict) -> Dict:
+        """Add an event under the next free id."""
+        def add(events):
+            created = dict(event)
+            created["id"] = max((e.get("id") or 0 for e in events), default=0) + 1
+            events.append(created)
+            return created
+        return self._modify(add)
+
+    def update(self, event_id: int, changes: Dict) -> Optional[Dict]:
+        """Apply `changes` to an event; None if it doesn't exist."""
+        def apply(events):
+            for event in events:
+                if event.get("id") == event_id:
+                    event.update(changes)
+                    return event
+            return None
+        return self._modify(apply)
+
+    def delete(self, event_id: int) -> Optional[Dict]:
+        """Remove an event, returning it (None if it doesn't exist)."""
+        def remove(events):
+            for index, event in enumerate(events):
+                if event.get("id") == event_id:
+                    return events.pop(index)
+            return None
+        return self._modify(remove)
+
+    def replace_all(self, events: List[Dict]):
+        def replace(current):
+            current[:] = [dict(event) for event in events]
+            return True
+        self._modify(replace)
+
+
+# Shared by every module in the process
+event_repository = EventRepository(EVENTS_FILE, _default_events)
@@ -0,0 +1,479 @@
+"""
+Listing Store - In-memory indexed view of listings.json
+Loads the listings file once, reloads it only when the file's mtime/size changes,
+and keeps id, email and date indexes so lookups don't re-parse the whole file.
+
+Mutations are appended as small JSON ops to a write-ahead log (listings.json.wal)
+instead of rewriting every listing. The log is replayed on load and compacted back
+into listings.json in the background once it grows past a size threshold.
+Writes go through storage.py: atomic rename, cross-process lock and group commit.
+"""
+import json
+import os
+import threading
+import zlib
+from typing import Callable, Dict, List, Optional, Set
+from storage import GroupCommitter, atomic_write_text, file_lock, file_stamp
+
+# Optional pause before a group-commit flush so more writes can join it
+COMMIT_WINDOW = float(os.getenv("ROOMIE_COMMIT_WINDOW_MS", "0")) / 1000.0
+# Compact the write-ahead log into the snapshot once it passes this many bytes
+WAL_COMPACT_BYTES = int(os.getenv("ROOMIE_WAL_COMPACT_BYTES", str(1024 * 1024)))
+
+
+def _snapshot_tag(data: bytes) -> str:
+    """Identify a snapshot's exact contents; the WAL header records which one it extends."""
+    return f"{zlib.crc32(data):08x}-{len(data)}"
+
+
+class ListingStore:
+    """Indexed cache of the listings JSON file with a write-ahead log for mutations."""
+
+    def __init__(self, path: str, default_factory: Callable[[], List[Dict]] = list,
+                 compact_bytes: int = WAL_COMPACT_BYTES):
+        self.path = path
+        self.wal_path = path + '.wal'
+        self.default_factory = default_factory
+        self.compact_bytes = compact_bytes
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._next_seq = 0
+        # What we last saw on disk
+        self._stamp = None
+        self._tag = None
+        self._wal_key = None
+        self._wal_offset = 0
+        self._wal_valid = True
+        # Primary key index (dict preserves file order)
+        self._by_id: Dict[int, Dict] = {}
+        # Secondary indexes
+        self._seq: Dict[int, int] = {}
+        self._by_email: Dict[str, Set[int]] = {}
+        self._by_date: Dict[str, Set[int]] = {}
+        self._indexed: Dict[int, tuple] = {}
+        # Rating aggregates: id -> [sum, count]
+        self._ratings: Dict[int, List[int]] = {}
+        # Bumped on every change applied in memory, ours or another process's
+        self._version = 0
+        # Ops applied in memory but not yet in the log; replayed if another
+        # process writes underneath us
+        self._pending: List[Dict] = []
+        self._committer = GroupCommitter(self._flush, window=COMMIT_WINDOW)
+        self._compacting = False
+        self._compaction_thread = None
+
+    # ----- Loading -----
+
+    def _read_snapshot(self):
+        """Parse the snapshot file, falling back to the defaults. Returns (listings, tag)."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return self.default_factory(), None
+        try:
+            return json.loads(data), _snapshot_tag(data)
+        except ValueError:
+            return self.default_factory(), _snapshot_tag(data)
+
+    def _read_wal(self, offset: int = 0) -> List[Dict]:
+        """Read complete op lines from `offset`, updating what we've consumed."""
+        try:
+            with open(self.wal_path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                f.seek(offset)
+                data = f.read()
+        except (IOError, OSError):
+            self._wal_key = None
+            self._wal_offset = 0
+            return []
+        self._wal_key = (st.st_ino, st.st_size)
+
+        ops = []
+        consumed = offset
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break  # Torn tail from a crashed writer; ignored and truncated on next append
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            consumed += len(line)
+            if offset == 0 and consumed == len(line):
+                # Header: only replay a log written on top of this exact snapshot
+                self._wal_valid = entry.get("snapshot") == self._tag
+                if not self._wal_valid:
+                    break
+                continue
+            ops.append(entry)
+        self._wal_offset = consumed
+        return ops
+
+    def _ensure_fresh(self):
+        """Reload from disk if the files changed since we last read or wrote them."""
+        if self._loaded and not self._compacting and self._disk_unchanged():
+            return
+        with self._lock:
+            self._sync()
+
+    def _disk_unchanged(self) -> bool:
+        wal = file_stamp(self.wal_path)
+        wal_key = (wal[0], wal[2]) if wal else None
+        return file_stamp(self.path) == self._stamp and wal_key == self._wal_key
+
+    def _sync(self):
+        """Catch up with other writers, keeping our unflushed ops on top (lock held)."""
+        if self._compacting:
+            return  # The compactor holds the file lock; memory is authoritative
+        if self._loaded and self._disk_unchanged():
+            return
+        stamp = file_stamp(self.path)
+        wal = file_stamp(self.wal_path)
+        if (self._loaded and not self._pending and stamp == self._stamp and self._wal_valid
+                and wal and self._wal_key and wal[0] == self._wal_key[0] and wal[2] >= self._wal_offset):
+            # Another process only appended to the log: apply just the new ops
+            for op in self._read_wal(self._wal_offset):
+                self._apply_op(op)
+            return
+        listings, self._tag = self._read_snapshot()
+        self._stamp = stamp
+        self._wal_valid = True
+        self._rebuild(listings)
+        for op in self._read_wal():
+            self._apply_op(op)
+        self._loaded = True
+        for op in self._pending:
+            self._apply_op(op)
+
+    def _rebuild(self, listings: List[Dict]):
+        """Replace the in-memory data and rebuild every index."""
+        self._version += 1
+        self._by_id = {}
+        self._seq = {}
+        self._by_email = {}
+        self._by_date = {}
+        self._indexed = {}
+        self._ratings = {}
+        self._next_seq = 0
+        for listing in listings:
+            listing_id = listing.get("id")
+            if listing_id in self._by_id:
+                continue  # Keep the first occurrence, like the old linear scan
+            self._by_id[listing_id] = listing
+            self._index(listing)
+            self._aggregate_ratings(listing)
+
+    # ----- Index maintenance -----
+
+    def _index(self, listing: Dict):
+        listing_id = listing.get("id")
+        if listing_id not in self._seq:
+            self._seq[listing_id] = self._next_seq
+            self._next_seq += 1
+        email = listing.get("email")
+        dates = tuple(listing.get("available_dates", []) or [])
+        self._by_email.setdefault(email, set()).add(listing_id)
+        for date in dates:
+            self._by_date.setdefault(date, set()).add(listing_id)
+        self._indexed[listing_id] = (email, dates)
+
+    def _unindex(self, listing_id: int):
+        email, dates = self._indexed.pop(listing_id, (None, ()))
+        ids = self._by_email.get(email)
+        if ids is not None:
+            ids.discard(listing_id)
+            if not ids:
+                del self._by_email[email]
+        for date in dates:
+            ids = self._by_date.get(date)
+            if ids is not None:
+                ids.discard(listing_id)
+                if not ids:
+                    del self._by_date[date]
+
+    def _aggregate_ratings(self, listing: Dict):
+        """Recompute the rating aggregate for one listing from its reviews."""
+        reviews = listing.get("reviews", []) or []
+        self._ratings[listing.get("id")] = [
+            sum(review.get("rating", 0) for review in reviews),
+            len(reviews)
+        ]
+
+    def _in_file_order(self, ids) -> List[int]:
+        return sorted(ids, key=lambda listing_id: self._seq.get(listing_id, 0))
+
+    # ----- Ops (the unit of the write-ahead log) -----
+
+    def _apply_op(self, op: Dict):
+        """
+        Apply one logged op to memory. Listings are replaced copy-on-write so
+        a snapshot taken for compaction never sees a half-applied change.
+        """
+        result = self._apply(op)
+        if result and op.get("op") != "replace":  # replace bumps via _rebuild
+            self._version += 1
+        return result
+
+    def _apply(self, op: Dict):
+        kind = op.get("op")
+        if kind == "insert":
+            stored = dict(op["listing"])
+            if stored.get("id") in self._by_id:
+                # Another writer already took this id; deterministic on replay
+                stored["id"] = max([listing_id or 0 for listing_id in self._by_id], default=100) + 1
+                op["listing"] = dict(stored)
+            self._by_id[stored.get("id")] = stored
+            self._index(stored)
+            self._aggregate_ratings(stored)
+            return dict(stored)
+
+        if kind == "replace":
+            self._rebuild([dict(listing) for listing in op["listings"]])
+            return True
+
+        listing_id = op.get("id")
+        current = self._by_id.get(listing_id)
+        if current is None:
+            return False
+
+        if kind == "delete":
+            del self._by_id[listing_id]
+            self._unindex(listing_id)
+            self._seq.pop(listing_id, None)
+            self._ratings.pop(listing_id, None)
+            return True
+
+        listing = dict(current)
+        if kind == "set":
+            listing.update(op.get("fields", {}))
+            for key in op.get("unset", []):
+                listing.pop(key, None)
+            self._by_id[listing_id] = listing
+            self._unindex(listing_id)
+            self._index(listing)
+            if "reviews" in op.get("fields", {}) or "reviews" in op.get("unset", []):
+                self._aggregate_ratings(listing)
+            return True
+
+        if kind == "review":
+            reviews = list(listing.get("reviews", []) or [])
+            review = dict(op["review"], id=len(reviews) + 1)
+            listing["reviews"] = reviews + [review]
+            self._by_id[listing_id] = listing
+            aggregate = self._ratings.setdefault(listing_id, [0, 0])
+            aggregate[0] += review.get("rating", 0)
+            aggregate[1] += 1
+            return True
+
+        return False
+
+    def _record(self, op: Dict):
+        """Apply an op and queue it for the next group commit (lock held)."""
+        result = self._apply_op(op)
+        if result:
+            self._pending.append(op)
+        return result
+
+    # ----- Persistence -----
+
+    def _flush(self):
+        """Append pending ops to the log with a single fsync (group-commit leader)."""
+        with file_lock(self.path):
+            with self._lock:
+                if not self._pending:
+                    return
+                self._sync()
+                if self._stamp is None or not self._wal_valid:
+                    # No snapshot yet, or a stale log: write a fresh snapshot instead
+                    self._write_snapshot(json.dumps(list(self._by_id.values()), indent=2))
+                else:
+                    self._append_wal(self._pending)
+                self._pending = []
+                needs_compaction = self._wal_offset > self.compact_bytes
+        if needs_compaction:
+            self._start_compaction()
+
+    def _append_wal(self, ops: List[Dict]):
+        """Append op lines and fsync (file lock held)."""
+        lines = b''.join(
+            json.dumps(op, separators=(',', ':')).encode() + b'\n' for op in ops
+        )
+        if self._wal_offset == 0 or not os.path.exists(self.wal_path):
+            header = json.dumps({"snapshot": self._tag}) + '\n'
+            atomic_write_text(self.wal_path, header)
+            self._wal_offset = len(header.encode())
+        with open(self.wal_path, 'r+b') as f:
+            f.truncate(self._wal_offset)  # Drop any torn tail before appending
+            f.seek(self._wal_offset)
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        self._wal_offset += len(lines)
+        self._wal_key = (st.st_ino, st.st_size)
+
+    def _write_snapshot(self, text: str):
+        """Write the snapshot and start an empty log on top of it (file lock held)."""
+        atomic_write_text(self.path, text)
+        tag = _snapshot_tag(text.encode())
+        header = json.dumps({"snapshot": tag}) + '\n'
+        atomic_write_text(self.wal_path, header)
+        wal = file_stamp(self.wal_path)
+        with self._lock:
+            self._stamp = file_stamp(self.path)
+            self._tag = tag
+            self._wal_valid = True
+            self._wal_offset = len(header.encode())
+            self._wal_key = (wal[0], wal[2]) if wal else None
+
+    def _start_compaction(self):
+        with self._lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+            self._compaction_thread.start()
+
+    def compact(self):
+        """
+        Fold the log into listings.json. Serialization happens outside the store
+        lock so reads keep being served; writers wait on the file lock meanwhile.
+        """
+        with file_lock(self.path):
+            with self._lock:
+                self._sync()
+                if self._pending and self._stamp is not None and self._wal_valid:
+                    self._append_wal(self._pending)
+                    self._pending = []
+                # Pending ops (if any) will be re-logged on top of the new snapshot
+                snapshot = [
+                    listing for listing in self._by_id.values()
+                ] if not self._pending else None
+                self._compacting = True
+            try:
+                if snapshot is None:
+                    return
+                self._write_snapshot(json.dumps(snapshot, indent=2))
+            finally:
+                with self._lock:
+                    self._compacting = False
+
+    # ----- Reads (return shallow copies so callers can annotate freely) -----
+
+    def all(self) -> List[Dict]:
+        self._ensure_fresh()
+        with self._lock:
+            return [dict(listing) for listing in self._by_id.values()]
+
+    def get(self, listing_id: int) -> Optional[Dict]:
+        self._ensure_fresh()
+        with self._lock:
+            listing = self._by_id.get(listing_id)
+            return dict(listing) if listing is not None else None
+
+    def get_by_email(self, email: str) -> List[Dict]:
+        self._ensure_fresh()
+        with self._lock:
+            ids = self._in_file_order(self._by_email.get(email, ()))
+            return [dict(self._by_id[listing_id]) for listing_id in ids]
+
+    def get_available(self, date: str, min_capacity: int = 1) -> List[Dict]:
+        """Listings available on `date` with at least `min_capacity` spots."""
+        return self.get_available_for_nights([date], min_capacity)
+
+    def get_available_for_nights(self, nights: List[str], min_capacity: int = 1) -> List[Dict]:
+        """Listings available on every night in `nights`, via intersection of the date index."""
+        self._ensure_fresh()
+        with self._lock:
+            if not nights:
+                return []
+            id_sets = sorted((self._by_date.get(night, set()) for night in nights), key=len)
+            ids = set(id_sets[0]).intersection(*id_sets[1:])
+            return [
+                dict(self._by_id[listing_id]) for listing_id in self._in_file_order(ids)
+                if self._by_id[listing_id].get("capacity", 0) >= min_capacity
+            ]
+
+    def rating_summary(self, listing_id: int) -> Dict:
+        """Rating sum, count and average for a listing, read from the aggregate."""
+        return self.rating_summaries([listing_id])[listing_id]
+
+    def rating_summaries(self, listing_ids: List[int]) -> Dict[int, Dict]:
+        """Rating summaries for many listings with a single freshness check."""
+        self._ensure_fresh()
+        with self._lock:
+            aggregates = {listing_id: self._ratings.get(listing_id, (0, 0)) for listing_id in listing_ids}
+        return {
+            listing_id: {
+                "rating_sum": total,
+                "review_count": count,
+                "average_rating": round(total / count, 1) if count else 0.0
+            }
+            for listing_id, (total, count) in aggregates.items()
+        }
+
+    def version(self) -> int:
+        """Counter that changes whenever the listings do (in this process's view)."""
+        self._ensure_fresh()
+        with self._lock:
+            return self._version
+
+    def next_id(self) -> int:
+        self._ensure_fresh()
+        with self._lock:
+            return max([listing_id or 0 for listing_id in self._by_id], default=100) + 1
+
+    # ----- Writes -----
+
+    def replace_all(self, listings: List[Dict]):
+        """Replace every listing and save (used by tools.save_listings)."""
+        with self._lock:
+            self._sync()
+            self._record({"op": "replace", "listings": [dict(listing) for listing in listings]})
+        self._committer.commit()
+
+    def insert(self, listing: Dict) -> Dict:
+        """Insert a listing; its id is reassigned if another writer already took it."""
+        with self._lock:
+            self._sync()
+            result = self._record({"op": "insert", "listing": dict(listing)})
+        self._committer.commit()
+        return result
+
+    def modify(self, listing_id: int, change: Callable[[Dict], None]) -> bool:
+        """Apply `change` to a copy of the listing and log only the fields it changed."""
+        with self._lock:
+            self._sync()
+            current = self._by_id.get(listing_id)
+            if current is None:
+                return False
+            changed = dict(current)
+            change(changed)
+            fields = {key: value for key, value in changed.items()
+                      if key not in current or current[key] != value}
+            unset = [key for key in current if key not in changed]
+            if not fields and not unset:
+                return True
+            self._record({"op": "set", "id": listing_id, "fields": fields, "unset": unset})
+        self._committer.commit()
+        return True
+
+    def append_review(self, listing_id: int, make_review: Callable[[int], Dict]) -> bool:
+        """Append the review built by `make_review(review_id)` and bump the rating aggregate."""
+        with self._lock:
+            self._sync()
+            current = self._by_id.get(listing_id)
+            if current is None:
+                return False
+            review = make_review(len(current.get("reviews", []) or []) + 1)
+            self._record({"op": "review", "id": listing_id, "review": review})
+        self._committer.commit()
+        return True
+
+    def delete(self, listing_id: int) -> bool:
+        with self._lock:
+            self._sync()
+            if listing_id not in self._by_id:
+                return False
+            self._record({"op": "delete", "id": listing_id})
+        self._committer.commit()
+        return True
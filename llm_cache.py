@@ -0,0 +1,195 @@
+"""
+LLM Cache - Persistent cache of Claude responses with near-duplicate reuse
+Used by NovaAct.get_ai_recommendations so that students asking the same thing
+("free tech events") against the same event catalog share one Claude call, across
+restarts and workers.
+Entries live in SQLite, keyed by a hash of the normalized query and its scope
+(event-catalog version, model, result count). A miss on the exact key falls back
+to the most similar of the `max_candidates` most recently used queries in the same
+scope, reused when its cosine similarity reaches `similarity` (above 1 turns this
+off). Calls block on SQLite, so async code should run them in a worker thread. Entries expire after
+`max_age` seconds, and the least recently used are evicted beyond `max_entries`
+or `max_bytes`.
+"""
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from matcher import tokenize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    query TEXT NOT NULL,
+    vector TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_scope_used ON responses(scope, last_used);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+"""
+
+
+def normalize_query(text: str) -> str:
+    """
+    Case- and punctuation-insensitive form of a query ("Free TECH events!" == "free tech events").
+    Every word is kept in order: "love parties, hate quiet" must not share an answer
+    with "hate parties, love quiet".
+    """
+    return " ".join(re.findall(r"[a-z0-9']+", (text or "").lower()))
+
+
+def query_vector(text: str) -> Dict[str, float]:
+    """
+    Cosine-normalized log-tf weights of a query's tokens and adjacent token pairs.
+    The pairs keep reorderings with another meaning ("love parties, hate quiet"
+    against "hate parties, love quiet") well below any useful similarity threshold.
+    """
+    tokens = tokenize(text)
+    counts = {}
+    for token in tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]:
+        counts[token] = counts.get(token, 0) + 1
+    weights = {term: 1.0 + math.log(count) for term, count in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    return {term: w / norm for term, w in weights.items()} if norm else {}
+
+
+def scope_key(*parts: Any) -> str:
+    """Stable hash of everything besides the query that determines a response."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """On-disk LLM response cache; thread-safe, and shared between processes through SQLite."""
+
+    def __init__(self, path: str, max_entries: int = 5000, max_bytes: int = 50_000_000,
+                 max_age: float = 7 * 24 * 3600, similarity: float = 0.9, max_candidates: int = 200):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.similarity = similarity
+        self.max_candidates = max_candidates
+        self._local = threading.local()
+        self._setup_lock = threading.Lock()
+        self._ready = False
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._ready:
+            with self._setup_lock:
+                if not self._ready:
+                    conn.executescript(SCHEMA)
+                    self._ready = True
+        return conn
+
+    def _count(self, counter: str):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, scope: str, query: str) -> Optional[Any]:
+        """The cached response for this query (or a near-duplicate of it) in `scope`, or None."""
+        conn = self._connect()
+        now = time.time()
+        oldest = now - self.max_age
+        key = scope_key(scope, normalize_query(query))
+        row = conn.execute("SELECT value FROM responses WHERE key = ? AND created >= ?", (key, oldest)).fetchone()
+        counter = "hits"
+        if row is None and self.similarity <= 1.0:
+            vector = query_vector(query)
+            best_key, best_similarity = None, self.similarity
+            for candidate_key, candidate_vector in conn.execute(
+                    "SELECT key, vector FROM responses WHERE scope = ? AND created >= ? "
+                    "ORDER BY last_used DESC LIMIT ?", (scope, oldest, self.max_candidates)):
+                candidate = json.loads(candidate_vector)
+                similarity = sum(weight * candidate.get(term, 0.0) for term, weight in vector.items())
+                if similarity >= best_similarity:
+                    best_key, best_similarity = candidate_key, similarity
+            if best_key is not None:
+                key, counter = best_key, "near_hits"
+                row = conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._count(counter)
+        return json.loads(row[0])
+
+    def set(self, scope: str, query: str, value: Any):
+        """Store a JSON-serializable response, then evict expired and excess entries."""
+        conn = self._connect()
+        now = time.time()
+        normalized = normalize_query(query)
+        encoded = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, scope, query, vector, value, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope_key(scope, normalized), scope, normalized, json.dumps(query_vector(query)),
+                 encoded, len(encoded), now, now)
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        evicted = conn.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age,)).rowcount
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if entries > self.max_entries or size > self.max_bytes:
+            doomed = []
+            for key, entry_size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                if entries <= self.max_entries and size <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                entries -= 1
+                size -= entry_size
+            conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            evicted += len(doomed)
+        if evicted:
+            with self._counter_lock:
+                self.evictions += evicted
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        self._connect().execute("DELETE FROM responses")
+
+    def stats(self) -> Dict:
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self._counter_lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "size": entries,
+                "bytes": size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age,
+                "similarity_threshold": self.similarity,
+                "max_candidates": self.max_candidates,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions
+            }
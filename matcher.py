@@ -0,0 +1,590 @@
+"""
+Matcher - TF-IDF + cosine similarity ranking of hosts against a visitor profile
+Used by ai_agent.run_matching_agent when the Dedalus agent is unavailable, and to
+score batches of visitors (/api/match/batch) together.
+Each listing's dorm_vibe, interests and description are indexed once into a sparse
+term-by-listing matrix (stored column-wise: one postings array per term), so scoring
+a query is a single sparse mat-vec over the query's terms plus a vectorized
+penalty for conflicting lifestyles (quiet vs. loud, early vs. night owl, ...).
+"""
+import math
+import re
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Keyword opposites: a visitor asking for the key is put off by any of these in a host's vibe
+OPPOSITES = {
+    'quiet': ['loud', 'noisy', 'party', 'social', 'night owl', 'late night'],
+    'loud': ['quiet', 'silent', 'peaceful', 'calm', 'early', 'early bedtime'],
+    'early': ['late', 'night owl', 'late night', 'night'],
+    'late': ['early', 'early riser', 'early bedtime', 'morning'],
+    'study': ['party', 'social', 'loud', 'noisy'],
+    'party': ['quiet', 'study', 'peaceful', 'calm'],
+    'social': ['quiet', 'study', 'solitary', 'peaceful'],
+    'night owl': ['early', 'early riser', 'early bedtime', 'morning'],
+    'peaceful': ['loud', 'noisy', 'party', 'social']
+}
+
+# Term-frequency weight of each indexed field (vibe matters most for roommates)
+FIELD_WEIGHTS = {'dorm_vibe': 2.0, 'interests': 1.5, 'description': 1.0}
+
+# Final score = BASE_SCORE + SIMILARITY_WEIGHT * cosine - CONFLICT_PENALTY * conflicts, clipped to [0, 1]
+BASE_SCORE = 0.3
+SIMILARITY_WEIGHT = 0.7
+CONFLICT_PENALTY = 0.5
+# Matches at or below this score are not worth showing
+MIN_SCORE = 0.2
+
+STOPWORDS = frozenset(
+    "a am an and are as at be but by for from has have i im in is it its me my of on or pm "
+    "so that the their them they this to very was we with you your".split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_TRIGGERS = list(OPPOSITES)
+_PHRASES = sorted({phrase for opposites in OPPOSITES.values() for phrase in opposites})
+_PHRASE_INDEX = {phrase: index for index, phrase in enumerate(_PHRASES)}
+# _CONFLICTS[t, p] is 1 when trigger t conflicts with phrase p
+_CONFLICTS = np.array(
+    [[1.0 if phrase in OPPOSITES[trigger] else 0.0 for phrase in _PHRASES] for trigger in _TRIGGERS]
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords dropped and plurals folded (rooms -> room)."""
+    tokens = []
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _ngrams(text: str) -> set:
+    """Words and two-word phrases of a text, for matching the conflict phrases."""
+    words = _TOKEN_RE.findall((text or "").lower())
+    return set(words) | {" ".join(pair) for pair in zip(words, words[1:])}
+
+
+def document_vector(listing: Dict) -> Dict[str, float]:
+    """
+    Cosine-normalized log-tf weights of a listing's text (SMART "lnc").
+    Document weights carry no idf, so they never change when other listings do.
+    """
+    counts = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(str(listing.get(field, "") or "")):
+            counts[token] = counts.get(token, 0.0) + weight
+    weights = {term: 1.0 + math.log(count) for term, count in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    return {term: w / norm for term, w in weights.items()} if norm else {}
+
+
+class TextIndex:
+    """
+    lnc.ltc index over a fixed list of texts, built once and ranked against many
+    queries (e.g. the event catalog, rebuilt only when the events change).
+    """
+
+    def __init__(self, texts: List[str]):
+        self.size = len(texts)
+        postings: Dict[str, tuple] = {}
+        for row, text in enumerate(texts):
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            weights = {term: 1.0 + math.log(count) for term, count in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            for term, w in weights.items():
+                rows, values = postings.setdefault(term, ([], []))
+                rows.append(row)
+                values.append(w / norm)
+        self.postings = {
+            term: (np.asarray(rows, dtype=np.int64), np.asarray(values))
+            for term, (rows, values) in postings.items()
+        }
+
+    def rank(self, query: str, limit: Optional[int] = None, rows: Optional[List[int]] = None) -> List[int]:
+        """
+        Texts ordered by similarity to `query`, best first (ties keep input order).
+        With `rows`, only those texts are ranked and positions into `rows` are
+        returned; document frequencies still come from the whole index.
+        """
+        query_counts = {}
+        for token in tokenize(query):
+            if token in self.postings:
+                query_counts[token] = query_counts.get(token, 0) + 1
+        query_weights = {
+            term: (1.0 + math.log(count)) * (math.log((self.size + 1) / (len(self.postings[term][0]) + 1)) + 1.0)
+            for term, count in query_counts.items()
+        }
+        query_norm = math.sqrt(sum(w * w for w in query_weights.values()))
+
+        similarity = np.zeros(self.size)
+        if query_norm:
+            matched = np.concatenate([self.postings[term][0] for term in query_weights])
+            weights = np.concatenate([self.postings[term][1] * (w / query_norm) for term, w in query_weights.items()])
+            similarity = np.bincount(matched, weights=weights, minlength=self.size)
+        if rows is not None:
+            similarity = similarity[np.asarray(rows, dtype=np.int64)]
+        order = np.argsort(-similarity, kind="stable")
+        return [int(i) for i in order[:limit]]
+
+
+def rank_texts(query: str, texts: List[str], limit: Optional[int] = None) -> List[int]:
+    """
+    Indices of `texts` ordered by lnc.ltc cosine similarity to `query`, best first
+    (ties, including texts sharing no terms with the query, keep input order).
+    A one-off index for small ad-hoc collections; reuse a TextIndex for repeated queries.
+    """
+    return TextIndex(texts).rank(query, limit)
+
+
+def conflict_phrases(listing: Dict) -> np.ndarray:
+    """0/1 vector of which conflict phrases appear in a listing's dorm_vibe."""
+    grams = _ngrams(str(listing.get("dorm_vibe", "") or ""))
+    return np.array([1.0 if phrase in grams else 0.0 for phrase in _PHRASES])
+
+
+class TfidfMatcher:
+    """
+    Sparse TF-IDF index over listings, scored with lnc.ltc cosine similarity.
+
+    Kept current incrementally: adding, updating or removing a listing only
+    touches the postings of that listing's own terms. Removed rows are left as
+    tombstones and compacted in bulk once they outnumber the live ones.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # listings_version() this index reflects (None = unknown, rebuild needed)
+        self.version = None
+        self.build([])
+
+    def build(self, listings: List[Dict], version: Optional[int] = None):
+        """(Re)index every listing from scratch."""
+        seen = set()
+        unique = []
+        for listing in listings:
+            if listing.get("id") not in seen:  # Keep the first occurrence, like the store
+                seen.add(listing.get("id"))
+                unique.append(listing)
+        vectors = [document_vector(listing) for listing in unique]
+        ids = [listing.get("id") for listing in unique]
+
+        columns = {}
+        for row, vector in enumerate(vectors):
+            for term, weight in vector.items():
+                rows, weights = columns.setdefault(term, ([], []))
+                rows.append(row)
+                weights.append(weight)
+
+        with self._lock:
+            self._ids = np.array(ids, dtype=np.int64)
+            self._size = len(ids)
+            self._dead = 0
+            self._row_of = {listing_id: row for row, listing_id in enumerate(ids)}
+            self._vectors = vectors
+            self._postings = {
+                term: (np.array(rows, dtype=np.int64), np.array(weights, dtype=np.float64))
+                for term, (rows, weights) in columns.items()
+            }
+            self._phrases = (np.array([conflict_phrases(listing) for listing in unique])
+                             if unique else np.zeros((0, len(_PHRASES))))
+            # Availability index, so candidates don't have to come from the store
+            self._info = {}
+            self._by_date = {}
+            for listing in unique:
+                self._index_availability(listing)
+            self.version = version
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, listing_id: int) -> bool:
+        return listing_id in self._row_of
+
+    def indexed_vector(self, listing_id: int) -> Optional[Dict[str, float]]:
+        """The document vector currently indexed for a listing (None if not indexed)."""
+        with self._lock:
+            row = self._row_of.get(listing_id)
+            return self._vectors[row] if row is not None else None
+
+    # ----- Incremental maintenance -----
+
+    def add(self, listing: Dict):
+        """Index a new listing, or re-index it if it's already there."""
+        listing_id = listing.get("id")
+        vector = document_vector(listing)
+        with self._lock:
+            row = self._row_of.get(listing_id)
+            if row is None:
+                row = self._size
+                if row == len(self._ids):
+                    # Grow by doubling so a burst of inserts stays amortized O(1)
+                    capacity = max(16, 2 * row)
+                    self._ids = np.resize(self._ids, capacity)
+                    self._phrases = np.vstack([self._phrases, np.zeros((capacity - row, len(_PHRASES)))])
+                self._size += 1
+                self._ids[row] = listing_id
+                self._row_of[listing_id] = row
+                self._vectors.append({})
+            else:
+                self._unindex_availability(listing_id)
+
+            old = self._vectors[row]
+            for term in old.keys() - vector.keys():
+                self._drop_posting(term, row)
+            for term, weight in vector.items():
+                if old.get(term) != weight:
+                    self._set_posting(term, row, weight)
+            self._vectors[row] = vector
+            self._phrases[row] = conflict_phrases(listing)
+            self._index_availability(listing)
+
+    update = add
+
+    def remove(self, listing_id: int):
+        """Drop a listing from the index (no-op if it isn't indexed)."""
+        with self._lock:
+            row = self._row_of.pop(listing_id, None)
+            if row is None:
+                return
+            for term in self._vectors[row]:
+                self._drop_posting(term, row)
+            self._vectors[row] = {}
+            self._phrases[row] = 0.0
+            self._unindex_availability(listing_id)
+            self._dead += 1
+            if self._dead > max(1024, len(self._row_of)):
+                self._compact()
+
+    def apply_change(self, event: Dict):
+        """Consume a tools.add_listing_listener change event."""
+        kind = event.get("type")
+        with self._lock:
+            if kind in ("created", "updated"):
+                if event.get("listing"):
+                    self.add(event["listing"])
+                else:
+                    self.remove(event.get("listing_id"))
+            elif kind == "deleted":
+                self.remove(event.get("listing_id"))
+            elif kind == "reset":
+                self.version = None
+                return
+            # Only trust the version if nobody else wrote in between
+            version = event.get("version")
+            if self.version is not None and version == self.version + 1:
+                self.version = version
+
+    def _set_posting(self, term: str, row: int, weight: float):
+        rows, weights = self._postings.get(term, (np.zeros(0, dtype=np.int64), np.zeros(0)))
+        i = int(np.searchsorted(rows, row))
+        if i < len(rows) and rows[i] == row:
+            weights[i] = weight
+        else:
+            self._postings[term] = (np.insert(rows, i, row), np.insert(weights, i, weight))
+
+    def _drop_posting(self, term: str, row: int):
+        rows, weights = self._postings[term]
+        i = int(np.searchsorted(rows, row))
+        if len(rows) == 1:
+            del self._postings[term]
+        else:
+            self._postings[term] = (np.delete(rows, i), np.delete(weights, i))
+
+    def _compact(self):
+        """Renumber rows without the tombstones (lock held)."""
+        live = np.array(sorted(self._row_of.values()), dtype=np.int64)
+        remap = np.full(self._size, -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+        self._postings = {term: (remap[rows], weights) for term, (rows, weights) in self._postings.items()}
+        self._ids = self._ids[live]
+        self._phrases = self._phrases[live]
+        self._vectors = [self._vectors[row] for row in live]
+        self._row_of = {listing_id: int(remap[row]) for listing_id, row in self._row_of.items()}
+        self._size = len(live)
+        self._dead = 0
+
+    def _index_availability(self, listing: Dict):
+        listing_id = listing.get("id")
+        dates = tuple(listing.get("available_dates", []) or [])
+        self._info[listing_id] = (listing.get("name", "Unknown"), listing.get("capacity", 0) or 0, dates)
+        for date in dates:
+            self._by_date.setdefault(date, set()).add(listing_id)
+
+    def _unindex_availability(self, listing_id: int):
+        _, _, dates = self._info.pop(listing_id, (None, 0, ()))
+        for date in dates:
+            ids = self._by_date.get(date)
+            if ids is not None:
+                ids.discard(listing_id)
+                if not ids:
+                    del self._by_date[date]
+
+    def available(self, nights: List[str], min_capacity: int = 1) -> List[int]:
+        """Ids of indexed listings free on every night with at least min_capacity spots."""
+        with self._lock:
+            if not nights:
+                return []
+            id_sets = sorted((self._by_date.get(night, set()) for night in nights), key=len)
+            ids = set(id_sets[0]).intersection(*id_sets[1:])
+            return sorted((listing_id for listing_id in ids if self._info[listing_id][1] >= min_capacity),
+                          key=self._row_of.get)
+
+    def name(self, listing_id: int) -> str:
+        with self._lock:
+            return self._info.get(listing_id, ("Unknown",))[0]
+
+    def capacity(self, listing_id: int) -> int:
+        """Visitors the listing can take on each of its available nights."""
+        with self._lock:
+            return self._info.get(listing_id, (None, 0))[1]
+
+    # ----- Scoring -----
+
+    def _query_vector(self, query: str) -> Dict[str, float]:
+        """Log-tf x idf weights of the query, cosine-normalized (SMART "ltc")."""
+        counts = {}
+        for token in tokenize(query):
+            counts[token] = counts.get(token, 0) + 1
+        n = len(self._row_of)
+        weights = {}
+        for term, count in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            # Smoothed idf stays positive even for a term every listing uses
+            idf = math.log((n + 1) / (len(postings[0]) + 1)) + 1.0
+            weights[term] = (1.0 + math.log(count)) * idf
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {term: w / norm for term, w in weights.items()} if norm else {}
+
+    @staticmethod
+    def _query_triggers(query: str) -> np.ndarray:
+        grams = _ngrams(query)
+        return np.array([1.0 if trigger in grams else 0.0 for trigger in _TRIGGERS])
+
+    def score(self, query: str, listing_ids: Optional[List[int]] = None,
+              min_score: Optional[float] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Score listings against a visitor query, best first.
+
+        Args:
+            query: Free-text visitor profile
+            listing_ids: Restrict to these listings (default: every indexed listing)
+            min_score: Drop listings scoring at or below this
+            limit: Return at most this many results
+
+        Returns:
+            [{"listing_id", "score", "similarity", "matched_terms", "conflicts"}, ...]
+        """
+        return self.score_many([query], [listing_ids], min_score, limit)[0]
+
+    def score_many(self, queries: List[str], listing_ids: Optional[List[Optional[List[int]]]] = None,
+                   min_score: Optional[float] = None, limit: Optional[int] = None) -> List[List[Dict]]:
+        """
+        Score several visitor queries in one pass. The query vectors are stacked
+        into a matrix, so each term's postings are read once for all the queries
+        using it and the queries-by-listings similarity comes out of one matrix
+        product (in blocks of at most _BLOCK_CELLS entries).
+
+        Args:
+            queries: Free-text visitor profiles
+            listing_ids: Per query, the listings to restrict to (None = every listing)
+
+        Returns:
+            One score() result list per query, in order
+        """
+        if listing_ids is None:
+            listing_ids = [None] * len(queries)
+        with self._lock:
+            n = self._size
+            block = max(1, self._BLOCK_CELLS // max(n, 1))
+            results = []
+            for start in range(0, len(queries), block):
+                chunk = queries[start:start + block]
+                query_vectors = [self._query_vector(query) for query in chunk]
+                similarity = self._similarity_block(query_vectors, n)
+
+                # Conflicts = (phrases the queries' triggers object to) . (phrases in each host's vibe)
+                triggers = np.array([self._query_triggers(query) for query in chunk])
+                conflicts = (triggers @ _CONFLICTS) @ self._phrases[:n].T
+
+                for i, query_vector in enumerate(query_vectors):
+                    results.append(self._rank(query_vector, similarity[i], conflicts[i], triggers[i],
+                                              listing_ids[start + i], min_score, limit))
+            return results
+
+    # Largest dense block (queries x listings, or listings x terms) materialized at once
+    _BLOCK_CELLS = 4_000_000
+
+    def _similarity_block(self, query_vectors: List[Dict[str, float]], n: int) -> np.ndarray:
+        """
+        Cosine similarity of each query vector to every row (queries x rows). The
+        postings of the queries' terms are scattered into a dense rows-by-terms
+        block (each read once, whatever the number of queries) and multiplied by
+        the stacked query vectors; blocks of terms keep that under _BLOCK_CELLS.
+        """
+        if len(query_vectors) == 1:
+            # Single query: a sparse mat-vec, only the columns of the query's terms contribute
+            query_vector = query_vectors[0]
+            if not query_vector:
+                return np.zeros((1, n))
+            rows = np.concatenate([self._postings[term][0] for term in query_vector])
+            weights = np.concatenate([self._postings[term][1] * q for term, q in query_vector.items()])
+            return np.bincount(rows, weights=weights, minlength=n)[None, :]
+
+        terms = sorted({term for query_vector in query_vectors for term in query_vector})
+        similarity = np.zeros((n, len(query_vectors)))
+        if not terms:
+            return similarity.T
+        column = {term: j for j, term in enumerate(terms)}
+        queries = np.zeros((len(terms), len(query_vectors)))
+        for i, query_vector in enumerate(query_vectors):
+            for term, weight in query_vector.items():
+                queries[column[term], i] = weight
+
+        step = max(1, self._BLOCK_CELLS // max(n, 1))
+        for start in range(0, len(terms), step):
+            block_terms = terms[start:start + step]
+            documents = np.zeros((n, len(block_terms)))
+            for j, term in enumerate(block_terms):
+                rows, weights = self._postings[term]
+                documents[rows, j] = weights
+            similarity += documents @ queries[start:start + step]
+        return similarity.T
+
+    def _rank(self, query_vector: Dict[str, float], similarity: np.ndarray, conflicts: np.ndarray,
+              triggers: np.ndarray, listing_ids: Optional[List[int]],
+              min_score: Optional[float], limit: Optional[int]) -> List[Dict]:
+        """Final scores, filtering and result records for one query (caller holds the lock)."""
+        n = self._size
+        if listing_ids is None:
+            rows = np.arange(n) if not self._dead else np.array(sorted(self._row_of.values()), dtype=np.int64)
+        else:
+            rows = np.array([self._row_of[i] for i in listing_ids if i in self._row_of], dtype=np.int64)
+        scores = np.clip(BASE_SCORE + SIMILARITY_WEIGHT * similarity[rows] - CONFLICT_PENALTY * conflicts[rows],
+                         0.0, 1.0)
+        if min_score is not None:
+            keep = scores > min_score
+            rows, scores = rows[keep], scores[keep]
+        if limit is not None and limit < len(rows):
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+        # Stable sort on (-score, row) so ties keep listing order
+        order = np.lexsort((rows, -scores))
+
+        active_triggers = [_TRIGGERS[t] for t in np.flatnonzero(triggers)]
+        results = []
+        for position in order:
+            row = rows[position]
+            vector = self._vectors[row]
+            results.append({
+                "listing_id": int(self._ids[row]),
+                "score": float(scores[position]),
+                "similarity": float(similarity[row]),
+                "matched_terms": [term for term in query_vector if term in vector],
+                "conflicts": [
+                    (trigger, phrase) for trigger in active_triggers for phrase in OPPOSITES[trigger]
+                    if self._phrases[row, _PHRASE_INDEX[phrase]]
+                ] if conflicts[row] else []
+            })
+        return results
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def rebuild_matcher() -> TfidfMatcher:
+    """Re-index every listing from scratch (on startup, or when explicitly asked)."""
+    from tools import listings_version, load_listings
+    matcher = _shared_matcher()
+    # Read the version first: a write racing with the load just triggers another rebuild
+    version = listings_version()
+    matcher.build(load_listings(), version)
+    return matcher
+
+
+def _shared_matcher() -> TfidfMatcher:
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            from tools import add_listing_listener
+            _matcher = TfidfMatcher()
+            add_listing_listener(_matcher.apply_change)
+        return _matcher
+
+
+def get_matcher() -> TfidfMatcher:
+    """
+    The shared matcher. Listing writes in this process update it through change
+    events; a version it didn't see an event for (e.g. another worker's write)
+    triggers a full rebuild.
+    """
+    from tools import listings_version
+    matcher = _shared_matcher()
+    if matcher.version is None or matcher.version != listings_version():
+        rebuild_matcher()
+    return matcher
+
+
+def _format_matches(results: List[Dict], names: Dict[int, str], default_reasoning: str) -> List[Dict]:
+    matches = []
+    for result in results:
+        reasoning_parts = []
+        if result["matched_terms"]:
+            reasoning_parts.append(f"shared terms: {', '.join(result['matched_terms'])}")
+        for trigger, phrase in result["conflicts"]:
+            reasoning_parts.append(f"conflict: {trigger} vs {phrase}")
+        matches.append({
+            "host_id": result["listing_id"],
+            "name": names.get(result["listing_id"], "Unknown"),
+            "compatibility_score": round(result["score"], 3),
+            "reasoning": "; ".join(reasoning_parts) or default_reasoning
+        })
+    return matches
+
+
+def rank_hosts(visitor_query: str, hosts: List[Dict], default_reasoning: str = "TF-IDF similarity") -> List[Dict]:
+    """
+    Rank the given hosts for a visitor in the run_matching_agent output format.
+
+    Returns:
+        [{"host_id", "name", "compatibility_score", "reasoning"}, ...] best first,
+        without matches scoring MIN_SCORE or less
+    """
+    names = {host.get("id"): host.get("name", "Unknown") for host in hosts}
+    results = get_matcher().score(visitor_query, list(names), min_score=MIN_SCORE)
+    return _format_matches(results, names, default_reasoning)
+
+
+def rank_for_stay(visitor_query: str, nights: List[str], min_capacity: int = 1,
+                  default_reasoning: str = "TF-IDF similarity") -> List[Dict]:
+    """Rank every host free on all of `nights`, using the matcher's own date index."""
+    matcher = get_matcher()
+    candidates = matcher.available(nights, min_capacity)
+    results = matcher.score(visitor_query, candidates, min_score=MIN_SCORE)
+    return _format_matches(results, {r["listing_id"]: matcher.name(r["listing_id"]) for r in results},
+                           default_reasoning)
+
+
+def rank_many_for_stays(stays: List[tuple], default_reasoning: str = "TF-IDF similarity",
+                        limit: Optional[int] = None) -> List[List[Dict]]:
+    """
+    rank_for_stay for many (visitor_query, nights, min_capacity) requests, all
+    scored against the host matrix in one score_many pass.
+    """
+    matcher = get_matcher()
+    candidates = [matcher.available(nights, min_capacity) for _, nights, min_capacity in stays]
+    results = matcher.score_many([query for query, _, _ in stays], candidates, min_score=MIN_SCORE, limit=limit)
+    return [
+        _format_matches(result, {r["listing_id"]: matcher.name(r["listing_id"]) for r in result}, default_reasoning)
+        for result in results
+    ]
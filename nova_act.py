@@ -3,34 +3,222 @@ Nova Act - AI Orchestration Layer
 Orchestrates AI logic: queries Dedalus for events, uses Claude to filter/summarize them,
 and formats responses for users based on their interests.
 """
-import httpx
+import asyncio
 import json
-from typing import List, Dict, Optional
+import os
+import threading
+from typing import AsyncIterator, Awaitable, List, Dict, Optional, Tuple
 from knot import Knot
+from matcher import TextIndex, rank_texts
+from async_runtime import get_http_client, create_message, stream_message
+from cache import SingleFlight, TTLCache
+from event_repository import event_repository
+from llm_cache import LLMResponseCache, normalize_query, scope_key
 
 try:
-    from anthropic import Anthropic
+    import anthropic  # noqa: F401 - calls go through the shared client in async_runtime
     ANTHROPIC_AVAILABLE = True
 except ImportError:
     ANTHROPIC_AVAILABLE = False
     print("Warning: anthropic package not installed. Claude AI features will be limited.")
 
+# Time limits (seconds) for the retrieval stages feeding a recommendation; a stage
+# that fails or overruns contributes an empty result instead of failing the request
+LISTINGS_STAGE_TIMEOUT = float(os.getenv("ROOMIE_LISTINGS_STAGE_TIMEOUT", "2"))
+EVENTS_STAGE_TIMEOUT = float(os.getenv("ROOMIE_EVENTS_STAGE_TIMEOUT", "5"))
+
+# Candidate generation for Claude prompts: only the top locally ranked hosts/events
+# are sent, and their JSON is capped at roughly PROMPT_TOKEN_BUDGET tokens, so prompt
+# size (and LLM latency/cost) stays flat as the catalog grows
+SHORTLIST_HOSTS = int(os.getenv("ROOMIE_SHORTLIST_HOSTS", "15"))
+SHORTLIST_EVENTS = int(os.getenv("ROOMIE_SHORTLIST_EVENTS", "15"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("ROOMIE_PROMPT_TOKEN_BUDGET", "3000"))
+# Rough tokenizer-free estimate used for the budget
+CHARS_PER_TOKEN = 4
+# Longer free-text fields (descriptions) are clipped to this many characters
+MAX_FIELD_CHARS = 300
+
+# Successful AI event recommendations, persisted across restarts and shared by workers;
+# near-identical interests against the same catalog reuse one Claude answer
+recommendation_cache = LLMResponseCache(
+    os.getenv("ROOMIE_LLM_CACHE_PATH", "llm_cache.db"),
+    max_entries=int(os.getenv("ROOMIE_LLM_CACHE_MAX_ENTRIES", "5000")),
+    max_bytes=int(os.getenv("ROOMIE_LLM_CACHE_MAX_BYTES", "50000000")),
+    max_age=float(os.getenv("ROOMIE_LLM_CACHE_MAX_AGE", "604800")),
+    similarity=float(os.getenv("ROOMIE_LLM_CACHE_SIMILARITY", "0.9")),
+    max_candidates=int(os.getenv("ROOMIE_LLM_CACHE_MAX_CANDIDATES", "200"))
+)
+
+# Concurrent identical Dedalus fetches and Claude recommendations share one upstream call
+ai_flights = SingleFlight()
+
+# Single events read through from Dedalus when they aren't in the local repository;
+# "not found" answers are cached too, so a bad id doesn't hit Dedalus on every request
+remote_event_cache = TTLCache(
+    maxsize=int(os.getenv("ROOMIE_EVENT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("ROOMIE_EVENT_CACHE_TTL", "60"))
+)
+_NOT_CACHED = object()
+
+
+async def gather_stages(stages: Dict[str, Tuple[Awaitable, float, object]]) -> Tuple[Dict, List[str]]:
+    """
+    Run independent retrieval stages concurrently, each under its own timeout,
+    so the total wait is the slowest stage rather than the sum.
+    
+    Args:
+        stages: name -> (awaitable, timeout in seconds, fallback value)
+    
+    Returns:
+        ({name: result or fallback}, [names of stages that fell back])
+    """
+    partial = []
+    
+    async def run(name, awaitable, timeout, fallback):
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except Exception as e:
+            print(f"Warning: {name} stage unavailable ({type(e).__name__}: {e}); continuing without it")
+            partial.append(name)
+            return fallback
+    
+    results = await asyncio.gather(*(run(name, *stage) for name, stage in stages.items()))
+    return dict(zip(stages, results)), partial
+
+
+def catalog_version(events: List[Dict]) -> str:
+    """
+    Content hash of an event list: any added, removed or edited event changes it.
+    Only for lists of unknown origin (Dedalus); callers with events from the local
+    repository pass its fingerprint and their filters as `catalog` instead.
+    """
+    return scope_key(events)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def compact_json(items: List[Dict], token_budget: int) -> str:
+    """
+    Compact JSON array of the leading items that fit in token_budget (at least one),
+    with long strings clipped to MAX_FIELD_CHARS. Items should be best-first.
+    """
+    encoded = []
+    used = 2  # the brackets
+    for item in items:
+        clipped = {
+            key: value[:MAX_FIELD_CHARS] + "..." if isinstance(value, str) and len(value) > MAX_FIELD_CHARS else value
+            for key, value in item.items()
+        }
+        entry = json.dumps(clipped, separators=(",", ":"), ensure_ascii=False)
+        if encoded and (used + len(entry) + 1) > token_budget * CHARS_PER_TOKEN:
+            break
+        encoded.append(entry)
+        used += len(entry) + 1
+    return "[" + ",".join(encoded) + "]"
+
+
+def event_text(event: Dict) -> str:
+    """The searchable text of an event, for local ranking."""
+    tags = " ".join(str(tag) for tag in (event.get("tags") or []))
+    return " ".join(str(event.get(field) or "") for field in ("title", "description", "category")) + " " + tags
+
+
+# (repository version, its events, their TextIndex, row of each event by id()):
+# rebuilt only when the event repository reloads
+_event_text_index = None
+_event_text_index_lock = threading.Lock()
+
+
+def _get_event_text_index():
+    """The TF-IDF index over every repository event, built once per repository version."""
+    global _event_text_index
+    version = event_repository.version()
+    cached = _event_text_index
+    if cached is None or cached[0] != version:
+        with _event_text_index_lock:
+            cached = _event_text_index
+            if cached is None or cached[0] != version:
+                catalog = event_repository.all()
+                cached = (version, catalog, TextIndex([event_text(e) for e in catalog]),
+                          {id(event): row for row, event in enumerate(catalog)})
+                _event_text_index = cached
+    return cached
+
+
+def shortlist_events(query: str, events: List[Dict], limit: int) -> List[Dict]:
+    """
+    The `limit` events most similar to the query (TF-IDF), best first. Repository
+    events (whole catalog or a filtered page) reuse the cached catalog index; any
+    other list, e.g. from Dedalus, gets a one-off index.
+    """
+    _, catalog, index, rows = _get_event_text_index()
+    positions = [rows.get(id(event)) for event in events]
+    if all(row is not None and catalog[row] is event for row, event in zip(positions, events)):
+        return [events[i] for i in index.rank(query, limit, rows=positions)]
+    return [events[i] for i in rank_texts(query, [event_text(e) for e in events], limit)]
+
 
 class NovaAct:
     """AI orchestration for event recommendations."""
     
+    # Output format for the streamed combined ranking: one pick per line, so each
+    # can be shown as soon as Claude finishes writing it
+    COMBINED_STREAM_FORMAT = """Return your response as JSON Lines: one JSON object per line and nothing else, in this order:
+{{"kind": "host", "host_id": <id>, "relevance_score": <0.0-1.0>, "reasoning": "<brief explanation>", "highlights": ["<feature1>", "<feature2>"]}}
+(one line per recommended host, most relevant first)
+{{"kind": "event", "event_id": <id>, "relevance_score": <0.0-1.0>, "reasoning": "<brief explanation>", "highlights": ["<feature1>", "<feature2>"]}}
+(one line per recommended event, most relevant first)
+{{"kind": "insights", "text": "<overall insights about how hosts and events work together>"}}
+
+Focus on the top {max_hosts} hosts and top {max_events} events."""
+    
     def __init__(self):
         self.knot = Knot()
-        self.claude_client = None
+        self.claude_api_key = None
         
         if ANTHROPIC_AVAILABLE:
             try:
                 claude_config = self.knot.get_claude_config()
-                self.claude_client = Anthropic(api_key=claude_config["api_key"])
+                self.claude_api_key = claude_config["api_key"]
                 self.claude_model = claude_config["model"]
             except Exception as e:
                 print(f"Warning: Could not initialize Claude client: {e}")
     
+    @property
+    def ai_enabled(self) -> bool:
+        """Whether Claude is configured for this process."""
+        return self.claude_api_key is not None
+    
+    async def ask_claude(self, prompt: str, max_tokens: int):
+        """Send a single-turn prompt through the shared, concurrency-limited Claude client."""
+        return await create_message(
+            self.claude_api_key,
+            model=self.claude_model,
+            max_tokens=max_tokens,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        )
+    
+    def stream_claude(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        """Streaming counterpart of ask_claude: yields the response text as it is generated."""
+        return stream_message(
+            self.claude_api_key,
+            model=self.claude_model,
+            max_tokens=max_tokens,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        )
+    
     async def get_events_from_dedalus(
         self,
         category: Optional[str] = None,
@@ -54,20 +242,57 @@ class NovaAct:
         if tags:
             params["tags"] = tags
         
+        key = ("dedalus_events", dedalus_url, tuple(sorted(params.items())))
+        # Each caller gets its own list, so one can't reorder another's results
+        return list(await ai_flights.do(key, lambda: self._fetch_events(dedalus_url, params)))
+    
+    @staticmethod
+    async def _fetch_events(dedalus_url: str, params: Dict) -> List[Dict]:
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(dedalus_url, params=params)
-                response.raise_for_status()
-                return response.json()
+            # Shared keep-alive client: no new connection/TLS handshake per call
+            response = await get_http_client().get(dedalus_url, params=params, timeout=10.0)
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             print(f"Error fetching events from Dedalus: {e}")
             return []
     
+    async def get_event(self, event_id: int) -> Optional[Dict]:
+        """One event: from the local event repository, else read through from Dedalus."""
+        event = await asyncio.to_thread(event_repository.get, event_id)
+        if event is not None:
+            return event
+        return await self.get_event_from_dedalus(event_id)
+    
+    async def get_event_from_dedalus(self, event_id: int) -> Optional[Dict]:
+        """GET /events/{id} on Dedalus (None if it doesn't exist or can't be reached)."""
+        event_url = self.knot.get_dedalus_url(f"events/{event_id}")
+        event = remote_event_cache.get(event_url, _NOT_CACHED)
+        if event is not _NOT_CACHED:
+            return event
+        try:
+            event = await ai_flights.do(("dedalus_event", event_url), lambda: self._fetch_event(event_url))
+        except Exception as e:
+            # Not cached: the next request tries again
+            print(f"Error fetching event {event_id} from Dedalus: {e}")
+            return None
+        remote_event_cache.set(event_url, event)
+        return event
+    
+    @staticmethod
+    async def _fetch_event(event_url: str) -> Optional[Dict]:
+        response = await get_http_client().get(event_url, timeout=10.0)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+    
     async def get_ai_recommendations(
         self,
         user_interests: str,
         events: List[Dict],
-        max_recommendations: int = 5
+        max_recommendations: int = 5,
+        catalog: Optional[tuple] = None
     ) -> Dict:
         """
         Use Claude AI to filter and recommend events based on user interests.
@@ -76,11 +301,13 @@ class NovaAct:
             user_interests: Description of user's interests (e.g., "I love technology, free events, and social gatherings")
             events: List of events from Dedalus
             max_recommendations: Maximum number of recommendations to return
+            catalog: What `events` is, e.g. (event repository fingerprint, filters); identifies
+                cached answers for it (default: a hash of the events themselves)
         
         Returns:
             Dictionary with recommended events and reasoning
         """
-        if not self.claude_client or not events:
+        if not self.ai_enabled or not events:
             # Fallback: return all events if Claude is not available
             return {
                 "recommendations": events[:max_recommendations],
@@ -88,27 +315,44 @@ class NovaAct:
                 "ai_enabled": False
             }
         
-        # Prepare events summary for Claude
-        events_summary = []
-        for event in events:
-            events_summary.append({
-                "id": event.get("id"),
-                "title": event.get("title"),
-                "description": event.get("description"),
-                "date": event.get("date"),
-                "time": event.get("time"),
-                "location": event.get("location"),
-                "category": event.get("category"),
-                "cost": event.get("cost", 0),
-                "tags": event.get("tags", [])
-            })
+        if catalog is None:
+            catalog = catalog_version(events)
+        cache_scope = scope_key("event_recommendations", catalog, self.claude_model, max_recommendations)
+        try:
+            # SQLite blocks: keep it off the event loop
+            cached = await asyncio.to_thread(recommendation_cache.get, cache_scope, user_interests)
+        except Exception as e:
+            print(f"Warning: recommendation cache unavailable: {e}")
+            cached = None
+        if cached is not None:
+            return cached
+        
+        key = (cache_scope, normalize_query(user_interests))
+        return await ai_flights.do(
+            key, lambda: self._claude_recommendations(user_interests, events, max_recommendations, cache_scope)
+        )
+    
+    async def _claude_recommendations(
+        self,
+        user_interests: str,
+        events: List[Dict],
+        max_recommendations: int,
+        cache_scope: str
+    ) -> Dict:
+        """The Claude call behind get_ai_recommendations; successful answers are cached under cache_scope."""
+        # Prepare events summary for Claude: only the best local candidates
+        # Ranking the catalog is CPU-bound: keep it off the event loop
+        candidates = await asyncio.to_thread(
+            shortlist_events, user_interests, events, max(SHORTLIST_EVENTS, max_recommendations)
+        )
+        events_summary = [self._event_summary(event) for event in candidates]
         
         prompt = f"""You are an event recommendation assistant for a college campus platform.
 
 User's interests: {user_interests}
 
 Available events:
-{json.dumps(events_summary, indent=2)}
+{compact_json(events_summary, PROMPT_TOKEN_BUDGET)}
 
 Please:
 1. Analyze which events best match the user's interests
@@ -132,16 +376,7 @@ Return your response as a JSON object with this structure:
 Focus on the top {max_recommendations} most relevant events."""
         
         try:
-            message = self.claude_client.messages.create(
-                model=self.claude_model,
-                max_tokens=2000,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            message = await self.ask_claude(prompt, max_tokens=2000)
             
             # Parse Claude's response
             response_text = message.content[0].text
@@ -168,11 +403,16 @@ Focus on the top {max_recommendations} most relevant events."""
                         "highlights": rec.get("highlights", [])
                     })
             
-            return {
+            result = {
                 "recommendations": recommendations,
                 "summary": ai_response.get("summary", ""),
                 "ai_enabled": True
             }
+            try:
+                await asyncio.to_thread(recommendation_cache.set, cache_scope, user_interests, result)
+            except Exception as e:
+                print(f"Warning: could not cache recommendations: {e}")
+            return result
             
         except Exception as e:
             print(f"Error getting AI recommendations: {e}")
@@ -219,7 +459,7 @@ Focus on the top {max_recommendations} most relevant events."""
         
         # Step 2: If AI is enabled and user interests provided, get AI recommendations
         recommendations = None
-        if use_ai and user_interests and self.claude_client:
+        if use_ai and user_interests and self.ai_enabled:
             recommendations = await self.get_ai_recommendations(
                 user_interests=user_interests,
                 events=events,
@@ -234,10 +474,9 @@ Focus on the top {max_recommendations} most relevant events."""
     
     async def summarize_event(self, event_id: int) -> Optional[str]:
         """Get an AI-generated summary of a specific event."""
-        events = await self.get_events_from_dedalus()
-        event = next((e for e in events if e.get("id") == event_id), None)
+        event = await self.get_event(event_id)
         
-        if not event or not self.claude_client:
+        if not event or not self.ai_enabled:
             return None
         
         prompt = f"""Provide a brief, engaging summary of this campus event:
@@ -253,68 +492,59 @@ Tags: {', '.join(event.get('tags', []))}
 Create a 2-3 sentence summary that highlights why students would want to attend this event."""
         
         try:
-            message = self.claude_client.messages.create(
-                model=self.claude_model,
-                max_tokens=200,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            message = await self.ask_claude(prompt, max_tokens=200)
             return message.content[0].text
         except Exception as e:
             print(f"Error generating event summary: {e}")
             return None
     
-    async def get_combined_recommendations(
-        self,
-        user_preferences: str,
-        date_needed: Optional[str] = None,
-        max_hosts: int = 5,
-        max_events: int = 5
-    ) -> Dict:
+    def _available_hosts(self, date_needed: Optional[str]) -> List[Dict]:
         """
-        Get AI-powered combined recommendations for both hosts and events based on user preferences.
-        
-        Args:
-            user_preferences: Description of user's preferences (e.g., "I need a quiet place to stay and love tech events")
-            date_needed: Date the user needs accommodation (YYYY-MM-DD)
-            max_hosts: Maximum number of host recommendations
-            max_events: Maximum number of event recommendations
-        
-        Returns:
-            Dictionary with recommended hosts and events with AI reasoning
+        Hosts from listings, limited to those free for the whole stay if date_needed
+        is given (a date or a range like '2025-11-08 to 2025-11-10', as for /api/match).
         """
-        # Get hosts from listings
-        from tools import load_listings
-        all_hosts = load_listings()
+        from tools import find_hosts_for_stay, load_listings
         
-        # Filter hosts by date if provided
+        # Indexed by date: no scan over every listing
         if date_needed:
-            available_hosts = [
-                h for h in all_hosts 
-                if date_needed in h.get("available_dates", [])
-            ]
-        else:
-            available_hosts = all_hosts
-        
-        # Get events
-        events = await self.get_events_from_dedalus()
-        
-        if not self.claude_client:
-            # Fallback: return all without AI
-            return {
-                "hosts": available_hosts[:max_hosts],
-                "events": events[:max_events],
-                "reasoning": "AI recommendations unavailable.",
-                "ai_enabled": False
-            }
-        
-        # Prepare data for Claude
+            return find_hosts_for_stay(date_needed)
+        return load_listings()
+    
+    @staticmethod
+    def _event_summary(event: Dict) -> Dict:
+        """The fields of an event Claude sees."""
+        return {
+            "id": event.get("id"),
+            "title": event.get("title"),
+            "description": event.get("description"),
+            "date": event.get("date"),
+            "time": event.get("time"),
+            "location": event.get("location"),
+            "category": event.get("category"),
+            "cost": event.get("cost", 0),
+            "tags": event.get("tags", [])
+        }
+    
+    def _combined_prompt(
+        self,
+        user_preferences: str,
+        date_needed: Optional[str],
+        available_hosts: List[Dict],
+        events: List[Dict],
+        max_hosts: int,
+        max_events: int,
+        output_format: str
+    ) -> str:
+        """
+        The combined host/event ranking prompt, ending with the given output format.
+        Only a locally ranked shortlist of hosts and events is included, compactly
+        serialized within PROMPT_TOKEN_BUDGET (split between hosts and events).
+        """
+        shortlisted_hosts = [
+            rec["host"] for rec in self.rank_hosts_locally(user_preferences, available_hosts, max(SHORTLIST_HOSTS, max_hosts))
+        ]
         hosts_summary = []
-        for host in available_hosts:
+        for host in shortlisted_hosts:
             hosts_summary.append({
                 "id": host.get("id"),
                 "name": host.get("name"),
@@ -324,31 +554,25 @@ Create a 2-3 sentence summary that highlights why students would want to attend
                 "capacity": host.get("capacity", 1),
                 "available_dates": host.get("available_dates", [])
             })
+        events_summary = [
+            self._event_summary(event)
+            for event in shortlist_events(user_preferences, events, max(SHORTLIST_EVENTS, max_events))
+        ]
         
-        events_summary = []
-        for event in events:
-            events_summary.append({
-                "id": event.get("id"),
-                "title": event.get("title"),
-                "description": event.get("description"),
-                "date": event.get("date"),
-                "time": event.get("time"),
-                "location": event.get("location"),
-                "category": event.get("category"),
-                "cost": event.get("cost", 0),
-                "tags": event.get("tags", [])
-            })
+        # Hosts get half the budget; events get whatever is left
+        hosts_json = compact_json(hosts_summary, PROMPT_TOKEN_BUDGET // 2)
+        events_json = compact_json(events_summary, PROMPT_TOKEN_BUDGET - estimate_tokens(hosts_json))
         
-        prompt = f"""You are an AI assistant helping a student find the best accommodation and events on campus.
+        return f"""You are an AI assistant helping a student find the best accommodation and events on campus.
 
 User's Preferences: {user_preferences}
 Date Needed: {date_needed or "Not specified"}
 
 Available Hosts:
-{json.dumps(hosts_summary, indent=2)}
+{hosts_json}
 
 Available Events:
-{json.dumps(events_summary, indent=2)}
+{events_json}
 
 Please:
 1. Analyze which hosts best match the user's preferences (considering dorm_vibe, interests, and description)
@@ -357,7 +581,119 @@ Please:
 4. Rank hosts and events separately from most relevant to least relevant
 5. Provide brief reasoning for each recommendation
 
-Return your response as a JSON object with this structure:
+""" + output_format
+    
+    @staticmethod
+    def _host_recommendation(rec: Dict, available_hosts: List[Dict]) -> Optional[Dict]:
+        """Map one of Claude's host picks back to the full listing."""
+        host_id = rec.get("host_id")
+        host = next((h for h in available_hosts if h.get("id") == host_id), None)
+        if not host:
+            return None
+        return {
+            "host": host,
+            "relevance_score": rec.get("relevance_score", 0.5),
+            "reasoning": rec.get("reasoning", ""),
+            "highlights": rec.get("highlights", [])
+        }
+    
+    @staticmethod
+    def _event_recommendation(rec: Dict, events: List[Dict]) -> Optional[Dict]:
+        """Map one of Claude's event picks back to the full event."""
+        event_id = rec.get("event_id")
+        event = next((e for e in events if e.get("id") == event_id), None)
+        if not event:
+            return None
+        return {
+            "event": event,
+            "relevance_score": rec.get("relevance_score", 0.5),
+            "reasoning": rec.get("reasoning", ""),
+            "highlights": rec.get("highlights", [])
+        }
+    
+    @staticmethod
+    def rank_hosts_locally(user_preferences: str, available_hosts: List[Dict], max_hosts: int) -> List[Dict]:
+        """
+        Cheap host ranking without Claude (TF-IDF matcher), in the combined
+        recommendation format; padded with unranked hosts up to max_hosts.
+        """
+        from matcher import rank_hosts
+        by_id = {h.get("id"): h for h in available_hosts}
+        ranked = [
+            {
+                "host": by_id[match["host_id"]],
+                "relevance_score": match["compatibility_score"],
+                "reasoning": match["reasoning"],
+                "highlights": []
+            }
+            for match in rank_hosts(user_preferences, available_hosts)[:max_hosts]
+        ]
+        seen = {rec["host"].get("id") for rec in ranked}
+        ranked += [{"host": h, "relevance_score": 0.0, "reasoning": "", "highlights": []}
+                   for h in available_hosts if h.get("id") not in seen][:max_hosts - len(ranked)]
+        return ranked
+    
+    @staticmethod
+    def rank_events_locally(user_preferences: str, events: List[Dict], max_events: int) -> List[Dict]:
+        """Keyword ranking of events without Claude; padded with unranked events up to max_events."""
+        ranked = get_keyword_based_recommendations(user_preferences, events, max_events)["recommendations"]
+        seen = {rec["event"].get("id") for rec in ranked}
+        ranked += [{"event": e, "relevance_score": 0.0, "reasoning": "", "highlights": []}
+                   for e in events if e.get("id") not in seen][:max_events - len(ranked)]
+        return ranked
+    
+    async def get_combined_recommendations(
+        self,
+        user_preferences: str,
+        date_needed: Optional[str] = None,
+        max_hosts: int = 5,
+        max_events: int = 5
+    ) -> Dict:
+        """
+        Get AI-powered combined recommendations for both hosts and events based on user preferences.
+        
+        Args:
+            user_preferences: Description of user's preferences (e.g., "I need a quiet place to stay and love tech events")
+            date_needed: Date the user needs accommodation (YYYY-MM-DD)
+            max_hosts: Maximum number of host recommendations
+            max_events: Maximum number of event recommendations
+        
+        Returns:
+            Dictionary with recommended hosts and events with AI reasoning
+        """
+        key = ("combined", self.claude_model if self.ai_enabled else None, normalize_query(user_preferences),
+               date_needed, max_hosts, max_events)
+        return await ai_flights.do(
+            key, lambda: self._combined_recommendations(user_preferences, date_needed, max_hosts, max_events)
+        )
+    
+    async def _combined_recommendations(
+        self,
+        user_preferences: str,
+        date_needed: Optional[str],
+        max_hosts: int,
+        max_events: int
+    ) -> Dict:
+        """The work behind get_combined_recommendations (one run per set of identical concurrent calls)."""
+        # Listings and events are independent: fetch them together
+        inputs, partial = await gather_stages({
+            "listings": (asyncio.to_thread(self._available_hosts, date_needed), LISTINGS_STAGE_TIMEOUT, []),
+            "events": (self.get_events_from_dedalus(), EVENTS_STAGE_TIMEOUT, [])
+        })
+        available_hosts, events = inputs["listings"], inputs["events"]
+        
+        if not self.ai_enabled:
+            # Fallback: return all without AI
+            return {
+                "hosts": available_hosts[:max_hosts],
+                "events": events[:max_events],
+                "reasoning": "AI recommendations unavailable.",
+                "ai_enabled": False,
+                "partial": partial
+            }
+        
+        # Shortlisting hosts and events is CPU-bound: keep it off the event loop
+        prompt = await asyncio.to_thread(self._combined_prompt, user_preferences, date_needed, available_hosts, events, max_hosts, max_events, """Return your response as a JSON object with this structure:
 {{
     "hosts": [
         {{
@@ -378,19 +714,10 @@ Return your response as a JSON object with this structure:
     "combined_insights": "<overall insights about how hosts and events work together>"
 }}
 
-Focus on the top {max_hosts} hosts and top {max_events} events."""
+Focus on the top {max_hosts} hosts and top {max_events} events.""".format(max_hosts=max_hosts, max_events=max_events))
         
         try:
-            message = self.claude_client.messages.create(
-                model=self.claude_model,
-                max_tokens=3000,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            message = await self.ask_claude(prompt, max_tokens=3000)
             
             # Parse Claude's response
             response_text = message.content[0].text
@@ -404,35 +731,21 @@ Focus on the top {max_hosts} hosts and top {max_events} events."""
                 ai_response = {"hosts": [], "events": [], "combined_insights": response_text}
             
             # Map recommendations back to full data
-            recommended_hosts = []
-            for rec in ai_response.get("hosts", [])[:max_hosts]:
-                host_id = rec.get("host_id")
-                host = next((h for h in available_hosts if h.get("id") == host_id), None)
-                if host:
-                    recommended_hosts.append({
-                        "host": host,
-                        "relevance_score": rec.get("relevance_score", 0.5),
-                        "reasoning": rec.get("reasoning", ""),
-                        "highlights": rec.get("highlights", [])
-                    })
-            
-            recommended_events = []
-            for rec in ai_response.get("events", [])[:max_events]:
-                event_id = rec.get("event_id")
-                event = next((e for e in events if e.get("id") == event_id), None)
-                if event:
-                    recommended_events.append({
-                        "event": event,
-                        "relevance_score": rec.get("relevance_score", 0.5),
-                        "reasoning": rec.get("reasoning", ""),
-                        "highlights": rec.get("highlights", [])
-                    })
+            recommended_hosts = [
+                rec for rec in (self._host_recommendation(r, available_hosts) for r in ai_response.get("hosts", [])[:max_hosts])
+                if rec
+            ]
+            recommended_events = [
+                rec for rec in (self._event_recommendation(r, events) for r in ai_response.get("events", [])[:max_events])
+                if rec
+            ]
             
             return {
                 "hosts": recommended_hosts,
                 "events": recommended_events,
                 "combined_insights": ai_response.get("combined_insights", ""),
-                "ai_enabled": True
+                "ai_enabled": True,
+                "partial": partial
             }
             
         except Exception as e:
@@ -444,6 +757,195 @@ Focus on the top {max_hosts} hosts and top {max_events} events."""
                 "events": [{"event": e, "relevance_score": 0.5, "reasoning": "", "highlights": []} 
                            for e in events[:max_events]],
                 "combined_insights": "AI recommendations temporarily unavailable.",
-                "ai_enabled": False
+                "ai_enabled": False,
+                "partial": partial
             }
+    
+    async def stream_combined_recommendations(
+        self,
+        user_preferences: str,
+        date_needed: Optional[str] = None,
+        max_hosts: int = 5,
+        max_events: int = 5
+    ) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of get_combined_recommendations: cheap local rankings
+        first, then Claude's picks one at a time as they are generated.
+        
+        Yields, in order:
+            {"type": "hosts", "hosts": [...]}      locally ranked hosts (no network)
+            {"type": "events", "events": [...]}    keyword-ranked events, once Dedalus answers
+            {"type": "host" | "event", "rank", "host" | "event", "relevance_score", "reasoning", "highlights"}
+                                                   each AI-refined pick as soon as it is complete
+            {"type": "insights", "text": ...}
+            {"type": "done", "hosts", "events", "combined_insights", "ai_enabled", "partial"}
+                                                   the final result, shaped like get_combined_recommendations
+        
+        The events fetch starts before the listings stage, so both run concurrently.
+        """
+        def load_and_rank_hosts():
+            available = self._available_hosts(date_needed)
+            return available, self.rank_hosts_locally(user_preferences, available, max_hosts)
+        
+        events_stage = asyncio.ensure_future(gather_stages({
+            "events": (self.get_events_from_dedalus(), EVENTS_STAGE_TIMEOUT, [])
+        }))
+        try:
+            inputs, partial = await gather_stages({
+                "listings": (asyncio.to_thread(load_and_rank_hosts), LISTINGS_STAGE_TIMEOUT, ([], []))
+            })
+            available_hosts, local_hosts = inputs["listings"]
+            yield {"type": "hosts", "hosts": local_hosts}
+            
+            inputs, events_partial = await events_stage
+        finally:
+            # Stop the fetch if the consumer went away before it finished
+            events_stage.cancel()
+        events = inputs["events"]
+        partial += events_partial
+        local_events = await asyncio.to_thread(self.rank_events_locally, user_preferences, events, max_events)
+        yield {"type": "events", "events": local_events}
+        
+        local_result = {"type": "done", "hosts": local_hosts, "events": local_events, "ai_enabled": False,
+                        "partial": partial}
+        if not self.ai_enabled:
+            yield {**local_result, "combined_insights": "AI recommendations unavailable."}
+            return
+        
+        prompt = await asyncio.to_thread(
+            self._combined_prompt, user_preferences, date_needed, available_hosts, events, max_hosts, max_events,
+            self.COMBINED_STREAM_FORMAT.format(max_hosts=max_hosts, max_events=max_events)
+        )
+        hosts, picked_events, insights = [], [], ""
+        
+        def parse(line: str) -> Optional[Dict]:
+            nonlocal insights
+            line = line.strip().rstrip(",")
+            if not line.startswith("{"):
+                return None
+            try:
+                item = json.loads(line)
+            except ValueError:
+                return None
+            kind = item.get("kind")
+            if kind == "host" and len(hosts) < max_hosts:
+                rec = self._host_recommendation(item, available_hosts)
+                if rec:
+                    hosts.append(rec)
+                    return {"type": "host", "rank": len(hosts), **rec}
+            elif kind == "event" and len(picked_events) < max_events:
+                rec = self._event_recommendation(item, events)
+                if rec:
+                    picked_events.append(rec)
+                    return {"type": "event", "rank": len(picked_events), **rec}
+            elif kind == "insights":
+                insights = item.get("text", "")
+                return {"type": "insights", "text": insights}
+            return None
+        
+        try:
+            buffer = ""
+            async for chunk in self.stream_claude(prompt, max_tokens=3000):
+                buffer += chunk
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    update = parse(line)
+                    if update:
+                        yield update
+            update = parse(buffer)
+            if update:
+                yield update
+        except Exception as e:
+            print(f"Error streaming combined recommendations: {e}")
+            yield {**local_result, "combined_insights": "AI recommendations temporarily unavailable."}
+            return
+        
+        yield {
+            "type": "done",
+            "hosts": hosts,
+            "events": picked_events,
+            "combined_insights": insights,
+            "ai_enabled": True,
+            "partial": partial
+        }
+
 
+def get_keyword_based_recommendations(user_interests: str, events: list, max_recommendations: int = 5) -> dict:
+    """
+    Fallback keyword-based recommendation system when Claude AI is not available.
+    Matches events based on keywords in titles, descriptions, tags, and categories.
+    """
+    if not events or not user_interests:
+        return {
+            "recommendations": [],
+            "summary": "No events available for recommendations.",
+            "ai_enabled": False
+        }
+    
+    # Extract keywords from user interests (lowercase for matching)
+    interest_lower = user_interests.lower()
+    keywords = [word.strip() for word in interest_lower.split() if len(word.strip()) > 2]
+    
+    # Score each event based on keyword matches
+    scored_events = []
+    for event in events:
+        score = 0
+        matches = []
+        
+        # Check title
+        title = (event.get("title", "") or "").lower()
+        for keyword in keywords:
+            if keyword in title:
+                score += 3
+                matches.append(f"title: '{keyword}'")
+        
+        # Check description
+        description = (event.get("description", "") or "").lower()
+        for keyword in keywords:
+            if keyword in description:
+                score += 2
+                if f"description: '{keyword}'" not in matches:
+                    matches.append(f"description: '{keyword}'")
+        
+        # Check tags
+        tags = [tag.lower() if isinstance(tag, str) else str(tag).lower() for tag in (event.get("tags", []) or [])]
+        for keyword in keywords:
+            if keyword in tags:
+                score += 4  # Tags are more specific, so higher weight
+                if f"tag: '{keyword}'" not in matches:
+                    matches.append(f"tag: '{keyword}'")
+        
+        # Check category
+        category = (event.get("category", "") or "").lower()
+        for keyword in keywords:
+            if keyword in category:
+                score += 2
+                if f"category: '{keyword}'" not in matches:
+                    matches.append(f"category: '{keyword}'")
+        
+        if score > 0:
+            scored_events.append({
+                "event": event,
+                "relevance_score": min(score / 10.0, 1.0),  # Normalize to 0-1
+                "reasoning": f"Matches your interests: {', '.join(matches[:3])}" if matches else "Relevant to your interests",
+                "highlights": matches[:3]
+            })
+    
+    # Sort by score (highest first)
+    scored_events.sort(key=lambda x: x["relevance_score"], reverse=True)
+    
+    # Take top recommendations
+    top_recommendations = scored_events[:max_recommendations]
+    
+    # Generate summary
+    if top_recommendations:
+        event_titles = [rec["event"].get("title", "Event") for rec in top_recommendations[:3]]
+        summary = f"Found {len(top_recommendations)} event(s) matching '{user_interests}': {', '.join(event_titles)}"
+    else:
+        summary = f"No events found matching '{user_interests}'. Try different keywords or browse all events."
+    
+    return {
+        "recommendations": top_recommendations,
+        "summary": summary,
+        "ai_enabled": False
+    }
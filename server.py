@@ -4,11 +4,14 @@ Run with: python server.py
 """
 from flask import Flask, request, jsonify, send_from_directory, session
 from flask_cors import CORS
-import asyncio
 import json
 import os
 from werkzeug.utils import secure_filename
-from ai_agent import run_matching_agent
+from ai_agent import run_matching_agent_cached, run_matching_batch, match_cache, match_flights
+from assignment import assign_visitors
+from event_repository import event_repository
+from async_runtime import run_async, create_message, stream_message, iter_async
+from nova_act import get_keyword_based_recommendations, recommendation_cache, remote_event_cache, ai_flights
 from auth import create_user, verify_user, get_user, add_role_to_user
 from tools import (
     load_listings, get_listing_by_id, get_listing_by_email, 
@@ -38,6 +41,112 @@ def make_session_permanent():
     if 'user_email' in session or 'guest' in session:
         session.permanent = True
 
+# Largest page a client can request from paginated endpoints
+MAX_PAGE_SIZE = 100
+# Most visitors accepted by one /api/match/batch call
+MAX_BATCH_SIZE = 100
+# Most visitors placed together by one /api/match/assign call
+MAX_ASSIGN_SIZE = 5000
+
+def parse_match_result(result) -> dict:
+    """
+    Turn the matching agent's output into the "matches" object of the response.
+    The agent may wrap its JSON in markdown or prose; unparseable output is
+    passed through as raw_output for the frontend to handle.
+    """
+    if not isinstance(result, str):
+        return result if isinstance(result, dict) else {"ranked_matches": []}
+    
+    import re
+    json_str = result.strip()
+    # Remove markdown code blocks if present
+    json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', json_str, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(1)
+    else:
+        # Try to find JSON object in the string
+        json_match = re.search(r'\{.*\}', json_str, re.DOTALL)
+        if json_match:
+            json_str = json_match.group(0)
+    
+    try:
+        parsed_result = json.loads(json_str)
+    except json.JSONDecodeError:
+        return {"raw_output": result, "ranked_matches": []}
+    return parsed_result if isinstance(parsed_result, dict) else {"ranked_matches": []}
+
+def parse_batch_requests(data, max_size: int = MAX_BATCH_SIZE) -> list:
+    """
+    Validate a /api/match/batch or /api/match/assign body
+    ({"requests": [{"visitor_query", "date_needed"}, ...]}).
+    Returns one (visitor_query, date_needed) pair per item, or an error string for an
+    invalid item; raises ValueError when the body as a whole is unusable.
+    """
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError("requests must be a non-empty list")
+    if len(items) > max_size:
+        raise ValueError(f"at most {max_size} requests per batch")
+    
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            parsed.append("each request must be an object")
+            continue
+        visitor_query = str(item.get('visitor_query') or '').strip()
+        date_needed = str(item.get('date_needed') or '').strip()
+        if not visitor_query:
+            parsed.append("visitor_query is required")
+        elif not date_needed:
+            parsed.append("date_needed is required")
+        else:
+            parsed.append((visitor_query, date_needed))
+    return parsed
+
+def batch_match_response(parsed: list, results: list) -> list:
+    """Per-request entries of the /api/match/batch response, in request order."""
+    results = iter(results)
+    entries = []
+    for item in parsed:
+        if isinstance(item, str):
+            entries.append({"success": False, "error": item})
+        else:
+            entries.append({
+                "success": True,
+                "visitor_query": item[0],
+                "date_needed": item[1],
+                "matches": parse_match_result(next(results))
+            })
+    return entries
+
+def assignment_response(parsed: list, placement: dict) -> dict:
+    """The /api/match/assign response body: one entry per request, in request order."""
+    assignments = iter(placement["assignments"])
+    entries = []
+    for item in parsed:
+        if isinstance(item, str):
+            entries.append({"success": False, "error": item})
+        else:
+            entries.append({
+                "success": True,
+                "visitor_query": item[0],
+                "date_needed": item[1],
+                "assignment": next(assignments)
+            })
+    return {
+        "success": True,
+        "results": entries,
+        "assigned": placement["assigned"],
+        "total_score": placement["total_score"],
+        "solver": placement["solver"]
+    }
+
+def _requested_fields():
+    """Parse the `fields` query parameter into a list of field names (None = all fields)."""
+    raw = request.args.get('fields', '')
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    return fields or None
+
 @app.route('/')
 def index():
     """Serve the login page as the home page."""
@@ -231,43 +340,13 @@ def match_visitor():
         if not date_needed:
             return jsonify({"error": "date_needed is required"}), 400
         
-        # Call the existing Dedalus Labs agent
-        result = asyncio.run(run_matching_agent(visitor_query, date_needed))
+        # Call the existing Dedalus Labs agent (cached per query, dates and listings version)
+        result = run_async(run_matching_agent_cached(visitor_query, date_needed))
         
-        # The agent returns a string (JSON), try to parse it
-        if isinstance(result, str):
-            # Try to extract JSON from markdown code blocks or plain text
-            import re
-            json_str = result.strip()
-            
-            # Remove markdown code blocks if present
-            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', json_str, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-            else:
-                # Try to find JSON object in the string
-                json_match = re.search(r'\{.*\}', json_str, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0)
-            
-            try:
-                parsed_result = json.loads(json_str)
-                return jsonify({
-                    "success": True,
-                    "matches": parsed_result
-                }), 200
-            except json.JSONDecodeError:
-                # If it's not valid JSON, try to return it as-is for frontend to handle
-                return jsonify({
-                    "success": True,
-                    "matches": {"raw_output": result}
-                }), 200
-        else:
-            # If it's already a dict/object
-            return jsonify({
-                "success": True,
-                "matches": result
-            }), 200
+        return jsonify({
+            "success": True,
+            "matches": parse_match_result(result)
+        }), 200
         
     except Exception as e:
         import traceback
@@ -278,18 +357,110 @@ def match_visitor():
             "details": error_details
         }), 500
 
+@app.route('/api/match/batch', methods=['POST'])
+def match_visitors_batch():
+    """
+    Match many visitors in one call (e.g. a coordinator placing hackathon attendees).
+    Body: {"requests": [{"visitor_query": ..., "date_needed": ...}, ...], "use_ai": true}
+    All requests are scored together against the hosts; invalid items get their own error.
+    """
+    if not session.get('guest', False) and 'user_email' not in session:
+        return jsonify({"error": "Authentication required. Please login or continue as guest."}), 401
+    
+    data = request.get_json(silent=True)
+    try:
+        parsed = parse_batch_requests(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        pairs = [item for item in parsed if not isinstance(item, str)]
+        results = run_async(run_matching_batch(pairs, use_ai=bool(data.get('use_ai', True)))) if pairs else []
+        return jsonify({
+            "success": True,
+            "results": batch_match_response(parsed, results)
+        }), 200
+    except Exception as e:
+        import traceback
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "details": traceback.format_exc()
+        }), 500
+
+@app.route('/api/match/assign', methods=['POST'])
+def assign_visitors_to_hosts():
+    """
+    Place a whole group of visitors at once (e.g. every hackathon attendee).
+    Body: {"requests": [{"visitor_query": ..., "date_needed": ...}, ...]}
+    Unlike /api/match/batch, each visitor gets one host and no host is given more
+    visitors than its capacity on any night. Visitors with the same stay are solved
+    together for the highest total compatibility; groups with different stays are
+    placed one after another, longest stay first, so the total is only optimal
+    within each group.
+    Visitors that can't be placed get "assignment": null.
+    """
+    if not session.get('guest', False) and 'user_email' not in session:
+        return jsonify({"error": "Authentication required. Please login or continue as guest."}), 401
+    
+    data = request.get_json(silent=True)
+    try:
+        parsed = parse_batch_requests(data, max_size=MAX_ASSIGN_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        placement = assign_visitors([item for item in parsed if not isinstance(item, str)])
+        return jsonify(assignment_response(parsed, placement)), 200
+    except Exception as e:
+        import traceback
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "details": traceback.format_exc()
+        }), 500
+
 @app.route('/api/listings', methods=['GET'])
 def get_all_listings():
-    """Get all available listings with average ratings."""
-    listings = load_listings()
-    from tools import get_average_rating
+    """
+    Get listings with average ratings, filtered, sorted and paginated server-side.
     
-    # Add average rating to each listing
-    for listing in listings:
-        listing['average_rating'] = get_average_rating(listing.get('id', 0))
-        listing['review_count'] = len(listing.get('reviews', []))
+    Query params: date (YYYY-MM-DD), check_out, min_capacity (or capacity), min_rating,
+    text, sort (id | rating | review_count), order (asc | desc), cursor, limit,
+    fields (comma-separated projection, e.g. fields=id,name,capacity,average_rating).
+    Without a limit every matching listing is returned.
+    """
+    from tools import query_listings, project_listing
     
-    return jsonify({"success": True, "listings": listings}), 200
+    try:
+        min_capacity = request.args.get('min_capacity') or request.args.get('capacity')
+        min_rating = request.args.get('min_rating')
+        limit = request.args.get('limit')
+        limit = int(limit) if limit else None
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be a positive integer")
+        
+        fields = _requested_fields()
+        result = query_listings(
+            date=request.args.get('date') or None,
+            check_out=request.args.get('check_out') or None,
+            min_capacity=int(min_capacity) if min_capacity else None,
+            min_rating=float(min_rating) if min_rating else None,
+            text=request.args.get('text') or None,
+            sort=request.args.get('sort', 'id'),
+            descending=request.args.get('order', 'asc').lower() == 'desc',
+            cursor=request.args.get('cursor') or None,
+            limit=min(limit, MAX_PAGE_SIZE) if limit else None
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    return jsonify({
+        "success": True,
+        "listings": [project_listing(listing, fields) for listing in result["listings"]],
+        "total_count": result["total_count"],
+        "next_cursor": result["next_cursor"]
+    }), 200
 
 @app.route('/api/listings/match', methods=['POST'])
 def match_listings():
@@ -305,58 +476,13 @@ def match_listings():
         if not visitor_query or not date_needed:
             return jsonify({"error": "visitor_query and date_needed are required"}), 400
         
-        # Call the existing Dedalus Labs agent
-        result = asyncio.run(run_matching_agent(visitor_query, date_needed))
-        
-        # Debug logging
-        print(f"AI Agent Result Type: {type(result)}")
-        print(f"AI Agent Result: {result}")
+        # Call the existing Dedalus Labs agent (cached per query, dates and listings version)
+        result = run_async(run_matching_agent_cached(visitor_query, date_needed))
         
-        # Parse the result
-        if isinstance(result, str):
-            import re
-            json_str = result.strip()
-            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', json_str, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-            else:
-                json_match = re.search(r'\{.*\}', json_str, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0)
-            
-            try:
-                parsed_result = json.loads(json_str)
-                print(f"Parsed result: {parsed_result}")
-                # Ensure the response has the expected structure
-                if isinstance(parsed_result, dict) and 'ranked_matches' in parsed_result:
-                    return jsonify({
-                        "success": True,
-                        "matches": parsed_result
-                    }), 200
-                else:
-                    # If it's already the matches object, wrap it
-                    return jsonify({
-                        "success": True,
-                        "matches": parsed_result if isinstance(parsed_result, dict) else {"ranked_matches": []}
-                    }), 200
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error: {e}")
-                return jsonify({
-                    "success": True,
-                    "matches": {"raw_output": result, "ranked_matches": []}
-                }), 200
-        else:
-            # If result is already a dict
-            if isinstance(result, dict):
-                return jsonify({
-                    "success": True,
-                    "matches": result
-                }), 200
-            else:
-                return jsonify({
-                    "success": True,
-                    "matches": {"ranked_matches": []}
-                }), 200
+        return jsonify({
+            "success": True,
+            "matches": parse_match_result(result)
+        }), 200
         
     except Exception as e:
         import traceback
@@ -368,15 +494,48 @@ def match_listings():
 
 @app.route('/api/listing/<int:listing_id>', methods=['GET'])
 def get_listing(listing_id):
-    """Get listing details by ID with average rating."""
+    """Get listing details by ID with average rating. Supports a `fields` projection."""
     listing = get_listing_by_id(listing_id)
     if listing:
-        from tools import get_average_rating
-        listing['average_rating'] = get_average_rating(listing_id)
-        listing['review_count'] = len(listing.get('reviews', []))
-        return jsonify({"success": True, "listing": listing}), 200
+        from tools import get_rating_summary, project_listing
+        summary = get_rating_summary(listing_id)
+        listing['average_rating'] = summary['average_rating']
+        listing['review_count'] = summary['review_count']
+        return jsonify({"success": True, "listing": project_listing(listing, _requested_fields())}), 200
     return jsonify({"error": "Listing not found"}), 404
 
+@app.route('/api/listing/<int:listing_id>/reviews', methods=['GET'])
+def get_listing_reviews_endpoint(listing_id):
+    """
+    Get a page of a listing's reviews.
+    
+    Query params: cursor (next_cursor from the previous page), limit (default 20),
+    order (asc = oldest first, the default | desc = newest first).
+    """
+    from tools import get_listing_reviews
+    
+    try:
+        limit = int(request.args.get('limit', 20))
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        page = get_listing_reviews(
+            listing_id,
+            cursor=request.args.get('cursor') or None,
+            limit=min(limit, MAX_PAGE_SIZE),
+            descending=request.args.get('order', 'asc').lower() == 'desc'
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    if page is None:
+        return jsonify({"error": "Listing not found"}), 404
+    return jsonify({
+        "success": True,
+        "reviews": page["reviews"],
+        "total_count": page["total_count"],
+        "next_cursor": page["next_cursor"]
+    }), 200
+
 @app.route('/api/listing/my-listings', methods=['GET'])
 def get_my_listings():
     """Get all listings for the current host with average ratings."""
@@ -388,13 +547,15 @@ def get_my_listings():
     if user and 'host' not in user.get('roles', []):
         add_role_to_user(session['user_email'], 'host')
     
-    from tools import get_listings_by_email, get_average_rating
+    from tools import get_listings_by_email, get_rating_summaries
     listings = get_listings_by_email(session['user_email'])
     
     # Add average rating to each listing
+    summaries = get_rating_summaries([listing.get('id', 0) for listing in listings])
     for listing in listings:
-        listing['average_rating'] = get_average_rating(listing.get('id', 0))
-        listing['review_count'] = len(listing.get('reviews', []))
+        summary = summaries[listing.get('id', 0)]
+        listing['average_rating'] = summary['average_rating']
+        listing['review_count'] = summary['review_count']
     
     return jsonify({"success": True, "listings": listings}), 200
 
@@ -622,163 +783,54 @@ def health_check():
     """Health check endpoint."""
     return jsonify({"status": "healthy", "service": "Roomie API"}), 200
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for the match result, AI recommendation and remote event caches, and coalesced calls."""
+    return jsonify({
+        "success": True,
+        "match_cache": match_cache.stats(),
+        "recommendation_cache": recommendation_cache.stats(),
+        "remote_event_cache": remote_event_cache.stats(),
+        "in_flight": {"matches": match_flights.stats(), "ai": ai_flights.stats()}
+    }), 200
+
 # ===== Events API Endpoints (Nova Act Integration) =====
 
+def load_events_file() -> list:
+    """All events from events_data/events.json (via the shared, in-memory event repository)."""
+    return event_repository.all()
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
     """
-    Get events directly from Dedalus events module.
+    Get events from the shared event repository (events_data/events.json), sorted by date.
+    Query params: category, date_from, date_to, free_only, tags (comma-separated),
+    cursor, limit. Without a limit every matching event is returned.
     """
     try:
-        category = request.args.get('category')
-        date_from = request.args.get('date_from')
-        date_to = request.args.get('date_to')
-        free_only = request.args.get('free_only', 'false').lower() == 'true'
-        tags = request.args.get('tags')
-        
-        # Load events directly from file using absolute path
-        import os
-        import json
-        
-        # Get absolute path to events file
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        events_file = os.path.join(base_dir, 'events_data', 'events.json')
-        
-        events = []
-        # Try to load from file first
-        if os.path.exists(events_file):
-            try:
-                with open(events_file, 'r') as f:
-                    events = json.load(f)
-            except Exception as e:
-                print(f"Error reading events file: {e}")
-                events = []
-        
-        # If no events, get defaults and save them
-        if not events or len(events) == 0:
-            from dedalus_events import get_default_events
-            events = get_default_events()
-            # Save defaults
-            os.makedirs(os.path.dirname(events_file), exist_ok=True)
-            try:
-                with open(events_file, 'w') as f:
-                    json.dump(events, f, indent=2)
-            except Exception as e:
-                print(f"Error saving events: {e}")
-        
-        # Apply filters
-        if category:
-            events = [e for e in events if e.get("category", "").lower() == category.lower()]
-        
-        if date_from:
-            events = [e for e in events if e.get("date", "") >= date_from]
-        
-        if date_to:
-            events = [e for e in events if e.get("date", "") <= date_to]
-        
-        if free_only:
-            events = [e for e in events if (e.get("cost", 0) == 0 or e.get("cost", 0) == 0.0 or e.get("cost") is None or e.get("cost") == "0" or e.get("cost") == "0.0")]
-        
-        if tags:
-            tag_list = [t.strip().lower() for t in tags.split(",")]
-            events = [e for e in events if any(tag in [t.lower() for t in e.get("tags", [])] for tag in tag_list)]
-        
-        # Sort by date
-        events.sort(key=lambda x: x.get("date", ""))
-        
-        return jsonify({
-            "success": True,
-            "events": events,
-            "total_count": len(events)
-        }), 200
-        
-    except Exception as e:
-        import traceback
-        return jsonify({
-            "success": False,
-            "error": str(e),
-            "details": traceback.format_exc()
-        }), 500
-
-def get_keyword_based_recommendations(user_interests: str, events: list, max_recommendations: int = 5) -> dict:
-    """
-    Fallback keyword-based recommendation system when Claude AI is not available.
-    Matches events based on keywords in titles, descriptions, tags, and categories.
-    """
-    if not events or not user_interests:
-        return {
-            "recommendations": [],
-            "summary": "No events available for recommendations.",
-            "ai_enabled": False
-        }
-    
-    # Extract keywords from user interests (lowercase for matching)
-    interest_lower = user_interests.lower()
-    keywords = [word.strip() for word in interest_lower.split() if len(word.strip()) > 2]
-    
-    # Score each event based on keyword matches
-    scored_events = []
-    for event in events:
-        score = 0
-        matches = []
-        
-        # Check title
-        title = (event.get("title", "") or "").lower()
-        for keyword in keywords:
-            if keyword in title:
-                score += 3
-                matches.append(f"title: '{keyword}'")
-        
-        # Check description
-        description = (event.get("description", "") or "").lower()
-        for keyword in keywords:
-            if keyword in description:
-                score += 2
-                if f"description: '{keyword}'" not in matches:
-                    matches.append(f"description: '{keyword}'")
-        
-        # Check tags
-        tags = [tag.lower() if isinstance(tag, str) else str(tag).lower() for tag in (event.get("tags", []) or [])]
-        for keyword in keywords:
-            if keyword in tags:
-                score += 4  # Tags are more specific, so higher weight
-                if f"tag: '{keyword}'" not in matches:
-                    matches.append(f"tag: '{keyword}'")
-        
-        # Check category
-        category = (event.get("category", "") or "").lower()
-        for keyword in keywords:
-            if keyword in category:
-                score += 2
-                if f"category: '{keyword}'" not in matches:
-                    matches.append(f"category: '{keyword}'")
-        
-        if score > 0:
-            scored_events.append({
-                "event": event,
-                "relevance_score": min(score / 10.0, 1.0),  # Normalize to 0-1
-                "reasoning": f"Matches your interests: {', '.join(matches[:3])}" if matches else "Relevant to your interests",
-                "highlights": matches[:3]
-            })
-    
-    # Sort by score (highest first)
-    scored_events.sort(key=lambda x: x["relevance_score"], reverse=True)
-    
-    # Take top recommendations
-    top_recommendations = scored_events[:max_recommendations]
-    
-    # Generate summary
-    if top_recommendations:
-        event_titles = [rec["event"].get("title", "Event") for rec in top_recommendations[:3]]
-        summary = f"Found {len(top_recommendations)} event(s) matching '{user_interests}': {', '.join(event_titles)}"
-    else:
-        summary = f"No events found matching '{user_interests}'. Try different keywords or browse all events."
+        limit = request.args.get('limit')
+        limit = int(limit) if limit else None
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be a positive integer")
+        
+        result = event_repository.query_page(
+            category=request.args.get('category'),
+            date_from=request.args.get('date_from'),
+            date_to=request.args.get('date_to'),
+            free_only=request.args.get('free_only', 'false').lower() == 'true',
+            tags=request.args.get('tags'),
+            cursor=request.args.get('cursor') or None,
+            limit=min(limit, MAX_PAGE_SIZE) if limit else None
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     
-    return {
-        "recommendations": top_recommendations,
-        "summary": summary,
-        "ai_enabled": False
-    }
+    return jsonify({
+        "success": True,
+        "events": result["events"],
+        "total_count": result["total_count"],
+        "next_cursor": result["next_cursor"]
+    }), 200
 
 @app.route('/api/events/recommendations', methods=['POST'])
 def get_event_recommendations():
@@ -788,10 +840,6 @@ def get_event_recommendations():
     """
     try:
         from nova_act import NovaAct
-        from dedalus_events import load_events
-        import asyncio
-        import os
-        import json
         
         data = request.get_json()
         if not data:
@@ -807,31 +855,8 @@ def get_event_recommendations():
         free_only = data.get('free_only', False)
         max_results = data.get('max_results', 10)
         
-        # Load events directly from file (same as /api/events endpoint)
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        events_file = os.path.join(base_dir, 'events_data', 'events.json')
-        
-        events = []
-        if os.path.exists(events_file):
-            try:
-                with open(events_file, 'r') as f:
-                    events = json.load(f)
-            except:
-                from dedalus_events import get_default_events
-                events = get_default_events()
-        else:
-            from dedalus_events import get_default_events
-            events = get_default_events()
-        
-        # Apply basic filters first
-        if category:
-            events = [e for e in events if e.get("category", "").lower() == category.lower()]
-        if date_from:
-            events = [e for e in events if e.get("date", "") >= date_from]
-        if date_to:
-            events = [e for e in events if e.get("date", "") <= date_to]
-        if free_only:
-            events = [e for e in events if e.get("cost", 0) == 0.0]
+        page = event_repository.query_page(category, date_from, date_to, free_only)
+        events = page["events"]
         
         # Use Nova Act for AI recommendations
         nova_act = NovaAct()
@@ -839,12 +864,13 @@ def get_event_recommendations():
         # Get AI recommendations using the events we already loaded
         recommendations = None
         if user_interests:
-            if nova_act.claude_client:
+            if nova_act.ai_enabled:
                 # Use Claude AI if available
-                recommendations = asyncio.run(nova_act.get_ai_recommendations(
+                recommendations = run_async(nova_act.get_ai_recommendations(
                     user_interests=user_interests,
                     events=events,
-                    max_recommendations=max_results
+                    max_recommendations=max_results,
+                    catalog=(page["fingerprint"], category, date_from, date_to, bool(free_only))
                 ))
             else:
                 # Fallback: simple keyword-based matching
@@ -871,15 +897,12 @@ def get_event_recommendations():
 
 @app.route('/api/events/<int:event_id>', methods=['GET'])
 def get_event(event_id):
-    """Get a specific event by ID from Dedalus."""
+    """Get a specific event by ID: from the shared event repository, else from Dedalus."""
     try:
-        from nova_act import NovaAct
-        import asyncio
-        
-        nova_act = NovaAct()
-        events = asyncio.run(nova_act.get_events_from_dedalus())
-        
-        event = next((e for e in events if e.get("id") == event_id), None)
+        event = event_repository.get(event_id)
+        if event is None:
+            from nova_act import NovaAct
+            event = run_async(NovaAct().get_event_from_dedalus(event_id))
         
         if not event:
             return jsonify({"error": "Event not found"}), 404
@@ -903,7 +926,6 @@ def get_combined_match():
     """
     try:
         from nova_act import NovaAct
-        import asyncio
         
         data = request.get_json()
         if not data:
@@ -918,7 +940,7 @@ def get_combined_match():
         max_events = data.get('max_events', 5)
         
         nova_act = NovaAct()
-        result = asyncio.run(nova_act.get_combined_recommendations(
+        result = run_async(nova_act.get_combined_recommendations(
             user_preferences=user_preferences,
             date_needed=date_needed,
             max_hosts=max_hosts,
@@ -930,7 +952,8 @@ def get_combined_match():
             "hosts": result.get("hosts", []),
             "events": result.get("events", []),
             "combined_insights": result.get("combined_insights", ""),
-            "ai_enabled": result.get("ai_enabled", False)
+            "ai_enabled": result.get("ai_enabled", False),
+            "partial": result.get("partial", [])
         }), 200
         
     except Exception as e:
@@ -941,6 +964,32 @@ def get_combined_match():
             "details": traceback.format_exc()
         }), 500
 
+@app.route('/api/combined/match/stream', methods=['POST'])
+def get_combined_match_stream():
+    """
+    Streaming combined recommendations (text/event-stream): locally ranked hosts
+    and events first, then Claude's refined picks as they are generated.
+    See NovaAct.stream_combined_recommendations for the event sequence.
+    """
+    from flask import Response
+    from nova_act import NovaAct
+    
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+    
+    user_preferences = data.get('preferences', '').strip()
+    if not user_preferences:
+        return jsonify({"error": "preferences field is required"}), 400
+    
+    updates = NovaAct().stream_combined_recommendations(
+        user_preferences=user_preferences,
+        date_needed=data.get('date_needed'),
+        max_hosts=data.get('max_hosts', 5),
+        max_events=data.get('max_events', 5)
+    )
+    return Response(iter_async(sse_stream(updates)), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 # ===== Chatbot API Endpoint =====
 
 @app.route('/api/chatbot/status', methods=['GET'])
@@ -963,54 +1012,8 @@ def chatbot_status():
             "error": str(e)
         }), 200
 
-@app.route('/api/chatbot', methods=['POST'])
-def chatbot():
-    """
-    Chatbot endpoint that uses Claude API to help users navigate the site.
-    Provides accommodation and event recommendations based on user queries.
-    """
-    try:
-        from knot import Knot
-        from anthropic import Anthropic
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
-        
-        message = data.get('message', '').strip()
-        conversation_history = data.get('conversation_history', [])
-        
-        if not message:
-            return jsonify({"error": "message field is required"}), 400
-        
-        # Initialize Claude client
-        try:
-            knot = Knot()
-            claude_config = knot.get_claude_config()
-            claude_client = Anthropic(api_key=claude_config["api_key"])
-            claude_model = claude_config["model"]
-        except Exception as e:
-            return jsonify({
-                "success": False,
-                "error": f"Claude API not configured: {str(e)}"
-            }), 500
-        
-        # Load listings and events for context
-        listings = load_listings()
-        events = []
-        try:
-            import os
-            import json
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            events_file = os.path.join(base_dir, 'events_data', 'events.json')
-            if os.path.exists(events_file):
-                with open(events_file, 'r') as f:
-                    events = json.load(f)
-        except:
-            pass
-        
-        # Build system prompt based on user's requirements
-        system_prompt = """You are an AI assistant helping someone find appropriate accommodation options. You will be provided with a location and the user's preferences. Always ask the user about where are they going, how long do they plan to stay, what's their preference/what do they like, what's their personality to help analyze the best result. Ask for users permission is important too.
+# Chatbot prompt; {location}, {user_preferences} and {events} are filled per request
+CHATBOT_PROMPT = """You are an AI assistant helping someone find appropriate accommodation options. You will be provided with a location and the user's preferences. Always ask the user about where are they going, how long do they plan to stay, what's their preference/what do they like, what's their personality to help analyze the best result. Ask for users permission is important too.
 
 <location>
 {location}
@@ -1047,71 +1050,205 @@ Only provide options available in the website, they are all student hosters who
 
 keep your answer precise and not too long. Use a vibe tone adjusting to the user's.
 
-Write your response inside <answer> tags.""".format(
-            location="Princeton",  # Default location, can be extracted from user query if needed
-            user_preferences="",  # Will be extracted from conversation if mentioned
-            events=json.dumps(events[:20], indent=2) if events else "[]",
-            listings=json.dumps(listings[:20], indent=2) if listings else "[]"
-        )
-        
-        # Add listings to the prompt after events section
-        system_prompt += f"""
+Write your response inside <answer> tags."""
+
+def build_chatbot_request(message, conversation_history):
+    """
+    The system prompt (with the listings and events as context) and the message list
+    for a chatbot turn. Shared by the Flask view and the async handler in asgi.py.
+    """
+    listings = load_listings()
+    events = load_events_file()
+    
+    system_prompt = CHATBOT_PROMPT.format(
+        location="Princeton",  # Default location, can be extracted from user query if needed
+        user_preferences="",  # Will be extracted from conversation if mentioned
+        events=json.dumps(events[:20], indent=2) if events else "[]"
+    )
+    
+    # Add listings to the prompt after events section
+    system_prompt += f"""
 
 Available listings (student hosters):
 {json.dumps(listings[:20], indent=2) if listings else "[]"}
 """
-        
-        # Build messages array with conversation history
-        messages = []
-        for msg in conversation_history[-10:]:  # Keep last 10 messages for context
-            messages.append({
-                "role": msg.get("role", "user"),
-                "content": msg.get("content", "")
-            })
-        
-        # Add current message
+    
+    # Build messages array with conversation history
+    messages = []
+    for msg in conversation_history[-10:]:  # Keep last 10 messages for context
         messages.append({
-            "role": "user",
-            "content": message
+            "role": msg.get("role", "user"),
+            "content": msg.get("content", "")
         })
+    
+    # Add current message
+    messages.append({
+        "role": "user",
+        "content": message
+    })
+    return system_prompt, messages
+
+def chatbot_params(claude_config, system_prompt, messages):
+    """messages.create arguments for a chatbot turn."""
+    # Get temperature from environment or use default (0.7 = balanced, lower = more focused, higher = more creative)
+    return {
+        "model": claude_config["model"],
+        "max_tokens": 200,  # Reduced for more concise responses
+        "temperature": float(os.getenv('CLAUDE_TEMPERATURE', '0.7')),  # 0.0-1.0, default: 0.7
+        "system": system_prompt,
+        "messages": messages
+    }
+
+def chatbot_response_text(response):
+    """Extract the answer text from a Claude response, raising ValueError if there is none."""
+    import re
+    
+    if not response or not hasattr(response, 'content') or not response.content:
+        raise ValueError("Invalid response structure from Claude API")
+    
+    response_text = ""
+    if isinstance(response.content, list) and len(response.content) > 0:
+        if hasattr(response.content[0], 'text'):
+            response_text = response.content[0].text
+        elif isinstance(response.content[0], dict) and 'text' in response.content[0]:
+            response_text = response.content[0]['text']
+        else:
+            response_text = str(response.content[0])
+    else:
+        response_text = str(response.content)
+    
+    if not response_text:
+        raise ValueError("Empty response from Claude API")
+    
+    # Extract answer from <answer> tags if present
+    answer_match = re.search(r'<answer>(.*?)</answer>', response_text, re.DOTALL)
+    if answer_match:
+        response_text = answer_match.group(1).strip()
+    return response_text
+
+class AnswerTagFilter:
+    """
+    Streaming version of chatbot_response_text's <answer> extraction: feed it text
+    chunks as they arrive and it returns only what belongs inside the answer tags.
+    Text before <answer> is held back (and emitted by finish() if no tag ever comes),
+    as is anything that might be the start of </answer> or trailing whitespace.
+    """
+    OPEN = "<answer>"
+    CLOSE = "</answer>"
+    
+    def __init__(self):
+        self.text = ""  # everything emitted so far
+        self._buffer = ""
+        self._state = "before"  # before -> inside -> after
+    
+    def feed(self, chunk: str) -> str:
+        if self._state == "after":
+            return ""
+        self._buffer += chunk
+        if self._state == "before":
+            start = self._buffer.find(self.OPEN)
+            if start == -1:
+                return ""
+            self._buffer = self._buffer[start + len(self.OPEN):]
+            self._state = "inside"
+        
+        end = self._buffer.find(self.CLOSE)
+        if end != -1:
+            out, self._buffer, self._state = self._buffer[:end].rstrip(), "", "after"
+        else:
+            # Hold back a possible partial closing tag, and whitespace that may turn out to be trailing
+            keep = next((k for k in range(len(self.CLOSE) - 1, 0, -1) if self._buffer.endswith(self.CLOSE[:k])), 0)
+            out = self._buffer[:len(self._buffer) - keep].rstrip()
+            self._buffer = self._buffer[len(out):]
+        if not self.text:
+            out = out.lstrip()
+        self.text += out
+        return out
+    
+    def finish(self) -> str:
+        """Whatever is still held back once the stream has ended."""
+        out, self._buffer = ("" if self._state == "after" else self._buffer), ""
+        if self._state == "inside":
+            out = out.rstrip()
+        if not self.text:
+            out = out.strip() if self._state == "inside" else out
+        self._state = "after"
+        self.text += out
+        return out
+
+def sse_event(payload: dict) -> str:
+    """One Server-Sent Events message carrying a JSON payload."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+async def sse_stream(items):
+    """Encode an async iterator of dicts as SSE messages, ending with an error event if it fails."""
+    try:
+        async for item in items:
+            yield sse_event(item)
+    except Exception as e:
+        print(f"Event stream error: {e}")
+        yield sse_event({"type": "error", "error": str(e)})
+
+# Headers that keep proxies (e.g. nginx) from buffering an event stream
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+async def stream_chatbot_events(claude_config, system_prompt, messages):
+    """
+    SSE events for a streamed chatbot turn: a "delta" event per piece of answer text
+    as Claude generates it, then "done" with the full answer (or "error").
+    """
+    answer = AnswerTagFilter()
+    try:
+        async for chunk in stream_message(claude_config["api_key"], **chatbot_params(claude_config, system_prompt, messages)):
+            text = answer.feed(chunk)
+            if text:
+                yield sse_event({"type": "delta", "text": text})
+        text = answer.finish()
+        if text:
+            yield sse_event({"type": "delta", "text": text})
+        if not answer.text:
+            raise ValueError("Empty response from Claude API")
+        yield sse_event({"type": "done", "response": answer.text})
+    except Exception as e:
+        print(f"Chatbot stream error: {e}")
+        yield sse_event({"type": "error", "error": str(e)})
+
+@app.route('/api/chatbot', methods=['POST'])
+def chatbot():
+    """
+    Chatbot endpoint that uses Claude API to help users navigate the site.
+    Provides accommodation and event recommendations based on user queries.
+    """
+    try:
+        from knot import Knot
+        
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
+        
+        message = data.get('message', '').strip()
+        conversation_history = data.get('conversation_history', [])
+        
+        if not message:
+            return jsonify({"error": "message field is required"}), 400
+        
+        # Claude config; the client itself is shared per worker (async_runtime)
+        try:
+            claude_config = Knot().get_claude_config()
+        except Exception as e:
+            return jsonify({
+                "success": False,
+                "error": f"Claude API not configured: {str(e)}"
+            }), 500
+        
+        system_prompt, messages = build_chatbot_request(message, conversation_history)
         
         # Call Claude API
         try:
-            # Get temperature from environment or use default (0.7 = balanced, lower = more focused, higher = more creative)
-            import os
-            temperature = float(os.getenv('CLAUDE_TEMPERATURE', '0.7'))
-            
-            response = claude_client.messages.create(
-                model=claude_model,
-                max_tokens=200,  # Reduced for more concise responses
-                temperature=temperature,  # Adjust temperature here (0.0-1.0, default: 0.7)
-                system=system_prompt,
-                messages=messages
-            )
-            
-            # Extract response text safely
-            if not response or not hasattr(response, 'content') or not response.content:
-                raise ValueError("Invalid response structure from Claude API")
-            
-            response_text = ""
-            if isinstance(response.content, list) and len(response.content) > 0:
-                if hasattr(response.content[0], 'text'):
-                    response_text = response.content[0].text
-                elif isinstance(response.content[0], dict) and 'text' in response.content[0]:
-                    response_text = response.content[0]['text']
-                else:
-                    response_text = str(response.content[0])
-            else:
-                response_text = str(response.content)
-            
-            if not response_text:
-                raise ValueError("Empty response from Claude API")
-            
-            # Extract answer from <answer> tags if present
-            import re
-            answer_match = re.search(r'<answer>(.*?)</answer>', response_text, re.DOTALL)
-            if answer_match:
-                response_text = answer_match.group(1).strip()
+            response = run_async(create_message(
+                claude_config["api_key"], **chatbot_params(claude_config, system_prompt, messages)
+            ))
+            response_text = chatbot_response_text(response)
             
             return jsonify({
                 "success": True,
@@ -1144,6 +1281,35 @@ Available listings (student hosters):
             "details": error_details if app.debug else None
         }), 500
 
+@app.route('/api/chatbot/stream', methods=['POST'])
+def chatbot_stream():
+    """
+    Streaming chatbot: same request body as /api/chatbot, answered as a
+    text/event-stream of answer text as Claude generates it.
+    """
+    from flask import Response
+    from knot import Knot
+    
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+    
+    message = data.get('message', '').strip()
+    if not message:
+        return jsonify({"error": "message field is required"}), 400
+    
+    try:
+        claude_config = Knot().get_claude_config()
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Claude API not configured: {str(e)}"
+        }), 500
+    
+    system_prompt, messages = build_chatbot_request(message, data.get('conversation_history', []))
+    events = stream_chatbot_events(claude_config, system_prompt, messages)
+    return Response(iter_async(events), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 if __name__ == '__main__':
     import os
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,349 @@
+"""
+SQLite Store - Optional SQLite backend for listings and users
+Drop-in replacement for the JSON files, selected with ROOMIE_STORAGE_BACKEND=sqlite.
+Uses WAL journaling, indexes on id / email / availability date, and migrates the
+existing listings.json and users.json into the database the first time it opens.
+"""
+import json
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id INTEGER PRIMARY KEY,
+    email TEXT,
+    capacity INTEGER NOT NULL DEFAULT 0,
+    position INTEGER NOT NULL,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_listings_email ON listings(email);
+CREATE INDEX IF NOT EXISTS idx_listings_position ON listings(position);
+
+CREATE TABLE IF NOT EXISTS listing_dates (
+    date TEXT NOT NULL,
+    listing_id INTEGER NOT NULL,
+    PRIMARY KEY (date, listing_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_listing_dates_listing ON listing_dates(listing_id);
+
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    name TEXT,
+    password_hash TEXT,
+    roles TEXT NOT NULL DEFAULT '[]'
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SqliteDatabase:
+    """Thread-local connections to one SQLite file, with schema setup and migrations."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._setup_lock = threading.Lock()
+        self._ready = False
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        if not self._ready:
+            with self._setup_lock:
+                if not self._ready:
+                    conn.executescript(SCHEMA)
+                    self._ready = True
+        return conn
+
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT/ROLLBACK; serializes writers across processes."""
+        return _Transaction(self.connect())
+
+    def migrate_once(self, key: str, migrate: Callable[[sqlite3.Connection], None]):
+        """Run `migrate` exactly once per database, recorded in the meta table."""
+        conn = self.connect()
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            return
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return
+            migrate(conn)
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, 'done')", (key,))
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+_databases: Dict[str, SqliteDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(path: str) -> SqliteDatabase:
+    """Share one SqliteDatabase per file between the listing and user stores."""
+    with _databases_lock:
+        if path not in _databases:
+            _databases[path] = SqliteDatabase(path)
+        return _databases[path]
+
+
+class SqliteListingStore:
+    """Same interface as listing_store.ListingStore, backed by SQLite."""
+
+    def __init__(self, path: str, loader: Callable[[], List[Dict]]):
+        self.db = get_database(path)
+        self._loader = loader
+        self._migrated = False
+
+    def _conn(self) -> sqlite3.Connection:
+        if not self._migrated:
+            self.db.migrate_once("listings_from_json", self._migrate)
+            self._migrated = True
+        return self.db.connect()
+
+    def _migrate(self, conn: sqlite3.Connection):
+        for listing in self._loader():
+            if conn.execute("SELECT 1 FROM listings WHERE id = ?", (listing.get("id"),)).fetchone():
+                continue
+            self._write(conn, dict(listing), new=True)
+
+    # ----- Row helpers -----
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, listing: Dict, new: bool = False):
+        """Upsert a listing row plus its date rows and rating aggregate."""
+        reviews = listing.get("reviews", []) or []
+        rating_sum = sum(review.get("rating", 0) for review in reviews)
+        params = (listing.get("email"), listing.get("capacity", 0) or 0, rating_sum, len(reviews),
+                  json.dumps(listing), listing.get("id"))
+        if new:
+            position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM listings").fetchone()[0]
+            conn.execute(
+                "INSERT INTO listings (email, capacity, rating_sum, review_count, data, id, position) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", params + (position,))
+        else:
+            conn.execute(
+                "UPDATE listings SET email = ?, capacity = ?, rating_sum = ?, review_count = ?, data = ? "
+                "WHERE id = ?", params)
+            conn.execute("DELETE FROM listing_dates WHERE listing_id = ?", (listing.get("id"),))
+        conn.executemany(
+            "INSERT OR IGNORE INTO listing_dates (date, listing_id) VALUES (?, ?)",
+            [(date, listing.get("id")) for date in listing.get("available_dates", []) or []])
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('listings_version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+    @staticmethod
+    def _rows(rows) -> List[Dict]:
+        return [json.loads(row["data"]) for row in rows]
+
+    # ----- Reads -----
+
+    def all(self) -> List[Dict]:
+        return self._rows(self._conn().execute("SELECT data FROM listings ORDER BY position"))
+
+    def get(self, listing_id: int) -> Optional[Dict]:
+        row = self._conn().execute("SELECT data FROM listings WHERE id = ?", (listing_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def get_by_email(self, email: str) -> List[Dict]:
+        return self._rows(self._conn().execute(
+            "SELECT data FROM listings WHERE email = ? ORDER BY position", (email,)))
+
+    def get_available(self, date: str, min_capacity: int = 1) -> List[Dict]:
+        return self.get_available_for_nights([date], min_capacity)
+
+    def get_available_for_nights(self, nights: List[str], min_capacity: int = 1) -> List[Dict]:
+        nights = sorted(set(nights))
+        if not nights:
+            return []
+        placeholders = ",".join("?" * len(nights))
+        return self._rows(self._conn().execute(
+            f"SELECT l.data FROM listings l JOIN ("
+            f"  SELECT listing_id FROM listing_dates WHERE date IN ({placeholders})"
+            f"  GROUP BY listing_id HAVING COUNT(*) = ?"
+            f") d ON d.listing_id = l.id WHERE l.capacity >= ? ORDER BY l.position",
+            (*nights, len(nights), min_capacity)))
+
+    def rating_summary(self, listing_id: int) -> Dict:
+        return self.rating_summaries([listing_id])[listing_id]
+
+    def rating_summaries(self, listing_ids: List[int]) -> Dict[int, Dict]:
+        aggregates = {listing_id: (0, 0) for listing_id in listing_ids}
+        ids = list(aggregates)
+        conn = self._conn()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, rating_sum, review_count FROM listings WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk)
+            for row in rows:
+                aggregates[row["id"]] = (row["rating_sum"], row["review_count"])
+        return {
+            listing_id: {
+                "rating_sum": total,
+                "review_count": count,
+                "average_rating": round(total / count, 1) if count else 0.0
+            }
+            for listing_id, (total, count) in aggregates.items()
+        }
+
+    def version(self) -> int:
+        """Counter bumped by every listing write, from any process."""
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'listings_version'").fetchone()
+        return int(row["value"]) if row else 0
+
+    def next_id(self) -> int:
+        return self._conn().execute("SELECT COALESCE(MAX(id), 100) + 1 FROM listings").fetchone()[0]
+
+    # ----- Writes -----
+
+    def replace_all(self, listings: List[Dict]):
+        self._conn()
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM listing_dates")
+            conn.execute("DELETE FROM listings")
+            for listing in listings:
+                self._write(conn, dict(listing), new=True)
+            self._bump_version(conn)
+
+    def insert(self, listing: Dict) -> Dict:
+        self._conn()
+        stored = dict(listing)
+        with self.db.transaction() as conn:
+            if conn.execute("SELECT 1 FROM listings WHERE id = ?", (stored.get("id"),)).fetchone():
+                stored["id"] = conn.execute("SELECT MAX(id) + 1 FROM listings").fetchone()[0]
+            self._write(conn, stored, new=True)
+            self._bump_version(conn)
+        return stored
+
+    def modify(self, listing_id: int, change: Callable[[Dict], None]) -> bool:
+        self._conn()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT data FROM listings WHERE id = ?", (listing_id,)).fetchone()
+            if not row:
+                return False
+            listing = json.loads(row["data"])
+            change(listing)
+            listing["id"] = listing_id
+            self._write(conn, listing)
+            self._bump_version(conn)
+        return True
+
+    def append_review(self, listing_id: int, make_review: Callable[[int], Dict]) -> bool:
+        self._conn()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT data FROM listings WHERE id = ?", (listing_id,)).fetchone()
+            if not row:
+                return False
+            listing = json.loads(row["data"])
+            reviews = listing.get("reviews", []) or []
+            review = make_review(len(reviews) + 1)
+            listing["reviews"] = reviews + [review]
+            conn.execute(
+                "UPDATE listings SET data = ?, rating_sum = rating_sum + ?, review_count = review_count + 1 "
+                "WHERE id = ?", (json.dumps(listing), review.get("rating", 0), listing_id))
+            self._bump_version(conn)
+        return True
+
+    def delete(self, listing_id: int) -> bool:
+        self._conn()
+        with self.db.transaction() as conn:
+            deleted = conn.execute("DELETE FROM listings WHERE id = ?", (listing_id,)).rowcount
+            conn.execute("DELETE FROM listing_dates WHERE listing_id = ?", (listing_id,))
+            if deleted:
+                self._bump_version(conn)
+        return deleted > 0
+
+
+class SqliteUserStore:
+    """User records for auth.py, backed by SQLite."""
+
+    def __init__(self, path: str, loader: Callable[[], Dict]):
+        self.db = get_database(path)
+        self._loader = loader
+        self._migrated = False
+
+    def _conn(self) -> sqlite3.Connection:
+        if not self._migrated:
+            self.db.migrate_once("users_from_json", self._migrate)
+            self._migrated = True
+        return self.db.connect()
+
+    def _migrate(self, conn: sqlite3.Connection):
+        for user in self._loader().get("users", {}).values():
+            conn.execute(
+                "INSERT OR IGNORE INTO users (email, name, password_hash, roles) VALUES (?, ?, ?, ?)",
+                (user.get("email"), user.get("name"), user.get("password_hash"), json.dumps(user.get("roles", []))))
+
+    @staticmethod
+    def _record(row) -> Dict:
+        return {
+            "email": row["email"],
+            "password_hash": row["password_hash"],
+            "name": row["name"],
+            "roles": json.loads(row["roles"] or "[]")
+        }
+
+    def load_all(self) -> Dict:
+        rows = self._conn().execute("SELECT * FROM users ORDER BY rowid")
+        return {"users": {row["email"]: self._record(row) for row in rows}}
+
+    def replace_all(self, users_data: Dict):
+        self._conn()
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM users")
+            for user in users_data.get("users", {}).values():
+                conn.execute(
+                    "INSERT INTO users (email, name, password_hash, roles) VALUES (?, ?, ?, ?)",
+                    (user.get("email"), user.get("name"), user.get("password_hash"), json.dumps(user.get("roles", []))))
+
+    def get(self, email: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        return self._record(row) if row else None
+
+    def insert(self, user: Dict) -> bool:
+        self._conn()
+        with self.db.transaction() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO users (email, name, password_hash, roles) VALUES (?, ?, ?, ?)",
+                (user["email"], user["name"], user["password_hash"], json.dumps(user.get("roles", [])))).rowcount
+        return inserted > 0
+
+    def add_role(self, email: str, role: str) -> bool:
+        self._conn()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT roles FROM users WHERE email = ?", (email,)).fetchone()
+            if not row:
+                return False
+            roles = json.loads(row["roles"] or "[]")
+            if role not in roles:
+                roles.append(role)
+                conn.execute("UPDATE users SET roles = ? WHERE email = ?", (json.dumps(roles), email))
+        return True
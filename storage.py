@@ -0,0 +1,179 @@
+"""
+Storage - Shared persistence helpers for the JSON data files
+Crash-safe writes (temp file + fsync + rename), a cross-process file lock so
+gunicorn workers don't lose each other's updates, and group commit so a burst
+of small writes is coalesced into one rewrite.
+"""
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Windows: fall back to in-process locking only
+    FCNTL_AVAILABLE = False
+
+# Storage backend for listings and users: "json" (default, dev) or "sqlite"
+STORAGE_BACKEND = os.getenv("ROOMIE_STORAGE_BACKEND", "json").strip().lower()
+SQLITE_PATH = os.getenv("ROOMIE_SQLITE_PATH", "roomie.db")
+
+# Per-thread lock depth so nested file_lock() calls on the same path don't deadlock
+_held = threading.local()
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+
+
+def _process_lock(lock_path: str) -> threading.RLock:
+    with _process_locks_guard:
+        if lock_path not in _process_locks:
+            _process_locks[lock_path] = threading.RLock()
+        return _process_locks[lock_path]
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Hold an exclusive lock on `path` across threads and processes.
+    Uses a sidecar `<path>.lock` file; re-entrant within a thread.
+    """
+    lock_path = os.path.abspath(path) + '.lock'
+    depths = getattr(_held, 'depths', None)
+    if depths is None:
+        depths = _held.depths = {}
+
+    if depths.get(lock_path):
+        depths[lock_path] += 1
+        try:
+            yield
+        finally:
+            depths[lock_path] -= 1
+        return
+
+    with _process_lock(lock_path):
+        handle = None
+        if FCNTL_AVAILABLE:
+            directory = os.path.dirname(lock_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handle = open(lock_path, 'a')
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        depths[lock_path] = 1
+        try:
+            yield
+        finally:
+            depths[lock_path] = 0
+            if handle is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                handle.close()
+
+
+def file_stamp(path: str):
+    """Return (inode, mtime_ns, size) of a file, or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    # Atomic renames give every rewrite a new inode, so same-tick rewrites are still noticed
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def atomic_write_text(path: str, text: str):
+    """Write `text` to a temp file, fsync it, and rename it over `path`."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the existing file's permissions
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except OSError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def atomic_write_json(path: str, data: Any, indent: int = 2):
+    """Serialize `data` as JSON and write it atomically to `path`."""
+    atomic_write_text(path, json.dumps(data, indent=indent))
+
+
+def _fsync_directory(directory: str):
+    """Persist the rename itself (best effort; not supported everywhere)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class GroupCommitter:
+    """
+    Coalesces concurrent commit requests into as few flushes as possible.
+
+    Each caller applies its change in memory and then calls commit(), which
+    returns once a flush that started after the change has finished. While
+    one thread is flushing, everyone who arrives meanwhile is covered by the
+    next single flush instead of each rewriting the file.
+    """
+
+    def __init__(self, flush: Callable[[], None], window: float = 0.0):
+        self._flush = flush
+        self._window = window
+        self._cond = threading.Condition()
+        self._requested = 0
+        self._flushed = 0
+        self._flushing = False
+        self.flush_count = 0
+
+    def commit(self):
+        """Block until every change made before this call is durable."""
+        with self._cond:
+            self._requested += 1
+            ticket = self._requested
+            while self._flushed < ticket:
+                if not self._flushing:
+                    self._flushing = True
+                    break
+                self._cond.wait()
+            else:
+                return
+
+        # This thread is the leader for the next flush
+        error = None
+        covered = ticket
+        try:
+            if self._window:
+                threading.Event().wait(self._window)
+            with self._cond:
+                covered = self._requested
+            self._flush()
+        except BaseException as e:
+            error = e
+        with self._cond:
+            self._flushing = False
+            if error is None:
+                self._flushed = max(self._flushed, covered)
+                self.flush_count += 1
+            self._cond.notify_all()
+        if error is not None:
+            raise error
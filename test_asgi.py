@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the ASGI entry point (async AI routes + mounted Flask app).
+Run this with: python test_asgi.py
+"""
+
+import ai_agent
+import asgi
+from knot import Knot
+from fastapi.testclient import TestClient
+from asgi import app
+from server import app as flask_app
+
+
+def session_cookie(data: dict) -> str:
+    """A session cookie signed exactly like Flask's."""
+    return flask_app.session_interface.get_signing_serializer(flask_app).dumps(data)
+
+
+def test_flask_routes_are_mounted():
+    """Routes without a native async handler are still served by Flask."""
+    client = TestClient(app)
+    response = client.get("/api/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+
+
+def test_match_requires_a_session():
+    """The async handler enforces the same auth as the Flask view."""
+    client = TestClient(app)
+    response = client.post("/api/match", json={"visitor_query": "quiet", "date_needed": "2025-11-08"})
+    assert response.status_code == 401
+    client.cookies.set("session", "tampered")
+    assert client.post("/api/match", json={"visitor_query": "quiet", "date_needed": "2025-11-08"}).status_code == 401
+
+
+def test_guest_match_runs_async():
+    """A guest's match is awaited natively and parsed like the Flask route does."""
+    async def fake_agent(visitor_query, date_needed):
+        return '```json\n{"ranked_matches": [{"host_id": 101, "name": "Alex"}]}\n```'
+
+    original_agent = ai_agent.run_matching_agent
+    ai_agent.run_matching_agent = fake_agent
+    ai_agent.match_cache.clear()
+    try:
+        client = TestClient(app)
+        client.cookies.set("session", session_cookie({"guest": True}))
+        response = client.post("/api/match", json={"visitor_query": "quiet", "date_needed": "2025-11-08"})
+        assert response.status_code == 200
+        assert response.json()["matches"]["ranked_matches"][0]["host_id"] == 101
+        assert client.post("/api/match", json={"visitor_query": "quiet"}).status_code == 400
+    finally:
+        ai_agent.run_matching_agent = original_agent
+        ai_agent.match_cache.clear()
+
+
+def test_chatbot_uses_shared_client():
+    """The async chatbot sends its prompt through async_runtime.create_message."""
+    sent = {}
+
+    class FakeText:
+        text = "<answer>Try Alex's room</answer>"
+
+    class FakeResponse:
+        content = [FakeText()]
+
+    async def fake_create_message(api_key, **kwargs):
+        sent.update(kwargs, api_key=api_key)
+        return FakeResponse()
+
+    original_create, original_key = asgi.create_message, Knot.CLAUDE_API_KEY
+    asgi.create_message, Knot.CLAUDE_API_KEY = fake_create_message, "test-key"
+    try:
+        client = TestClient(app)
+        response = client.post("/api/chatbot", json={"message": "somewhere quiet?"})
+        assert response.status_code == 200
+        assert response.json()["response"] == "Try Alex's room"
+        assert sent["api_key"] == "test-key"
+        assert sent["messages"][-1] == {"role": "user", "content": "somewhere quiet?"}
+        assert "Available listings" in sent["system"]
+        assert client.post("/api/chatbot", json={"message": " "}).status_code == 400
+    finally:
+        asgi.create_message, Knot.CLAUDE_API_KEY = original_create, original_key
+
+
+if __name__ == "__main__":
+    test_flask_routes_are_mounted()
+    test_match_requires_a_session()
+    test_guest_match_runs_async()
+    test_chatbot_uses_shared_client()
+    print("✅ All ASGI tests passed!")
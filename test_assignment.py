@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for capacity-aware group placement (assignment.py, /api/match/assign).
+Run this with: python test_assignment.py
+"""
+
+import itertools
+import random
+import numpy as np
+import assignment
+from assignment import assign_visitors, solve_assignment
+from matcher import TfidfMatcher
+from server import app
+
+HOSTS = [
+    {"id": 1, "name": "Quiet one", "dorm_vibe": "quiet study, early bedtime", "interests": "reading",
+     "description": "calm room", "capacity": 1, "available_dates": ["2025-11-08", "2025-11-09"]},
+    {"id": 2, "name": "Quiet two", "dorm_vibe": "quiet, calm", "interests": "reading, study",
+     "description": "peaceful room", "capacity": 1, "available_dates": ["2025-11-08", "2025-11-09"]},
+    {"id": 3, "name": "Party house", "dorm_vibe": "loud party, night owl", "interests": "gaming",
+     "description": "social space", "capacity": 2, "available_dates": ["2025-11-08", "2025-11-09"]},
+]
+
+
+def make_matcher():
+    matcher = TfidfMatcher()
+    matcher.build(HOSTS)
+    return matcher
+
+
+def random_problem(rng):
+    hosts = rng.randint(1, 4)
+    capacities = np.array([rng.randint(1, 2) for _ in range(hosts)])
+    candidates = []
+    for _ in range(rng.randint(1, 6)):
+        host_indices = rng.sample(range(hosts), rng.randint(0, hosts))
+        candidates.append((np.array(host_indices, dtype=np.int64),
+                           np.array([round(rng.uniform(0.2, 1.0), 2) for _ in host_indices])))
+    return candidates, capacities
+
+
+def total(candidates, chosen):
+    return sum(values[list(hosts).index(host)] for (hosts, values), host in zip(candidates, chosen) if host >= 0)
+
+
+def best_total(candidates, capacities):
+    """Exhaustive optimum for a tiny problem."""
+    best = 0.0
+    for choice in itertools.product(*[[-1] + list(hosts) for hosts, _ in candidates]):
+        used = [host for host in choice if host >= 0]
+        if all(used.count(host) <= capacities[host] for host in set(used)):
+            best = max(best, total(candidates, choice))
+    return best
+
+
+def brute_force_lsa(benefit, maximize=True):
+    """Stand-in for scipy's linear_sum_assignment on tiny rectangular matrices."""
+    rows, columns = benefit.shape
+    if rows > columns:
+        found_columns, found_rows = brute_force_lsa(benefit.T)
+        order = np.argsort(found_rows)
+        return found_rows[order], found_columns[order]
+    best = max(itertools.permutations(range(columns), rows),
+               key=lambda picked: benefit[np.arange(rows), list(picked)].sum())
+    return np.arange(rows), np.array(best, dtype=np.int64)
+
+
+def check_solver(expected_name, problems=200):
+    rng = random.Random(7)
+    for _ in range(problems):
+        candidates, capacities = random_problem(rng)
+        chosen, name = solve_assignment(candidates, capacities)
+        assert name == expected_name
+        for host, capacity in enumerate(capacities):
+            assert (chosen == host).sum() <= capacity
+        for (hosts, _), host in zip(candidates, chosen):
+            assert host == -1 or host in hosts
+        # The auction is optimal to within epsilon per visitor; the Hungarian solver exactly
+        assert total(candidates, chosen) >= best_total(candidates, capacities) - len(candidates) * assignment.AUCTION_EPSILON - 1e-9
+
+
+def test_auction_is_near_optimal():
+    """Without scipy, the auction respects capacities and matches the exhaustive optimum."""
+    original = assignment.SCIPY_AVAILABLE
+    assignment.SCIPY_AVAILABLE = False
+    try:
+        check_solver("auction")
+    finally:
+        assignment.SCIPY_AVAILABLE = original
+
+
+def test_hungarian_expands_hosts_into_beds():
+    """With a Hungarian solver available, multi-bed hosts are solved exactly."""
+    original = assignment.SCIPY_AVAILABLE, assignment.linear_sum_assignment
+    assignment.SCIPY_AVAILABLE, assignment.linear_sum_assignment = True, brute_force_lsa
+    try:
+        check_solver("hungarian", problems=60)
+    finally:
+        assignment.SCIPY_AVAILABLE, assignment.linear_sum_assignment = original
+
+
+def test_group_is_spread_over_hosts():
+    """Two quiet visitors can't both get the best one-bed room; the second takes the next quiet host."""
+    placement = assign_visitors([
+        ("quiet study, early bedtime", "2025-11-08"),
+        ("quiet study, early bedtime", "2025-11-08"),
+        ("loud party gaming", "2025-11-08"),
+    ], make_matcher())
+    hosts = [placed["host_id"] for placed in placement["assignments"]]
+    assert sorted(hosts[:2]) == [1, 2]
+    assert hosts[2] == 3
+    assert placement["assigned"] == 3
+
+
+def test_capacity_holds_on_every_night():
+    """A two-night stay takes the bed on both nights, so a one-night visitor can't reuse it."""
+    placement = assign_visitors([
+        ("quiet reading", "2025-11-09"),
+        ("quiet reading", "2025-11-08 to 2025-11-10"),
+        ("quiet reading", "2025-11-09"),
+        ("quiet reading", "2025-11-08"),
+    ], make_matcher())
+    nights = {0: ["2025-11-09"], 1: ["2025-11-08", "2025-11-09"], 2: ["2025-11-09"], 3: ["2025-11-08"]}
+    for host in (1, 2):
+        for night in ("2025-11-08", "2025-11-09"):
+            guests = [i for i, a in enumerate(placement["assignments"])
+                      if a and a["host_id"] == host and night in nights[i]]
+            assert len(guests) <= 1, (host, night, guests)
+    assert placement["assignments"][1]["host_id"] in (1, 2)
+
+
+def test_assign_endpoint():
+    """The route places valid requests and reports invalid ones individually."""
+    assert app.test_client().post("/api/match/assign", json={"requests": []}).status_code == 401
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['guest'] = True
+    assert client.post("/api/match/assign", json={"requests": []}).status_code == 400
+
+    response = client.post("/api/match/assign", json={"requests": [
+        {"visitor_query": "quiet study, early bedtime", "date_needed": "2025-11-08"},
+        {"visitor_query": "quiet study, early bedtime", "date_needed": "2025-11-08"},
+        {"visitor_query": "no date"},
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+    results = body["results"]
+    assert results[2] == {"success": False, "error": "date_needed is required"}
+    placed = [r["assignment"]["host_id"] for r in results[:2] if r["assignment"]]
+    assert placed.count(101) <= 1
+    assert body["assigned"] == len(placed)
+
+
+if __name__ == "__main__":
+    test_auction_is_near_optimal()
+    test_hungarian_expands_hosts_into_beds()
+    test_group_is_spread_over_hosts()
+    test_capacity_holds_on_every_night()
+    test_assign_endpoint()
+    print("✅ All assignment tests passed!")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-worker background event loop and shared async clients.
+Run this with: python test_async_runtime.py
+"""
+
+import asyncio
+import time
+import async_runtime
+from async_runtime import create_message, get_anthropic_client, get_http_client, get_loop, run_async
+
+
+def test_run_async_reuses_one_loop():
+    """Every call runs on the same long-lived loop."""
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    first = run_async(current_loop())
+    second = run_async(current_loop())
+    assert first is second is get_loop()
+    assert not first.is_closed()
+
+
+def test_http_client_is_shared_per_loop():
+    """The pooled httpx client is created once per loop and reused."""
+    async def client():
+        return get_http_client()
+
+    assert run_async(client()) is run_async(client())
+    # A different loop (e.g. asyncio.run in a script) gets its own client
+    assert asyncio.run(client()) is not run_async(client())
+
+
+def test_errors_propagate():
+    """Exceptions raised in the coroutine reach the caller."""
+    async def fail():
+        raise ValueError("boom")
+
+    try:
+        run_async(fail())
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert str(e) == "boom"
+
+
+def test_anthropic_client_is_shared_per_loop():
+    """One AsyncAnthropic client per loop and API key."""
+    async def client(key):
+        return get_anthropic_client(key)
+
+    first = run_async(client("test-key"))
+    assert run_async(client("test-key")) is first
+    assert run_async(client("other-key")) is not first
+
+
+class FakeMessages:
+    """Stands in for client.messages, recording how many calls overlap."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def create(self, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        return kwargs["messages"][-1]["content"]
+
+
+def test_llm_calls_overlap_up_to_the_limit():
+    """Concurrent create_message calls run together, but never more than LLM_CONCURRENCY."""
+    fake = FakeMessages()
+
+    class FakeClient:
+        messages = fake
+
+    async def burst(n):
+        prompts = [{"role": "user", "content": f"prompt {i}"} for i in range(n)]
+        return await asyncio.gather(*[create_message("test-key", messages=[p]) for p in prompts])
+
+    original_client, original_limit = async_runtime.get_anthropic_client, async_runtime.LLM_CONCURRENCY
+    async_runtime.get_anthropic_client = lambda api_key: FakeClient()
+    async_runtime.LLM_CONCURRENCY = 3
+    try:
+        started = time.monotonic()
+        results = asyncio.run(burst(6))
+        elapsed = time.monotonic() - started
+    finally:
+        async_runtime.get_anthropic_client, async_runtime.LLM_CONCURRENCY = original_client, original_limit
+
+    assert results == [f"prompt {i}" for i in range(6)]
+    assert fake.peak == 3
+    # Two waves of 0.05s, not six sequential calls
+    assert elapsed < 0.25, elapsed
+
+
+if __name__ == "__main__":
+    test_run_async_reuses_one_loop()
+    test_http_client_is_shared_per_loop()
+    test_errors_propagate()
+    test_anthropic_client_is_shared_per_loop()
+    test_llm_calls_overlap_up_to_the_limit()
+    print("✅ All async runtime tests passed!")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for the LRU+TTL cache and the cached match results.
+Run this with: python test_cache.py
+"""
+
+import asyncio
+import time
+import ai_agent
+from cache import TTLCache
+
+
+def test_lru_eviction_and_counters():
+    """The least recently used entry is evicted and lookups are counted."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 1, 1, 2)
+
+
+def test_entries_expire():
+    """Entries older than the TTL are treated as misses."""
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a", "missing") == "missing"
+    assert cache.stats()["expirations"] == 1
+
+
+def test_match_results_are_cached_per_normalized_query_and_version():
+    """Equivalent requests share one agent call; a listings change invalidates it."""
+    calls = []
+
+    async def fake_agent(visitor_query, date_needed):
+        calls.append((visitor_query, date_needed))
+        return '{"ranked_matches": []}'
+
+    original_agent, original_version = ai_agent.run_matching_agent, ai_agent.listings_version
+    version = [1]
+    ai_agent.run_matching_agent = fake_agent
+    ai_agent.listings_version = lambda: version[0]
+    ai_agent.match_cache.clear()
+    try:
+        asyncio.run(ai_agent.run_matching_agent_cached("Quiet,  early riser!", "2025-11-08 to 2025-11-10"))
+        asyncio.run(ai_agent.run_matching_agent_cached("quiet early riser", "2025-11-08/2025-11-10"))
+        assert len(calls) == 1
+        asyncio.run(ai_agent.run_matching_agent_cached("quiet early riser", "2025-11-09"))
+        assert len(calls) == 2
+        version[0] = 2  # a listing changed
+        asyncio.run(ai_agent.run_matching_agent_cached("quiet early riser", "2025-11-09"))
+        assert len(calls) == 3
+    finally:
+        ai_agent.run_matching_agent, ai_agent.listings_version = original_agent, original_version
+        ai_agent.match_cache.clear()
+
+
+def test_failed_agent_answers_are_cached_briefly():
+    """The TF-IDF answer given when the agent fails expires after FALLBACK_CACHE_TTL, not the full TTL."""
+    calls = []
+
+    async def failing_agent(visitor_query, date_needed):
+        calls.append(visitor_query)
+        return ai_agent.FailedAgentResult(ai_agent.fallback_matching(visitor_query, date_needed, "AI request failed"))
+
+    original_agent, original_ttl = ai_agent.run_matching_agent, ai_agent.FALLBACK_CACHE_TTL
+    ai_agent.run_matching_agent, ai_agent.FALLBACK_CACHE_TTL = failing_agent, 0.01
+    ai_agent.match_cache.clear()
+    try:
+        asyncio.run(ai_agent.run_matching_agent_cached("quiet early riser", "2025-11-08"))
+        time.sleep(0.02)
+        asyncio.run(ai_agent.run_matching_agent_cached("quiet early riser", "2025-11-08"))
+        assert len(calls) == 2
+        # A real answer keeps the normal TTL
+        ai_agent.run_matching_agent = lambda *args: asyncio.sleep(0, '{"ranked_matches": []}')
+        asyncio.run(ai_agent.run_matching_agent_cached("loud night owl", "2025-11-08"))
+        time.sleep(0.02)
+        assert ai_agent.match_cache.get(ai_agent.match_cache_key("loud night owl", "2025-11-08")) is not None
+    finally:
+        ai_agent.run_matching_agent, ai_agent.FALLBACK_CACHE_TTL = original_agent, original_ttl
+        ai_agent.match_cache.clear()
+
+
+def test_slow_listings_check_does_not_block_the_loop():
+    """A slow listings reload behind the cache key runs in a thread; other coroutines keep going."""
+    async def fake_agent(visitor_query, date_needed):
+        return '{"ranked_matches": []}'
+
+    def slow_version():
+        time.sleep(0.2)
+        return 1
+
+    async def run():
+        ticks = 0
+        match = asyncio.ensure_future(ai_agent.run_matching_agent_cached("quiet", "2025-11-08"))
+        while not match.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        return ticks
+
+    original_agent, original_version = ai_agent.run_matching_agent, ai_agent.listings_version
+    ai_agent.run_matching_agent, ai_agent.listings_version = fake_agent, slow_version
+    ai_agent.match_cache.clear()
+    try:
+        # Blocked, the loop would tick once or twice; free, about 20 times
+        assert asyncio.run(run()) >= 10
+    finally:
+        ai_agent.run_matching_agent, ai_agent.listings_version = original_agent, original_version
+        ai_agent.match_cache.clear()
+
+
+if __name__ == "__main__":
+    test_lru_eviction_and_counters()
+    test_entries_expire()
+    test_match_results_are_cached_per_normalized_query_and_version()
+    test_failed_agent_answers_are_cached_briefly()
+    test_slow_listings_check_does_not_block_the_loop()
+    print("✅ All cache tests passed!")
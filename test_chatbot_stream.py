@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming chatbot: on-the-fly <answer> extraction and the SSE endpoints.
+Run this with: python test_chatbot_stream.py
+"""
+
+import json
+import asgi
+import server
+from fastapi.testclient import TestClient
+from knot import Knot
+from async_runtime import iter_async
+from server import AnswerTagFilter, chatbot_response_text
+
+
+def filter_chunks(chunks):
+    answer = AnswerTagFilter()
+    emitted = [answer.feed(chunk) for chunk in chunks] + [answer.finish()]
+    assert "".join(emitted) == answer.text
+    return answer.text, emitted
+
+
+def test_answer_filter_matches_batch_extraction():
+    """However the text is split, the streamed answer equals chatbot_response_text's."""
+    class Block:
+        def __init__(self, text):
+            self.text = text
+
+    class Response:
+        def __init__(self, text):
+            self.content = [Block(text)]
+
+    for full in [
+        "Thinking...\n<answer>\n- Alex: quiet, early sleeper\n- Sam: loves going out\n</answer>\nbye",
+        "<answer>Short one</answer>",
+        "No tags at all, just text.",
+    ]:
+        expected = chatbot_response_text(Response(full))
+        for size in (1, 2, 3, 7, len(full)):
+            chunks = [full[i:i + size] for i in range(0, len(full), size)]
+            assert filter_chunks(chunks)[0] == expected, (full, size)
+
+
+def test_answer_filter_streams_before_the_closing_tag():
+    """Answer text is released as it arrives, not only once </answer> is seen."""
+    text, emitted = filter_chunks(["<answer>Try ", "Alex's room", " tonight</ans", "wer> extra"])
+    assert text == "Try Alex's room tonight"
+    assert emitted[0] == "Try"
+    assert emitted[1] == " Alex's room"
+
+
+def test_iter_async_bridges_generators():
+    """An async generator can be consumed from sync code and is closed afterwards."""
+    closed = []
+
+    async def numbers():
+        try:
+            for i in range(3):
+                yield i
+        finally:
+            closed.append(True)
+
+    assert list(iter_async(numbers())) == [0, 1, 2]
+    assert closed == [True]
+
+
+def fake_stream(chunks):
+    async def stream_message(api_key, **kwargs):
+        for chunk in chunks:
+            yield chunk
+    return stream_message
+
+
+def parse_events(body: str):
+    return [json.loads(line[len("data: "):]) for line in body.split("\n") if line.startswith("data: ")]
+
+
+def check_stream_endpoint(client):
+    original_stream, original_key = server.stream_message, Knot.CLAUDE_API_KEY
+    server.stream_message = fake_stream(["<answer>Hi", " there", "</answer>"])
+    Knot.CLAUDE_API_KEY = "test-key"
+    try:
+        response = client.post("/api/chatbot/stream", json={"message": "hello"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.text)
+        assert [e["type"] for e in events] == ["delta", "delta", "done"]
+        assert "".join(e["text"] for e in events[:-1]) == "Hi there"
+        assert events[-1]["response"] == "Hi there"
+
+        assert client.post("/api/chatbot/stream", json={"message": ""}).status_code == 400
+
+        server.stream_message = fake_stream([])
+        events = parse_events(client.post("/api/chatbot/stream", json={"message": "hello"}).text)
+        assert events == [{"type": "error", "error": "Empty response from Claude API"}]
+    finally:
+        server.stream_message, Knot.CLAUDE_API_KEY = original_stream, original_key
+
+
+def test_flask_stream_endpoint():
+    """The Flask route streams delta events and a final done event."""
+    check_stream_endpoint(server.app.test_client())
+
+
+def test_asgi_stream_endpoint():
+    """The async route produces the same event stream."""
+    check_stream_endpoint(TestClient(asgi.app))
+
+
+if __name__ == "__main__":
+    test_answer_filter_matches_batch_extraction()
+    test_answer_filter_streams_before_the_closing_tag()
+    test_iter_async_bridges_generators()
+    test_flask_stream_endpoint()
+    test_asgi_stream_endpoint()
+    print("✅ All chatbot streaming tests passed!")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed combined (hosts + events) recommendations.
+Run this with: python test_combined_stream.py
+"""
+
+import asyncio
+import json
+import server
+from knot import Knot
+import time
+import nova_act as nova_act_module
+from nova_act import NovaAct, gather_stages
+
+EVENTS = [
+    {"id": 1, "title": "Board game night", "description": "Chill games", "tags": ["social", "games"], "category": "social"},
+    {"id": 2, "title": "Hackathon", "description": "Build things all night", "tags": ["tech", "coding"], "category": "tech"},
+    {"id": 3, "title": "Poetry reading", "description": "Quiet evening of poems", "tags": ["arts"], "category": "arts"},
+]
+
+
+def make_nova_act(ai_chunks=None) -> NovaAct:
+    """A NovaAct with canned Dedalus events and (optionally) a canned Claude stream."""
+    nova_act = NovaAct()
+
+    async def get_events_from_dedalus(**kwargs):
+        return EVENTS
+    nova_act.get_events_from_dedalus = get_events_from_dedalus
+
+    if ai_chunks is None:
+        nova_act.claude_api_key = None
+    else:
+        async def stream_claude(prompt, max_tokens):
+            for chunk in ai_chunks:
+                yield chunk
+        nova_act.claude_api_key, nova_act.claude_model = "test-key", "test-model"
+        nova_act.stream_claude = stream_claude
+    return nova_act
+
+
+async def collect(nova_act, **kwargs):
+    return [update async for update in nova_act.stream_combined_recommendations("quiet tech coding", **kwargs)]
+
+
+def test_local_rankings_come_first():
+    """Without Claude the stream is hosts, events, done, all ranked locally."""
+    updates = asyncio.run(collect(make_nova_act(), max_hosts=3, max_events=2))
+    assert [u["type"] for u in updates] == ["hosts", "events", "done"]
+    assert len(updates[0]["hosts"]) == 3
+    assert updates[0]["hosts"][0]["host"]["dorm_vibe"].lower().startswith("quiet")
+    assert updates[1]["events"][0]["event"]["id"] == 2
+    assert len(updates[1]["events"]) == 2
+    assert updates[2]["ai_enabled"] is False
+    assert updates[2]["hosts"] == updates[0]["hosts"]
+
+
+def test_ai_picks_stream_as_lines_complete():
+    """Each JSON line from Claude becomes its own update, however the text is chunked."""
+    lines = "\n".join([
+        '{"kind": "host", "host_id": 103, "relevance_score": 0.9, "reasoning": "quiet and chill", "highlights": ["quiet"]}',
+        '{"kind": "host", "host_id": 999, "relevance_score": 0.8, "reasoning": "unknown host"}',
+        '{"kind": "event", "event_id": 2, "relevance_score": 0.95, "reasoning": "coding", "highlights": []}',
+        '{"kind": "insights", "text": "Stay with Mai, hack all night."}',
+    ])
+    chunks = [lines[i:i + 17] for i in range(0, len(lines), 17)]
+    updates = asyncio.run(collect(make_nova_act(chunks)))
+
+    assert [u["type"] for u in updates] == ["hosts", "events", "host", "event", "insights", "done"]
+    assert updates[2]["host"]["id"] == 103 and updates[2]["rank"] == 1
+    assert updates[3]["event"]["id"] == 2
+    done = updates[-1]
+    assert done["ai_enabled"] is True
+    assert [rec["host"]["id"] for rec in done["hosts"]] == [103]
+    assert done["combined_insights"] == "Stay with Mai, hack all night."
+
+
+def test_ai_failure_falls_back_to_local_results():
+    """If the Claude stream breaks, the final result is the local ranking."""
+    nova_act = make_nova_act([])
+
+    async def stream_claude(prompt, max_tokens):
+        yield '{"kind": "host", "host_id": 101}\n'
+        raise RuntimeError("connection reset")
+    nova_act.stream_claude = stream_claude
+
+    updates = asyncio.run(collect(nova_act))
+    done = updates[-1]
+    assert done["type"] == "done" and done["ai_enabled"] is False
+    assert done["hosts"] == updates[0]["hosts"]
+
+
+def test_stages_run_concurrently_with_fallbacks():
+    """Independent stages overlap, and one that overruns yields its fallback."""
+    async def stage(value, delay):
+        await asyncio.sleep(delay)
+        return value
+
+    started = time.monotonic()
+    results, partial = asyncio.run(gather_stages({
+        "listings": (stage(["host"], 0.1), 1.0, []),
+        "events": (stage(["event"], 0.1), 1.0, []),
+        "slow": (stage(["late"], 5.0), 0.15, [])
+    }))
+    elapsed = time.monotonic() - started
+    assert results == {"listings": ["host"], "events": ["event"], "slow": []}
+    assert partial == ["slow"]
+    assert elapsed < 0.5, elapsed
+
+
+def test_combined_recommendations_survive_a_slow_events_stage():
+    """A Dedalus fetch that overruns its timeout leaves the hosts intact."""
+    nova_act = make_nova_act()
+
+    async def hang(**kwargs):
+        await asyncio.sleep(5)
+    nova_act.get_events_from_dedalus = hang
+
+    original_timeout = nova_act_module.EVENTS_STAGE_TIMEOUT
+    nova_act_module.EVENTS_STAGE_TIMEOUT = 0.1
+    try:
+        result = asyncio.run(nova_act.get_combined_recommendations("quiet", max_hosts=2))
+        updates = asyncio.run(collect(nova_act))
+    finally:
+        nova_act_module.EVENTS_STAGE_TIMEOUT = original_timeout
+    assert result["partial"] == ["events"]
+    assert len(result["hosts"]) == 2 and result["events"] == []
+    assert updates[0]["hosts"] and updates[1]["events"] == []
+    assert updates[-1]["partial"] == ["events"]
+
+
+def test_stream_endpoint_sends_events():
+    """The Flask route serves the updates as Server-Sent Events."""
+    original, original_key = NovaAct.get_events_from_dedalus, Knot.CLAUDE_API_KEY
+
+    async def get_events_from_dedalus(self, **kwargs):
+        return EVENTS
+    NovaAct.get_events_from_dedalus, Knot.CLAUDE_API_KEY = get_events_from_dedalus, None
+    try:
+        client = server.app.test_client()
+        response = client.post("/api/combined/match/stream", json={"preferences": "quiet tech"})
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        updates = [json.loads(line[len("data: "):]) for line in response.get_data(as_text=True).split("\n")
+                   if line.startswith("data: ")]
+        assert updates[0]["type"] == "hosts" and updates[1]["type"] == "events"
+        assert updates[-1]["type"] == "done"
+        assert client.post("/api/combined/match/stream", json={"preferences": ""}).status_code == 400
+    finally:
+        NovaAct.get_events_from_dedalus, Knot.CLAUDE_API_KEY = original, original_key
+
+
+def test_stay_ranges_limit_the_hosts():
+    """date_needed may be a stay: only hosts free on every night of it are recommended."""
+    updates = asyncio.run(collect(make_nova_act(), date_needed="2025-11-08 to 2025-11-10", max_hosts=5))
+    assert [rec["host"]["id"] for rec in updates[0]["hosts"]] == [101]
+    result = asyncio.run(make_nova_act().get_combined_recommendations("quiet", date_needed="2025-11-08", max_hosts=5))
+    assert sorted(host["id"] for host in result["hosts"]) == [101, 102]
+
+
+if __name__ == "__main__":
+    test_local_rankings_come_first()
+    test_ai_picks_stream_as_lines_complete()
+    test_ai_failure_falls_back_to_local_results()
+    test_stages_run_concurrently_with_fallbacks()
+    test_combined_recommendations_survive_a_slow_events_stage()
+    test_stream_endpoint_sends_events()
+    test_stay_ranges_limit_the_hosts()
+    print("✅ All combined streaming tests passed!")
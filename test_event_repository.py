@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared, hot-reloading events repository and the routes built on it.
+Run this with: python test_event_repository.py
+"""
+
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import httpx
+import dedalus_events
+import nova_act
+import server
+from fastapi.testclient import TestClient
+from event_repository import EventRepository, is_free
+
+DETAILS = {"description": "", "time": "18:00", "location": "Campus", "organizer": "Students"}
+EVENTS = [
+    dict(DETAILS, id=1, title="Hackathon", date="2025-11-22", category="Academic", cost=0.0, tags=["AI", "free"]),
+    dict(DETAILS, id=2, title="A cappella", date="2025-11-14", category="arts", cost=10.0, tags=["music"]),
+    dict(DETAILS, id=3, title="Coffee chat", date="2025-11-11", category="social", cost="0", tags=["Social"]),
+]
+
+
+def write_events(path, events):
+    with open(path, 'w') as f:
+        json.dump(events, f)
+    # Make sure the rewrite is visible even on coarse mtime clocks
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+
+
+def make_repository(tmp, events=EVENTS):
+    path = os.path.join(tmp, "events.json")
+    write_events(path, events)
+    return EventRepository(path, lambda: [{"id": 99, "title": "Default", "date": "2025-01-01"}])
+
+
+def test_file_is_parsed_once_and_reloaded_on_change():
+    """Repeated reads reuse the parsed file; an edit on disk is picked up."""
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = make_repository(tmp)
+        assert [e["id"] for e in repository.all()] == [1, 2, 3]
+        version = repository.version()
+        for _ in range(5):
+            repository.all()
+            repository.get(2)
+        assert repository.version() == version
+
+        write_events(repository.path, EVENTS[:1])
+        assert [e["id"] for e in repository.all()] == [1]
+        assert repository.get(2) is None
+        assert repository.version() == version + 1
+
+
+def test_fingerprint_follows_content_not_reloads():
+    """Repositories (e.g. in two workers) agree on a fingerprint exactly when their events agree."""
+    with tempfile.TemporaryDirectory() as tmp:
+        first = make_repository(tmp)
+        second = EventRepository(first.path)
+        other = EventRepository(os.path.join(tmp, "other.json"))
+        write_events(other.path, EVENTS[:2])
+        assert first.version() == other.version() == 1
+        assert first.fingerprint() == second.fingerprint() != other.fingerprint()
+        assert first.query_page()["fingerprint"] == first.fingerprint()
+
+        write_events(other.path, EVENTS)
+        assert other.fingerprint() == first.fingerprint()
+
+
+def test_missing_file_serves_defaults_without_writing():
+    """A missing file, or one holding an empty list, serves the defaults."""
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = EventRepository(os.path.join(tmp, "missing.json"), lambda: [{"id": 99, "date": "2025-01-01"}])
+        assert [e["id"] for e in repository.all()] == [99]
+        assert not os.path.exists(repository.path)
+
+        write_events(repository.path, [])
+        assert [e["id"] for e in repository.all()] == [99]
+        repository.replace_all([])
+        assert [e["id"] for e in repository.all()] == [99]
+        assert EventRepository(repository.path).all() == []
+
+
+def test_writes_to_an_empty_file_never_save_the_defaults():
+    """Deleting the last event serves the defaults, but the next write starts from the empty list."""
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = make_repository(tmp, EVENTS[:1])
+        assert repository.delete(1)["id"] == 1
+        assert [e["id"] for e in repository.all()] == [99]
+        assert repository.delete(99) is None
+        created = repository.create({"title": "Poetry", "date": "2025-11-20", "cost": 5.0})
+        assert created["id"] == 1
+        with open(repository.path) as f:
+            assert [e["id"] for e in json.load(f)] == [1]
+        assert [e["id"] for e in repository.all()] == [1]
+
+
+def test_query_filters_and_sorts_by_date():
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = make_repository(tmp)
+        assert [e["id"] for e in repository.query()] == [3, 2, 1]
+        assert [e["id"] for e in repository.query(category="academic")] == [1]
+        assert [e["id"] for e in repository.query(free_only=True)] == [3, 1]
+        assert [e["id"] for e in repository.query(tags="ai, social")] == [3, 1]
+        assert [e["id"] for e in repository.query(date_from="2025-11-12", date_to="2025-11-22")] == [2, 1]
+        assert repository.categories() == ["Academic", "arts", "social"]
+
+
+def brute_force(events, category=None, date_from=None, date_to=None, free_only=False, tags=None):
+    """The filters as plain list comprehensions, for comparison with the indexes."""
+    wanted = {tag.strip().lower() for tag in tags.split(",")} if tags else set()
+    matches = [
+        e for e in events
+        if (not category or e["category"].lower() == category.lower())
+        and (not date_from or e["date"] >= date_from) and (not date_to or e["date"] <= date_to)
+        and (not free_only or is_free(e))
+        and (not wanted or wanted & {tag.lower() for tag in e["tags"]})
+    ]
+    return sorted(matches, key=lambda e: (e["date"], e["id"]))
+
+
+def test_indexed_queries_match_a_full_scan():
+    """Index intersections and date bisects return exactly what filtering every event would."""
+    rng = random.Random(5)
+    categories, tags = ["academic", "Arts", "social", "sports"], ["ai", "free", "music", "food", "outdoor"]
+    events = [dict(DETAILS, id=i, title=f"Event {i}", date=f"2025-11-{rng.randint(1, 30):02d}",
+                   category=rng.choice(categories), cost=rng.choice([0.0, 5.0, "0", None, 12.5]),
+                   tags=rng.sample(tags, rng.randint(0, 3))) for i in range(1, 301)]
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = make_repository(tmp, events)
+        for _ in range(200):
+            filters = {
+                "category": rng.choice([None, "arts", "ACADEMIC", "missing"]),
+                "date_from": rng.choice([None, "2025-11-05", "2025-11-15"]),
+                "date_to": rng.choice([None, "2025-11-10", "2025-11-25"]),
+                "free_only": rng.random() < 0.5,
+                "tags": rng.choice([None, "ai", "music, FOOD", "nope"]),
+            }
+            assert repository.query(**filters) == brute_force(events, **filters), filters
+
+
+def test_pages_cover_every_match_once():
+    """Following next_cursor walks the full result in order; a bad cursor is rejected."""
+    events = [dict(DETAILS, id=i, title=f"Event {i}", date=f"2025-11-{i % 7 + 1:02d}", category="social",
+                   cost=0.0, tags=["social"]) for i in range(1, 41)]
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = make_repository(tmp, events)
+        seen, cursor = [], None
+        while True:
+            page = repository.query_page(free_only=True, cursor=cursor, limit=7)
+            assert page["total_count"] == 40
+            seen.extend(page["events"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == repository.query(free_only=True)
+
+        original = server.event_repository
+        server.event_repository = repository
+        try:
+            client = server.app.test_client()
+            body = client.get("/api/events?limit=5&tags=social").get_json()
+            assert len(body["events"]) == 5 and body["total_count"] == 40 and body["next_cursor"]
+            second = client.get(f"/api/events?limit=5&tags=social&cursor={body['next_cursor']}").get_json()
+            assert second["events"] == seen[5:10]
+            assert client.get("/api/events?cursor=garbage").status_code == 400
+            assert client.get("/api/events?limit=0").status_code == 400
+        finally:
+            server.event_repository = original
+
+
+def test_writes_are_saved_and_visible():
+    """create/update/delete write the file and update memory; a second repository sees them."""
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = make_repository(tmp)
+        created = repository.create({"title": "Poetry", "date": "2025-11-20", "category": "arts", "cost": 5.0})
+        assert created["id"] == 4
+        assert repository.update(2, {"cost": 0.0})["cost"] == 0.0
+        assert repository.update(42, {"cost": 1}) is None
+        assert repository.delete(1)["title"] == "Hackathon"
+        assert repository.delete(1) is None
+
+        other = EventRepository(repository.path)
+        assert [e["id"] for e in other.all()] == [2, 3, 4]
+        assert other.get(2)["cost"] == 0.0
+        assert [e["id"] for e in repository.query(free_only=True)] == [3, 2]
+
+
+def test_routes_read_from_the_repository():
+    """The Flask events API and the Dedalus service answer from the shared repository."""
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = make_repository(tmp)
+        original_server, original_dedalus = server.event_repository, dedalus_events.event_repository
+        server.event_repository = dedalus_events.event_repository = repository
+        try:
+            body = server.app.test_client().get("/api/events?free_only=true").get_json()
+            assert [e["id"] for e in body["events"]] == [3, 1] and body["total_count"] == 2
+            assert server.load_events_file() == repository.all()
+
+            client = TestClient(dedalus_events.app)
+            assert [e["id"] for e in client.get("/events", params={"category": "arts"}).json()] == [2]
+            assert client.get("/events/3").json()["title"] == "Coffee chat"
+            assert client.get("/events/42").status_code == 404
+            assert client.put("/events/3", json={"title": "Coffee & code"}).json()["title"] == "Coffee & code"
+            assert repository.get(3)["title"] == "Coffee & code"
+        finally:
+            server.event_repository, dedalus_events.event_repository = original_server, original_dedalus
+
+
+class FakeHttpClient:
+    """Stands in for the shared httpx client: serves Dedalus GET /events/{id} from a dict."""
+
+    def __init__(self, events):
+        self.events = events
+        self.urls = []
+
+    async def get(self, url, **kwargs):
+        self.urls.append(url)
+        event = self.events.get(int(url.rsplit("/", 1)[1]))
+        return httpx.Response(200 if event else 404, json=event or {"detail": "Event not found"},
+                              request=httpx.Request("GET", url))
+
+
+def test_event_detail_is_local_first():
+    """/api/events/<id> answers from the repository; only misses go to Dedalus, and are cached."""
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = make_repository(tmp)
+        remote = dict(DETAILS, id=7, title="Remote talk", date="2025-11-30", category="academic", cost=0.0, tags=[])
+        http = FakeHttpClient({7: remote})
+        originals = server.event_repository, nova_act.event_repository, nova_act.get_http_client
+        server.event_repository = nova_act.event_repository = repository
+        nova_act.get_http_client = lambda: http
+        nova_act.remote_event_cache.clear()
+        try:
+            client = server.app.test_client()
+            assert client.get("/api/events/2").get_json()["event"]["title"] == "A cappella"
+            assert http.urls == []
+
+            for _ in range(3):
+                assert client.get("/api/events/7").get_json()["event"]["title"] == "Remote talk"
+                assert client.get("/api/events/42").status_code == 404
+            assert len(http.urls) == 2
+
+            assert asyncio.run(nova_act.NovaAct().get_event(3))["title"] == "Coffee chat"
+            assert len(http.urls) == 2
+        finally:
+            server.event_repository, nova_act.event_repository, nova_act.get_http_client = originals
+            nova_act.remote_event_cache.clear()
+
+
+if __name__ == "__main__":
+    test_file_is_parsed_once_and_reloaded_on_change()
+    test_fingerprint_follows_content_not_reloads()
+    test_missing_file_serves_defaults_without_writing()
+    test_writes_to_an_empty_file_never_save_the_defaults()
+    test_query_filters_and_sorts_by_date()
+    test_indexed_queries_match_a_full_scan()
+    test_pages_cover_every_match_once()
+    test_writes_are_saved_and_visible()
+    test_routes_read_from_the_repository()
+    test_event_detail_is_local_first()
+    print("✅ All event repository tests passed!")
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory listing store used by tools.py.
+Run this with: python test_listing_store.py
+"""
+
+import base64
+import json
+import os
+import tempfile
+import time
+from listing_store import ListingStore
+
+SAMPLE_LISTINGS = [
+    {"id": 101, "name": "Alex", "email": "alex@example.com", "available_dates": ["2025-11-08", "2025-11-09"], "capacity": 1},
+    {"id": 102, "name": "Jamie", "email": "jamie@example.com", "available_dates": ["2025-11-08", "2025-11-10"], "capacity": 2},
+    {"id": 103, "name": "Alex 2", "email": "alex@example.com", "available_dates": ["2025-11-10"], "capacity": 3},
+]
+
+
+def make_store(listings=SAMPLE_LISTINGS):
+    """Write listings to a temp file and return a store backed by it."""
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'listings.json')
+    with open(path, 'w') as f:
+        json.dump(listings, f, indent=2)
+    return ListingStore(path)
+
+
+def test_indexed_lookups():
+    """Lookups by id, email and date use the in-memory indexes."""
+    store = make_store()
+    assert store.get(102)["name"] == "Jamie"
+    assert store.get(999) is None
+    assert [l["id"] for l in store.get_by_email("alex@example.com")] == [101, 103]
+    assert [l["id"] for l in store.get_available("2025-11-08")] == [101, 102]
+    assert [l["id"] for l in store.get_available("2025-11-08", min_capacity=2)] == [102]
+    assert store.get_available("2025-12-25") == []
+    assert store.next_id() == 104
+
+
+def test_stay_queries_cover_every_night():
+    """A multi-night stay only matches listings free on all of its nights."""
+    store = make_store()
+    assert [l["id"] for l in store.get_available_for_nights(["2025-11-08", "2025-11-09"])] == [101]
+    assert [l["id"] for l in store.get_available_for_nights(["2025-11-08", "2025-11-10"])] == [102]
+    assert store.get_available_for_nights(["2025-11-08", "2025-11-10"], min_capacity=3) == []
+    assert store.get_available_for_nights([]) == []
+
+
+def test_writes_update_indexes_and_file():
+    """Mutations reindex the listing and write the same JSON format back."""
+    store = make_store()
+    store.modify(101, lambda l: l.update({"available_dates": ["2025-11-10"]}))
+    assert [l["id"] for l in store.get_available("2025-11-08")] == [102]
+    assert [l["id"] for l in store.get_available("2025-11-10")] == [101, 102, 103]
+
+    store.insert({"id": 104, "name": "Sam", "email": "sam@example.com", "available_dates": ["2025-11-08"], "capacity": 1})
+    assert store.delete(102)
+    assert not store.delete(102)
+    assert [l["id"] for l in store.get_available("2025-11-08")] == [104]
+
+    # Replaying the log from a cold start gives the same listings
+    assert [l["id"] for l in ListingStore(store.path).all()] == [101, 103, 104]
+
+    store.compact()
+    with open(store.path) as f:
+        on_disk = json.load(f)
+    assert [l["id"] for l in on_disk] == [101, 103, 104]
+
+
+def test_mutations_append_to_log_instead_of_rewriting():
+    """Small writes append ops to listings.json.wal; the snapshot is left alone."""
+    store = make_store()
+    snapshot_before = os.stat(store.path)
+    store.append_review(101, lambda review_id: {"id": review_id, "rating": 5})
+    store.modify(102, lambda l: l.update({"capacity": 4}))
+    assert os.stat(store.path).st_mtime_ns == snapshot_before.st_mtime_ns
+
+    with open(store.wal_path) as f:
+        lines = [json.loads(line) for line in f]
+    assert [line.get("op") for line in lines[1:]] == ["review", "set"]
+    assert lines[2]["fields"] == {"capacity": 4}
+
+    restarted = ListingStore(store.path)
+    assert restarted.get(102)["capacity"] == 4
+    assert restarted.rating_summary(101)["review_count"] == 1
+
+
+def test_torn_log_tail_is_ignored():
+    """A half-written op from a crashed writer is skipped and overwritten."""
+    store = make_store()
+    store.delete(103)
+    with open(store.wal_path, 'a') as f:
+        f.write('{"op": "delete", "id": 1')
+    restarted = ListingStore(store.path)
+    assert [l["id"] for l in restarted.all()] == [101, 102]
+    restarted.delete(102)
+    assert [l["id"] for l in ListingStore(store.path).all()] == [101]
+
+
+def test_log_is_compacted_past_threshold():
+    """Once the log passes compact_bytes it is folded back into the snapshot."""
+    store = make_store()
+    store.compact_bytes = 200
+    for _ in range(5):
+        store.append_review(101, lambda review_id: {"id": review_id, "rating": 4, "comment": "x" * 50})
+    store._compaction_thread.join()
+    with open(store.path) as f:
+        assert len(json.load(f)[0]["reviews"]) == 5
+    assert os.path.getsize(store.wal_path) < 200
+    assert ListingStore(store.path).rating_summary(101)["review_count"] == 5
+
+
+def test_returned_listings_are_copies():
+    """Annotating a returned listing must not leak into the store."""
+    store = make_store()
+    listing = store.get(101)
+    listing["average_rating"] = 4.5
+    assert "average_rating" not in store.get(101)
+
+
+def test_rating_aggregates():
+    """Rating sum/count/average are maintained as reviews are appended."""
+    listings = [dict(SAMPLE_LISTINGS[0], reviews=[{"id": 1, "rating": 4}])]
+    store = make_store(listings)
+    assert store.rating_summary(101) == {"rating_sum": 4, "review_count": 1, "average_rating": 4.0}
+    assert store.append_review(101, lambda review_id: {"id": review_id, "rating": 5})
+    assert store.rating_summary(101) == {"rating_sum": 9, "review_count": 2, "average_rating": 4.5}
+    assert store.get(101)["reviews"][-1]["id"] == 2
+    assert not store.append_review(999, lambda review_id: {"id": review_id, "rating": 5})
+    assert store.rating_summary(999)["average_rating"] == 0.0
+
+
+def test_reloads_when_file_changes():
+    """An external write to the file is picked up on the next read."""
+    store = make_store()
+    assert store.get(101)["name"] == "Alex"
+    time.sleep(0.01)
+    with open(store.path, 'w') as f:
+        json.dump([{"id": 101, "name": "Alexandra", "email": "alex@example.com", "available_dates": [], "capacity": 1}], f)
+    assert store.get(101)["name"] == "Alexandra"
+    assert store.get(102) is None
+
+
+def test_query_listings_filters_sorts_and_pages():
+    """query_listings filters server-side and walks pages with a keyset cursor."""
+    import tools
+    listings = [
+        dict(SAMPLE_LISTINGS[0], description="Quiet study spot", reviews=[{"id": 1, "rating": 4}]),
+        dict(SAMPLE_LISTINGS[1], description="Lively and social", reviews=[{"id": 1, "rating": 5}]),
+        dict(SAMPLE_LISTINGS[2], description="Quiet and clean", reviews=[]),
+    ]
+    original_store = tools._store
+    tools._store = make_store(listings)
+    try:
+        result = tools.query_listings(date="2025-11-08")
+        assert [l["id"] for l in result["listings"]] == [101, 102]
+        assert result["total_count"] == 2 and result["next_cursor"] is None
+        assert [l["id"] for l in tools.query_listings(min_capacity=2)["listings"]] == [102, 103]
+        assert [l["id"] for l in tools.query_listings(min_rating=4.5)["listings"]] == [102]
+        assert [l["id"] for l in tools.query_listings(text="quiet")["listings"]] == [101, 103]
+
+        pages, cursor = [], None
+        while True:
+            page = tools.query_listings(sort="rating", descending=True, limit=2, cursor=cursor)
+            pages.append([l["id"] for l in page["listings"]])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert pages == [[102, 101], [103]]
+
+        crafted = [base64.urlsafe_b64encode(json.dumps(payload).encode()).decode() for payload in
+                   (["id", False, 5], ["id", False, ["x"]], ["rating", True, [4.5]], ["id", 0, [101]], {"a": 1})]
+        for bad in [{"sort": "name"}, {"cursor": "not-a-cursor"}] + [{"cursor": c} for c in crafted]:
+            try:
+                tools.query_listings(**bad)
+                assert False, f"expected ValueError for {bad}"
+            except ValueError:
+                pass
+    finally:
+        tools._store = original_store
+
+
+def test_query_listings_uses_a_presorted_index():
+    """Sort orders are built once per listings version; filtered pages still walk every match."""
+    import tools
+    listings = [dict(SAMPLE_LISTINGS[0], id=200 + i, capacity=1 + i % 3, available_dates=[],
+                     reviews=[{"id": 1, "rating": 1 + i % 5}]) for i in range(30)]
+    original_store, original_index = tools._store, tools._ListingIndex
+    builds = []
+
+    class CountingIndex(tools._ListingIndex):
+        def __init__(self, listings):
+            builds.append(len(listings))
+            super().__init__(listings)
+
+    tools._store, tools._ListingIndex = make_store(listings), CountingIndex
+    try:
+        seen, cursor = [], None
+        while True:
+            page = tools.query_listings(min_capacity=2, sort="rating", descending=True, limit=4, cursor=cursor)
+            assert page["total_count"] == 20
+            seen.extend(page["listings"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        expected = sorted((l for l in listings if l["capacity"] >= 2),
+                          key=lambda l: (l["reviews"][0]["rating"], l["id"]), reverse=True)
+        assert [l["id"] for l in seen] == [l["id"] for l in expected]
+        assert all(l["average_rating"] == l["reviews"][0]["rating"] for l in seen)
+        assert builds == [30]
+
+        tools.update_listing(200, {"capacity": 5})
+        assert tools.query_listings(min_capacity=5)["total_count"] == 1
+        assert builds == [30, 30]
+    finally:
+        tools._store, tools._ListingIndex = original_store, original_index
+
+
+def test_listing_projection_and_review_pages():
+    """Sparse fieldsets drop unrequested fields; reviews are paged by review id."""
+    import tools
+    reviews = [{"id": i, "rating": 5, "comment": f"Review {i}"} for i in range(1, 6)]
+    original_store = tools._store
+    tools._store = make_store([dict(SAMPLE_LISTINGS[0], reviews=reviews)])
+    try:
+        projected = tools.project_listing(tools.get_listing_by_id(101), ["name", "capacity", "missing"])
+        assert projected == {"id": 101, "name": "Alex", "capacity": 1}
+
+        first = tools.get_listing_reviews(101, limit=2)
+        assert [r["id"] for r in first["reviews"]] == [1, 2]
+        assert first["total_count"] == 5
+        second = tools.get_listing_reviews(101, cursor=first["next_cursor"], limit=2)
+        assert [r["id"] for r in second["reviews"]] == [3, 4]
+        newest = tools.get_listing_reviews(101, limit=3, descending=True)
+        assert [r["id"] for r in newest["reviews"]] == [5, 4, 3]
+        rest = tools.get_listing_reviews(101, cursor=newest["next_cursor"], limit=3, descending=True)
+        assert [r["id"] for r in rest["reviews"]] == [2, 1] and rest["next_cursor"] is None
+        assert tools.get_listing_reviews(999) is None
+    finally:
+        tools._store = original_store
+
+
+if __name__ == "__main__":
+    test_indexed_lookups()
+    test_stay_queries_cover_every_night()
+    test_writes_update_indexes_and_file()
+    test_mutations_append_to_log_instead_of_rewriting()
+    test_torn_log_tail_is_ignored()
+    test_log_is_compacted_past_threshold()
+    test_returned_listings_are_copies()
+    test_rating_aggregates()
+    test_reloads_when_file_changes()
+    test_query_listings_filters_sorts_and_pages()
+    test_query_listings_uses_a_presorted_index()
+    test_listing_projection_and_review_pages()
+    print("✅ All listing store tests passed!")
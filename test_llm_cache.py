@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent LLM response cache and its use by AI event recommendations.
+Run this with: python test_llm_cache.py
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+import nova_act as nova_act_module
+from llm_cache import LLMResponseCache, normalize_query
+from nova_act import NovaAct
+
+EVENTS = [
+    {"id": 1, "title": "Free hackathon", "description": "Coding all night", "tags": ["tech", "free"]},
+    {"id": 2, "title": "Poetry reading", "description": "Quiet evening of poems", "tags": ["arts"]},
+]
+
+
+def test_exact_hits_survive_a_restart():
+    """Entries are on disk: a new cache object on the same file sees them."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        LLMResponseCache(path).set("scope", "Free tech events", {"answer": 1})
+        cache = LLMResponseCache(path)
+        assert cache.get("scope", "free TECH events!") == {"answer": 1}
+        assert cache.get("other scope", "free tech events") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_near_duplicates_reuse_an_answer():
+    """A query close enough to a cached one gets its answer; a different one doesn't."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.db"), similarity=0.85)
+        cache.set("scope", "free tech events on campus", {"answer": 1})
+        assert cache.get("scope", "free tech events on campus tonight") == {"answer": 1}
+        assert cache.get("scope", "poetry and art") is None
+        assert cache.near_hits == 1
+
+        strict = LLMResponseCache(os.path.join(tmp, "cache.db"), similarity=1.01)
+        assert strict.get("scope", "free tech events on campus tonight") is None
+
+        cache.set("scope", "hate parties, love quiet", {"answer": 2})
+        assert cache.get("scope", "love parties, hate quiet") is None
+
+
+def test_near_duplicate_scan_is_capped():
+    """Only the max_candidates most recently used entries of a scope are compared."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.db"), similarity=0.85, max_candidates=2)
+        cache.set("scope", "free tech events on campus", {"answer": 1})
+        cache.set("scope", "poetry and art", {"answer": 2})
+        cache.set("scope", "sports games", {"answer": 3})
+        assert cache.get("scope", "free tech events on campus tonight") is None
+        assert cache.get("scope", "free tech events on campus") == {"answer": 1}
+        assert cache.get("scope", "free tech events on campus tonight") == {"answer": 1}
+
+
+def test_eviction_by_count_size_and_age():
+    """The least recently used entries go first; expired ones are never returned."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.db"), max_entries=2, similarity=1.01)
+        cache.set("s", "alpha", 1)
+        cache.set("s", "beta", 2)
+        assert cache.get("s", "alpha") == 1  # "beta" is now least recently used
+        cache.set("s", "gamma", 3)
+        assert cache.get("s", "beta") is None
+        assert cache.get("s", "alpha") == 1 and cache.get("s", "gamma") == 3
+
+        sized = LLMResponseCache(os.path.join(tmp, "sized.db"), max_bytes=250)
+        for word in ("one", "two", "three"):
+            sized.set("s", word, "x" * 100)
+        assert sized.stats()["size"] == 2 and sized.stats()["bytes"] <= 250
+
+        aging = LLMResponseCache(os.path.join(tmp, "aging.db"), max_age=0.05)
+        aging.set("s", "alpha", 1)
+        time.sleep(0.1)
+        assert aging.get("s", "alpha") is None
+        aging.set("s", "beta", 2)
+        assert aging.stats()["size"] == 1
+
+
+def test_normalize_query():
+    """Case and punctuation don't matter; word order does."""
+    assert normalize_query("Free TECH events!") == normalize_query("free tech, events")
+    assert normalize_query("I hate parties, love quiet") != normalize_query("I love parties, hate quiet")
+
+
+def test_recommendations_call_claude_once():
+    """Repeated and near-identical interests share one Claude call, until the catalog changes."""
+    calls = []
+
+    class FakeText:
+        def __init__(self, text):
+            self.text = text
+
+    class FakeMessage:
+        def __init__(self, text):
+            self.content = [FakeText(text)]
+
+    async def ask_claude(prompt, max_tokens):
+        calls.append(prompt)
+        return FakeMessage(json.dumps({"recommendations": [{"event_id": 1, "relevance_score": 0.9}],
+                                       "summary": "Go hack"}))
+
+    nova_act = NovaAct()
+    nova_act.claude_api_key, nova_act.claude_model = "test-key", "test-model"
+    nova_act.ask_claude = ask_claude
+
+    original_cache = nova_act_module.recommendation_cache
+    with tempfile.TemporaryDirectory() as tmp:
+        nova_act_module.recommendation_cache = LLMResponseCache(os.path.join(tmp, "cache.db"), similarity=0.8)
+        try:
+            first = asyncio.run(nova_act.get_ai_recommendations("free tech events", EVENTS, 5))
+            again = asyncio.run(nova_act.get_ai_recommendations("Free TECH events!", EVENTS, 5))
+            similar = asyncio.run(nova_act.get_ai_recommendations("free tech events tonight", EVENTS, 5))
+            assert len(calls) == 1
+            assert first == again == similar
+            assert first["recommendations"][0]["event"]["id"] == 1
+
+            asyncio.run(nova_act.get_ai_recommendations("free tech events", EVENTS, 3))
+            changed = EVENTS + [{"id": 3, "title": "Robotics demo", "tags": ["tech"]}]
+            asyncio.run(nova_act.get_ai_recommendations("free tech events", changed, 5))
+            assert len(calls) == 3
+
+            # With a catalog given, its identity names the cache entry, not the events' content
+            asyncio.run(nova_act.get_ai_recommendations("free tech events", EVENTS, 5, catalog=(1, None)))
+            asyncio.run(nova_act.get_ai_recommendations("free tech events", changed, 5, catalog=(1, None)))
+            assert len(calls) == 4
+            asyncio.run(nova_act.get_ai_recommendations("free tech events", changed, 5, catalog=(2, None)))
+            assert len(calls) == 5
+        finally:
+            nova_act_module.recommendation_cache = original_cache
+
+
+if __name__ == "__main__":
+    test_exact_hits_survive_a_restart()
+    test_near_duplicates_reuse_an_answer()
+    test_near_duplicate_scan_is_capped()
+    test_eviction_by_count_size_and_age()
+    test_normalize_query()
+    test_recommendations_call_claude_once()
+    print("✅ All LLM cache tests passed!")
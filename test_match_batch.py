@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for batch visitor matching (/api/match/batch).
+Run this with: python test_match_batch.py
+"""
+
+import asyncio
+import json
+import time
+import ai_agent
+from knot import Knot
+from server import app
+
+
+def guest_client():
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['guest'] = True
+    return client
+
+
+def test_batch_matches_every_request():
+    """Each valid request gets its ranked hosts; invalid items get their own error."""
+    ai_agent.match_cache.clear()
+    response = guest_client().post("/api/match/batch", json={
+        "use_ai": False,
+        "requests": [
+            {"visitor_query": "quiet study, early bedtime", "date_needed": "2025-11-08"},
+            {"visitor_query": "night owl, loves parties", "date_needed": "2025-11-08"},
+            {"visitor_query": "no date given"},
+            {"visitor_query": "quiet study, early bedtime", "date_needed": "2025-11-08"},
+        ]
+    })
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert len(results) == 4
+    assert results[0]["matches"]["ranked_matches"][0]["host_id"] == 101
+    assert results[1]["matches"]["ranked_matches"][0]["host_id"] == 102
+    assert results[2] == {"success": False, "error": "date_needed is required"}
+    assert results[3]["matches"] == results[0]["matches"]
+    ai_agent.match_cache.clear()
+
+
+def test_batch_validation_and_auth():
+    assert app.test_client().post("/api/match/batch", json={"requests": []}).status_code == 401
+    client = guest_client()
+    assert client.post("/api/match/batch", json={"requests": []}).status_code == 400
+    too_many = [{"visitor_query": "quiet", "date_needed": "2025-11-08"}] * 101
+    assert client.post("/api/match/batch", json={"requests": too_many}).status_code == 400
+
+
+def test_visitors_are_packed_into_few_llm_calls():
+    """With Claude configured, visitors share calls; unknown hosts in the reply are ignored."""
+    calls = []
+
+    class FakeText:
+        def __init__(self, text):
+            self.text = text
+
+    class FakeMessage:
+        def __init__(self, text):
+            self.content = [FakeText(text)]
+
+    async def fake_create_message(api_key, **kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        visitors = json.loads(prompt.split("Visitors:\n", 1)[1].split("\n", 1)[0])
+        calls.append(len(visitors))
+        assert kwargs["max_tokens"] <= ai_agent.MAX_OUTPUT_TOKENS
+        results = [{"visitor": v["visitor"], "ranked_matches": [
+            {"host_id": 999, "name": "Made up", "compatibility_score": 1.0},
+            {"host_id": v["candidates"][-1]["host_id"], "compatibility_score": 0.9, "reasoning": "AI pick"}
+        ]} for v in visitors]
+        return FakeMessage(json.dumps({"results": results}))
+
+    original_create, original_key, original_available = ai_agent.create_message, Knot.CLAUDE_API_KEY, ai_agent.CLAUDE_AVAILABLE
+    ai_agent.create_message, Knot.CLAUDE_API_KEY, ai_agent.CLAUDE_AVAILABLE = fake_create_message, "test-key", True
+    ai_agent.match_cache.clear()
+    try:
+        requests = [(f"visitor {i} likes gaming and coffee", "2025-11-08") for i in range(10)]
+        results = [json.loads(r)["ranked_matches"] for r in asyncio.run(ai_agent.run_matching_batch(requests))]
+    finally:
+        ai_agent.create_message, Knot.CLAUDE_API_KEY, ai_agent.CLAUDE_AVAILABLE = original_create, original_key, original_available
+        ai_agent.match_cache.clear()
+
+    assert sorted(calls) == [2, 8]
+    for matches in results:
+        assert matches[0]["reasoning"] == "AI pick"
+        assert 999 not in [m["host_id"] for m in matches]
+        assert sorted(m["host_id"] for m in matches) == [101, 102]
+
+
+def test_batch_and_agent_answers_are_cached_apart():
+    """A TF-IDF-only batch neither serves nor overwrites the agent's cached answer."""
+    ai_agent.match_cache.clear()
+    try:
+        agent_key = ai_agent.match_cache_key("quiet study", "2025-11-08")
+        ai_agent.match_cache.set(agent_key, json.dumps({"ranked_matches": [{"host_id": 1, "reasoning": "agent"}]}))
+        batch = asyncio.run(ai_agent.run_matching_batch([("quiet study", "2025-11-08")], use_ai=False))
+        assert json.loads(batch[0])["ranked_matches"][0]["reasoning"] != "agent"
+        assert json.loads(ai_agent.match_cache.get(agent_key))["ranked_matches"][0]["reasoning"] == "agent"
+    finally:
+        ai_agent.match_cache.clear()
+
+
+def test_calls_fit_the_output_token_limit():
+    """A low output limit means fewer visitors per call, never a request above it."""
+    original = ai_agent.MAX_OUTPUT_TOKENS
+    try:
+        assert ai_agent.batch_visitors_per_call() == 8
+        ai_agent.MAX_OUTPUT_TOKENS = 1000
+        assert ai_agent.batch_visitors_per_call() == 2
+        ai_agent.MAX_OUTPUT_TOKENS = 10
+        assert ai_agent.batch_visitors_per_call() == 1
+    finally:
+        ai_agent.MAX_OUTPUT_TOKENS = original
+
+
+def test_failed_claude_rankings_are_cached_briefly():
+    """If the Claude call fails, the TF-IDF answers stored under the batch key expire quickly."""
+    async def failing_create_message(api_key, **kwargs):
+        raise RuntimeError("overloaded")
+
+    originals = (ai_agent.create_message, Knot.CLAUDE_API_KEY, ai_agent.CLAUDE_AVAILABLE, ai_agent.FALLBACK_CACHE_TTL)
+    ai_agent.create_message, Knot.CLAUDE_API_KEY, ai_agent.CLAUDE_AVAILABLE = failing_create_message, "test-key", True
+    ai_agent.FALLBACK_CACHE_TTL = 0.01
+    ai_agent.match_cache.clear()
+    try:
+        asyncio.run(ai_agent.run_matching_batch([("quiet study", "2025-11-08")]))
+        key = ai_agent.match_cache_key("quiet study", "2025-11-08", "claude_batch")
+        assert ai_agent.match_cache.get(key) is not None
+        time.sleep(0.02)
+        assert ai_agent.match_cache.get(key) is None
+    finally:
+        ai_agent.create_message, Knot.CLAUDE_API_KEY, ai_agent.CLAUDE_AVAILABLE, ai_agent.FALLBACK_CACHE_TTL = originals
+        ai_agent.match_cache.clear()
+
+
+if __name__ == "__main__":
+    test_batch_matches_every_request()
+    test_batch_validation_and_auth()
+    test_visitors_are_packed_into_few_llm_calls()
+    test_batch_and_agent_answers_are_cached_apart()
+    test_calls_fit_the_output_token_limit()
+    test_failed_claude_rankings_are_cached_briefly()
+    print("✅ All batch matching tests passed!")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for the TF-IDF host matcher used when the AI agent is unavailable.
+Run this with: python test_matcher.py
+"""
+
+from matcher import TfidfMatcher, document_vector, tokenize
+
+HOSTS = [
+    {"id": 101, "name": "Alex", "dorm_vibe": "Quiet space, early bedtime (11 PM).",
+     "interests": "Quiet study, loves coffee, early riser.", "description": "A cozy, quiet dorm room perfect for studying."},
+    {"id": 102, "name": "Jamie", "dorm_vibe": "Loud, frequent guests, night owl.",
+     "interests": "Late-night gaming, heavy sleeper, social.", "description": "A vibrant, social dorm space."},
+    {"id": 103, "name": "Mai", "dorm_vibe": "chill", "interests": "coffee, reading, hiking", "description": "quad"},
+]
+
+
+def make_matcher():
+    matcher = TfidfMatcher()
+    matcher.build(HOSTS)
+    return matcher
+
+
+def test_tokenize():
+    """Stopwords are dropped and plurals folded."""
+    assert tokenize("I love the Rooms and games!") == ["love", "room", "game"]
+
+
+def test_document_vectors_are_unit_length():
+    """lnc document vectors are cosine-normalized."""
+    vector = document_vector(HOSTS[0])
+    assert abs(sum(w * w for w in vector.values()) - 1.0) < 1e-9
+    assert document_vector({"id": 1}) == {}
+
+
+def test_similar_host_ranks_first():
+    """The host sharing the visitor's vocabulary scores highest."""
+    results = make_matcher().score("quiet study and coffee, early riser")
+    assert results[0]["listing_id"] == 101
+    assert "quiet" in results[0]["matched_terms"]
+    assert results[0]["score"] > results[-1]["score"]
+
+
+def test_conflicts_are_penalized():
+    """A quiet visitor is steered away from a loud night-owl host."""
+    results = {r["listing_id"]: r for r in make_matcher().score("I need somewhere quiet")}
+    assert ("quiet", "loud") in results[102]["conflicts"]
+    assert ("quiet", "night owl") in results[102]["conflicts"]
+    assert results[102]["score"] == 0.0
+    assert results[101]["conflicts"] == []
+
+
+def test_candidates_min_score_and_limit():
+    """Scoring can be restricted to candidates, thresholded and truncated."""
+    matcher = make_matcher()
+    assert [r["listing_id"] for r in matcher.score("coffee", listing_ids=[102, 103])] == [103, 102]
+    assert 102 not in [r["listing_id"] for r in matcher.score("quiet", min_score=0.2)]
+    assert len(matcher.score("coffee", limit=1)) == 1
+    assert make_matcher().score("zzz unknown words")[0]["score"] == 0.3
+
+
+def test_incremental_updates_match_a_full_rebuild():
+    """add/update/remove leave the index scoring exactly like a fresh build."""
+    matcher = make_matcher()
+    matcher.add({"id": 104, "name": "Sam", "dorm_vibe": "quiet, tidy", "interests": "chess, coffee"})
+    matcher.update(dict(HOSTS[0], dorm_vibe="Loud parties every weekend"))
+    matcher.remove(103)
+    matcher.remove(999)
+
+    expected = TfidfMatcher()
+    expected.build([dict(HOSTS[0], dorm_vibe="Loud parties every weekend"), HOSTS[1],
+                    {"id": 104, "name": "Sam", "dorm_vibe": "quiet, tidy", "interests": "chess, coffee"}])
+    for query in ("quiet coffee", "loud party weekend", "night owl gaming"):
+        got = {r["listing_id"]: round(r["score"], 9) for r in matcher.score(query)}
+        want = {r["listing_id"]: round(r["score"], 9) for r in expected.score(query)}
+        assert got == want, (query, got, want)
+    assert 103 not in matcher and len(matcher) == 3
+
+
+def test_tombstones_are_compacted():
+    """Many removals renumber rows without changing results."""
+    matcher = TfidfMatcher()
+    matcher.build([{"id": i, "dorm_vibe": "quiet" if i % 2 else "loud"} for i in range(3000)])
+    for i in range(2500):
+        matcher.remove(i)
+    assert len(matcher) == 500
+    assert matcher._size < 3000  # compacted at least once
+    assert {r["listing_id"] for r in matcher.score("quiet", min_score=0.3)} == set(range(2501, 3000, 2))
+
+
+def test_change_events_and_availability():
+    """Change events keep the date index and version in step with the store."""
+    matcher = make_matcher()
+    matcher.build([dict(host, available_dates=["2025-11-08"], capacity=1) for host in HOSTS], version=7)
+    matcher.apply_change({"type": "updated", "listing_id": 102, "version": 8,
+                          "listing": dict(HOSTS[1], available_dates=["2025-11-09"], capacity=2)})
+    assert matcher.version == 8
+    assert matcher.available(["2025-11-08"]) == [101, 103]
+    assert matcher.available(["2025-11-09"], min_capacity=2) == [102]
+    matcher.apply_change({"type": "deleted", "listing_id": 103, "listing": None, "version": 9})
+    assert matcher.available(["2025-11-08"]) == [101] and matcher.version == 9
+    # A version we didn't see an event for means another writer: stop trusting the index
+    matcher.apply_change({"type": "reviewed", "listing_id": 101, "listing": None, "version": 11})
+    assert matcher.version == 9
+    matcher.apply_change({"type": "reset", "listing_id": None, "listing": None, "version": 12})
+    assert matcher.version is None
+
+
+def test_tools_writes_reach_the_shared_matcher():
+    """create/update/delete in tools.py update the shared matcher without a rebuild."""
+    import json
+    import os
+    import tempfile
+    import matcher as matcher_module
+    import tools
+    from listing_store import ListingStore
+
+    path = os.path.join(tempfile.mkdtemp(), 'listings.json')
+    with open(path, 'w') as f:
+        json.dump([dict(host, email=f"{host['id']}@example.com", available_dates=["2025-11-08"], capacity=1)
+                   for host in HOSTS], f)
+    original_store = tools._store
+    tools._store = ListingStore(path)
+    try:
+        shared = matcher_module.rebuild_matcher()
+        builds = []
+        original_build = shared.build
+        shared.build = lambda *args: builds.append(1) or original_build(*args)
+
+        created = tools.create_listing("new@example.com", "Robin", "Quiet library lover",
+                                       ["2025-11-08"], 1, "silent and calm", "books")
+        tools.update_listing_details(101, {"dorm_vibe": "party house"})
+        tools.delete_listing(103)
+        ranked = matcher_module.rank_for_stay("calm silent books", ["2025-11-08"])
+        assert ranked[0]["host_id"] == created["id"] and ranked[0]["name"] == "Robin"
+        assert 103 not in [match["host_id"] for match in ranked]
+        assert builds == []
+    finally:
+        shared.build = original_build
+        tools._store = original_store
+        shared.version = None
+
+
+def test_score_many_matches_individual_scores():
+    """Batch scoring gives exactly what one score() call per query would."""
+    matcher = make_matcher()
+    queries = ["quiet study and coffee", "late night gaming", "hiking", "zzz"]
+    candidates = [None, [101, 102], [103], None]
+    expected = [matcher.score(q, listing_ids=c, min_score=0.2) for q, c in zip(queries, candidates)]
+
+    def same(batch):
+        for got, want in zip(batch, expected):
+            assert [r["listing_id"] for r in got] == [r["listing_id"] for r in want]
+            assert all(abs(g["score"] - w["score"]) < 1e-9 for g, w in zip(got, want))
+        return len(batch) == len(expected)
+
+    assert same(matcher.score_many(queries, candidates, min_score=0.2))
+    # Small blocks (several matrix products) give the same answer
+    matcher._BLOCK_CELLS = 3
+    assert same(matcher.score_many(queries, candidates, min_score=0.2))
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_document_vectors_are_unit_length()
+    test_similar_host_ranks_first()
+    test_conflicts_are_penalized()
+    test_candidates_min_score_and_limit()
+    test_score_many_matches_individual_scores()
+    test_incremental_updates_match_a_full_rebuild()
+    test_tombstones_are_compacted()
+    test_change_events_and_availability()
+    test_tools_writes_reach_the_shared_matcher()
+    print("✅ All matcher tests passed!")
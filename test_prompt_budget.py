@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for candidate shortlisting and the prompt token budget.
+Run this with: python test_prompt_budget.py
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import nova_act as nova_act_module
+from event_repository import EventRepository
+from llm_cache import LLMResponseCache
+from matcher import TextIndex, rank_texts
+from nova_act import NovaAct, compact_json, estimate_tokens, shortlist_events
+
+
+def make_events(n):
+    """n filler events, plus one clearly matching "robotics" at the very end."""
+    events = [
+        {"id": i, "title": f"Study group {i}", "description": "Weekly reading and discussion " * 5,
+         "category": "academic", "tags": ["books"], "date": "2025-11-08", "time": "18:00", "location": "Library"}
+        for i in range(n)
+    ]
+    events.append({"id": n, "title": "Robotics build night", "description": "Build robots with the robotics club",
+                   "category": "tech", "tags": ["robotics", "hardware"]})
+    return events
+
+
+def captured_prompt(coro_factory):
+    """Run a NovaAct call with Claude stubbed out, returning the prompt it would send."""
+    prompts = []
+    nova_act = NovaAct()
+    nova_act.claude_api_key, nova_act.claude_model = "test-key", "test-model"
+
+    async def ask_claude(prompt, max_tokens):
+        prompts.append(prompt)
+        raise RuntimeError("no network in tests")
+    nova_act.ask_claude = ask_claude
+    original_cache = nova_act_module.recommendation_cache
+    with tempfile.TemporaryDirectory() as tmp:
+        nova_act_module.recommendation_cache = LLMResponseCache(os.path.join(tmp, "llm_cache.db"))
+        try:
+            asyncio.run(coro_factory(nova_act))
+        finally:
+            nova_act_module.recommendation_cache = original_cache
+    return prompts[0]
+
+
+def test_rank_texts_orders_by_similarity():
+    texts = ["board games", "robotics and hardware hacking", "poetry", "hardware store trip"]
+    assert rank_texts("robotics hardware", texts)[:2] == [1, 3]
+    assert rank_texts("robotics hardware", texts, limit=1) == [1]
+    assert rank_texts("nothing matches", texts) == [0, 1, 2, 3]
+
+
+def test_compact_json_fits_the_budget():
+    items = [{"id": i, "description": "x" * 1000} for i in range(50)]
+    encoded = compact_json(items, 500)
+    decoded = json.loads(encoded)
+    assert estimate_tokens(encoded) <= 500
+    assert [item["id"] for item in decoded] == list(range(len(decoded)))
+    assert all(len(item["description"]) <= nova_act_module.MAX_FIELD_CHARS + 3 for item in decoded)
+    # Even a tiny budget keeps the best item
+    assert len(json.loads(compact_json(items, 1))) == 1
+
+
+def test_shortlist_finds_the_relevant_event():
+    events = make_events(500)
+    assert shortlist_events("I love robotics", events, 3)[0]["title"] == "Robotics build night"
+
+
+def test_shortlist_reuses_the_catalog_index():
+    """The event index is built once per repository version, not per request."""
+    builds = []
+
+    class CountingIndex(TextIndex):
+        def __init__(self, texts):
+            builds.append(len(texts))
+            super().__init__(texts)
+
+    saved = (nova_act_module.event_repository, nova_act_module.TextIndex, nova_act_module._event_text_index)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.json")
+        with open(path, "w") as f:
+            json.dump(make_events(50), f)
+        repository = EventRepository(path)
+        nova_act_module.event_repository = repository
+        nova_act_module.TextIndex = CountingIndex
+        nova_act_module._event_text_index = None
+        try:
+            for _ in range(3):
+                assert shortlist_events("robotics", repository.all(), 3)[0]["title"] == "Robotics build night"
+            # A filtered page is ranked from the same index
+            tech = repository.query_page(category="tech")["events"]
+            assert shortlist_events("robotics", tech, 3) == tech
+            assert builds == [51]
+
+            repository.create({"title": "Robotics showcase", "description": "robotics robotics", "date": "2025-11-09"})
+            assert shortlist_events("robotics", repository.all(), 1)[0]["title"] == "Robotics showcase"
+            assert builds == [51, 52]
+
+            # Events that aren't the repository's still get ranked, from a one-off index
+            assert shortlist_events("robotics", make_events(5), 1)[0]["title"] == "Robotics build night"
+            assert builds == [51, 52]
+        finally:
+            nova_act_module.event_repository, nova_act_module.TextIndex, nova_act_module._event_text_index = saved
+
+
+def test_event_prompt_size_is_flat():
+    """The recommendation prompt barely grows from 20 to 2000 events."""
+    def prompt_for(n):
+        return captured_prompt(lambda nova_act: nova_act.get_ai_recommendations("robotics", make_events(n), 5))
+
+    small, large = prompt_for(20), prompt_for(2000)
+    assert "Robotics build night" in large
+    assert len(large) <= len(small) * 1.2
+    assert estimate_tokens(large) < nova_act_module.PROMPT_TOKEN_BUDGET + 1000
+
+
+def test_combined_prompt_size_is_flat():
+    """Thousands of hosts and events still fit the combined prompt's budget."""
+    hosts = [{"id": 10000 + i, "name": f"Host {i}", "dorm_vibe": "quiet " * 50, "interests": "reading",
+              "description": "A room " * 80, "capacity": 1, "available_dates": ["2025-11-08"]} for i in range(3000)]
+    events = make_events(3000)
+    nova_act = NovaAct()
+    prompt = nova_act._combined_prompt("quiet robotics", None, hosts, events, 5, 5, "")
+    assert "Robotics build night" in prompt
+    assert estimate_tokens(prompt) < nova_act_module.PROMPT_TOKEN_BUDGET + 1000
+
+
+if __name__ == "__main__":
+    test_rank_texts_orders_by_similarity()
+    test_compact_json_fits_the_budget()
+    test_shortlist_finds_the_relevant_event()
+    test_shortlist_reuses_the_catalog_index()
+    test_event_prompt_size_is_flat()
+    test_combined_prompt_size_is_flat()
+    print("✅ All prompt budget tests passed!")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests for request coalescing: identical in-flight AI calls share one upstream call.
+Run this with: python test_single_flight.py
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import ai_agent
+import nova_act as nova_act_module
+from cache import SingleFlight
+from llm_cache import LLMResponseCache
+from nova_act import NovaAct
+
+
+def test_identical_calls_share_one_task():
+    """N concurrent callers with one key make one call; other keys and later calls run on their own."""
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*[flights.do("a", lambda: work("a")) for _ in range(10)],
+                                       flights.do("b", lambda: work("b")))
+        assert results == ["a"] * 10 + ["b"]
+        assert flights.stats() == {"in_flight": 0, "started": 2, "coalesced": 9}
+        await flights.do("a", lambda: work("a"))
+        return flights
+
+    asyncio.run(main())
+    assert calls == ["a", "b", "a"]
+
+
+def test_errors_and_cancellation():
+    """Every waiter sees the shared call's error; one waiter giving up doesn't cancel it for the rest."""
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*[flights.do("x", fail) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+
+        impatient = asyncio.ensure_future(flights.do("y", slow))
+        patient = asyncio.ensure_future(flights.do("y", slow))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        assert await patient == "done"
+
+    asyncio.run(main())
+
+
+def test_match_burst_makes_one_agent_call():
+    """A burst of identical /api/match requests runs the matching agent once."""
+    calls = []
+
+    async def run_matching_agent(visitor_query, date_needed):
+        calls.append(visitor_query)
+        await asyncio.sleep(0.05)
+        return json.dumps({"ranked_matches": []})
+
+    async def burst():
+        return await asyncio.gather(*[
+            ai_agent.run_matching_agent_cached("quiet study", "2025-11-08") for _ in range(20)
+        ])
+
+    original = ai_agent.run_matching_agent
+    ai_agent.run_matching_agent = run_matching_agent
+    ai_agent.match_cache.clear()
+    try:
+        results = asyncio.run(burst())
+    finally:
+        ai_agent.run_matching_agent = original
+        ai_agent.match_cache.clear()
+    assert len(calls) == 1
+    assert len(set(results)) == 1
+
+
+def test_recommendation_burst_makes_one_claude_call():
+    """Concurrent identical event recommendations and Dedalus fetches each go upstream once."""
+    claude_calls, fetches = [], []
+    events = [{"id": 1, "title": "Hackathon", "tags": ["tech"]}]
+
+    class FakeText:
+        def __init__(self, text):
+            self.text = text
+
+    class FakeMessage:
+        def __init__(self, text):
+            self.content = [FakeText(text)]
+
+    async def ask_claude(prompt, max_tokens):
+        claude_calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return FakeMessage(json.dumps({"recommendations": [{"event_id": 1}], "summary": "ok"}))
+
+    async def fetch_events(dedalus_url, params):
+        fetches.append(params)
+        await asyncio.sleep(0.05)
+        return events
+
+    def make_nova_act():
+        nova_act = NovaAct()
+        nova_act.claude_api_key, nova_act.claude_model = "test-key", "test-model"
+        nova_act.ask_claude = ask_claude
+        return nova_act
+
+    async def burst():
+        fetched = await asyncio.gather(*[make_nova_act().get_events_from_dedalus(category="tech") for _ in range(10)])
+        recommended = await asyncio.gather(*[
+            make_nova_act().get_ai_recommendations("tech events", events, 5) for _ in range(10)
+        ])
+        return fetched, recommended
+
+    original_cache, original_fetch = nova_act_module.recommendation_cache, NovaAct._fetch_events
+    NovaAct._fetch_events = staticmethod(fetch_events)
+    with tempfile.TemporaryDirectory() as tmp:
+        nova_act_module.recommendation_cache = LLMResponseCache(os.path.join(tmp, "cache.db"))
+        try:
+            fetched, recommended = asyncio.run(burst())
+        finally:
+            nova_act_module.recommendation_cache, NovaAct._fetch_events = original_cache, original_fetch
+
+    assert len(fetches) == 1 and len(claude_calls) == 1
+    assert all(result == events for result in fetched)
+    assert fetched[0] is not fetched[1]
+    assert all(result["recommendations"][0]["event"]["id"] == 1 for result in recommended)
+
+
+def test_reworded_requests_are_not_coalesced():
+    """Requests with the same words in a different order mean different things: each calls Claude."""
+    prompts = []
+    events = [{"id": 1, "title": "Silent disco", "tags": ["party"]}, {"id": 2, "title": "Library night", "tags": ["quiet"]}]
+
+    async def ask_claude(prompt, max_tokens):
+        prompts.append(prompt)
+        await asyncio.sleep(0.05)
+        return None
+
+    nova_act = NovaAct()
+    nova_act.claude_api_key, nova_act.claude_model = "test-key", "test-model"
+    nova_act.ask_claude = ask_claude
+
+    async def burst():
+        return await asyncio.gather(
+            nova_act.get_ai_recommendations("I hate parties, love quiet", events, 5),
+            nova_act.get_ai_recommendations("I love parties, hate quiet", events, 5)
+        )
+
+    original_cache = nova_act_module.recommendation_cache
+    with tempfile.TemporaryDirectory() as tmp:
+        nova_act_module.recommendation_cache = LLMResponseCache(os.path.join(tmp, "cache.db"), similarity=1.01)
+        try:
+            asyncio.run(burst())
+        finally:
+            nova_act_module.recommendation_cache = original_cache
+    assert len(prompts) == 2
+
+
+if __name__ == "__main__":
+    test_identical_calls_share_one_task()
+    test_errors_and_cancellation()
+    test_match_burst_makes_one_agent_call()
+    test_recommendation_burst_makes_one_claude_call()
+    test_reworded_requests_are_not_coalesced()
+    print("✅ All single-flight tests passed!")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the optional SQLite backend (ROOMIE_STORAGE_BACKEND=sqlite).
+Run this with: python test_sqlite_store.py
+"""
+
+import os
+import tempfile
+from sqlite_store import SqliteListingStore, SqliteUserStore
+
+SAMPLE_LISTINGS = [
+    {"id": 101, "name": "Alex", "email": "alex@example.com", "available_dates": ["2025-11-08", "2025-11-09"],
+     "capacity": 1, "reviews": [{"id": 1, "rating": 4}]},
+    {"id": 102, "name": "Jamie", "email": "jamie@example.com", "available_dates": ["2025-11-08", "2025-11-10"],
+     "capacity": 2, "reviews": []},
+]
+
+
+def make_db_path():
+    return os.path.join(tempfile.mkdtemp(), 'roomie.db')
+
+
+def test_listings_migrate_and_query():
+    """listings.json contents are migrated once and served through the indexes."""
+    store = SqliteListingStore(make_db_path(), lambda: SAMPLE_LISTINGS)
+    assert [l["id"] for l in store.all()] == [101, 102]
+    assert store.get(102)["name"] == "Jamie"
+    assert [l["id"] for l in store.get_by_email("alex@example.com")] == [101]
+    assert [l["id"] for l in store.get_available("2025-11-08")] == [101, 102]
+    assert [l["id"] for l in store.get_available("2025-11-08", min_capacity=2)] == [102]
+    assert [l["id"] for l in store.get_available_for_nights(["2025-11-08", "2025-11-09"])] == [101]
+    assert store.rating_summary(101) == {"rating_sum": 4, "review_count": 1, "average_rating": 4.0}
+    assert store.next_id() == 103
+
+
+def test_listing_writes():
+    """Writes keep the date rows and rating aggregates in sync."""
+    path = make_db_path()
+    store = SqliteListingStore(path, lambda: SAMPLE_LISTINGS)
+    version = store.version()
+    created = store.insert({"id": 101, "name": "Sam", "email": "sam@example.com", "available_dates": ["2025-11-10"], "capacity": 1})
+    assert created["id"] == 103  # 101 was taken, so a fresh id is assigned
+    assert store.modify(102, lambda l: l.update({"available_dates": ["2025-11-09"]}))
+    assert [l["id"] for l in store.get_available("2025-11-09")] == [101, 102]
+    assert store.append_review(102, lambda review_id: {"id": review_id, "rating": 5})
+    assert store.rating_summary(102)["average_rating"] == 5.0
+    assert store.delete(101)
+    assert store.version() == version + 4
+    assert not store.delete(101)
+    assert store.version() == version + 4
+    assert store.get_available("2025-11-08") == []
+
+    # A second store on the same file must not migrate again
+    reopened = SqliteListingStore(path, lambda: SAMPLE_LISTINGS)
+    assert [l["id"] for l in reopened.all()] == [102, 103]
+
+
+def test_users():
+    """User records migrate from users.json and support the auth.py operations."""
+    users_json = {"users": {"test@example.com": {"email": "test@example.com", "password_hash": "abc", "name": "Test", "roles": []}}}
+    store = SqliteUserStore(make_db_path(), lambda: users_json)
+    assert store.get("test@example.com")["name"] == "Test"
+    assert store.insert({"email": "new@example.com", "password_hash": "def", "name": "New", "roles": []})
+    assert not store.insert({"email": "new@example.com", "password_hash": "def", "name": "New", "roles": []})
+    assert store.add_role("new@example.com", "host")
+    assert store.add_role("new@example.com", "host")
+    assert store.get("new@example.com")["roles"] == ["host"]
+    assert not store.add_role("missing@example.com", "host")
+    assert list(store.load_all()["users"]) == ["test@example.com", "new@example.com"]
+
+
+if __name__ == "__main__":
+    test_listings_migrate_and_query()
+    test_listing_writes()
+    test_users()
+    print("✅ All SQLite store tests passed!")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared persistence helpers (atomic writes, file lock, group commit).
+Run this with: python test_storage.py
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from listing_store import ListingStore
+from storage import GroupCommitter, atomic_write_json, file_lock
+
+
+def test_atomic_write_replaces_file():
+    """The target is replaced in one step and no temp files are left behind."""
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'data.json')
+    atomic_write_json(path, [{"id": 1}])
+    atomic_write_json(path, [{"id": 2}])
+    with open(path) as f:
+        assert json.load(f) == [{"id": 2}]
+    assert os.listdir(tmp_dir) == ['data.json']
+
+
+def test_file_lock_is_reentrant():
+    """Nested locks on the same path in one thread don't deadlock."""
+    path = os.path.join(tempfile.mkdtemp(), 'data.json')
+    with file_lock(path):
+        with file_lock(path):
+            pass
+
+
+def test_group_commit_coalesces_bursts():
+    """Concurrent commits share flushes instead of each doing their own."""
+    flushes = []
+
+    def slow_flush():
+        flushes.append(1)
+        time.sleep(0.02)
+
+    committer = GroupCommitter(slow_flush)
+    threads = [threading.Thread(target=committer.commit) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"   20 commits -> {len(flushes)} flush(es)")
+    assert 1 <= len(flushes) < 20
+
+
+def test_concurrent_stores_keep_each_others_reviews():
+    """Two stores on one file (like two gunicorn workers) don't lose updates."""
+    path = os.path.join(tempfile.mkdtemp(), 'listings.json')
+    atomic_write_json(path, [{"id": 101, "email": "a@example.com", "available_dates": [], "capacity": 1, "reviews": []}])
+    worker_a = ListingStore(path)
+    worker_b = ListingStore(path)
+    assert worker_a.get(101) and worker_b.get(101)
+
+    def review(review_id):
+        return {"id": review_id, "rating": 5}
+
+    threads = []
+    for store in (worker_a, worker_b) * 5:
+        threads.append(threading.Thread(target=store.append_review, args=(101, review)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    restarted = ListingStore(path)
+    assert len(restarted.get(101)["reviews"]) == 10
+    assert restarted.rating_summary(101)["review_count"] == 10
+
+
+if __name__ == "__main__":
+    test_atomic_write_replaces_file()
+    test_file_lock_is_reentrant()
+    test_group_commit_coalesces_bursts()
+    test_concurrent_stores_keep_each_others_reviews()
+    print("✅ All storage tests passed!")
@@ -1,9 +1,14 @@
 # tools.py
+import base64
 import json
 import os
+import threading
+from bisect import bisect_right
 from datetime import datetime, timedelta
+from listing_store import ListingStore
+from storage import STORAGE_BACKEND, SQLITE_PATH
 
-# --- Mock Database (JSON file approach) ---
+# --- Mock Database (JSON file approach; ROOMIE_STORAGE_BACKEND=sqlite for SQLite) ---
 LISTINGS_FILE = 'listings.json'
 UPLOAD_FOLDER = 'uploads'
 
@@ -13,19 +18,13 @@ def ensure_upload_folder():
         os.makedirs(UPLOAD_FOLDER)
 
 def load_listings() -> list:
-    """Load listings from JSON file."""
-    if os.path.exists(LISTINGS_FILE):
-        try:
-            with open(LISTINGS_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return get_default_listings()
-    return get_default_listings()
+    """Load listings (served from the in-memory store, reloaded when the file changes)."""
+    return _store.all()
 
 def save_listings(listings: list):
     """Save listings to JSON file."""
-    with open(LISTINGS_FILE, 'w') as f:
-        json.dump(listings, f, indent=2)
+    _store.replace_all(listings)
+    _emit_listing_change("reset")
 
 def get_default_listings() -> list:
     """Get default listings data."""
@@ -54,18 +53,51 @@ def get_default_listings() -> list:
         }
     ]
 
+# Single in-process store; loads LISTINGS_FILE once and keeps id/email/date indexes
+if STORAGE_BACKEND == "sqlite":
+    from sqlite_store import SqliteListingStore
+    # One-shot migration reads listings.json (plus its write-ahead log) on first use
+    _store = SqliteListingStore(SQLITE_PATH, lambda: ListingStore(LISTINGS_FILE, get_default_listings).all())
+else:
+    _store = ListingStore(LISTINGS_FILE, get_default_listings)
+
+# Listeners notified after every listing write (e.g. the matcher's search index)
+_listing_listeners = []
+
+def add_listing_listener(listener):
+    """
+    Register `listener(event)` to be called after each listing change.
+    
+    event is {"type": "created" | "updated" | "deleted" | "reviewed" | "reset",
+    "listing_id": int or None, "listing": dict or None, "version": int}, where version
+    is listings_version() right after the write.
+    """
+    _listing_listeners.append(listener)
+
+def remove_listing_listener(listener):
+    """Stop notifying a listener registered with add_listing_listener."""
+    if listener in _listing_listeners:
+        _listing_listeners.remove(listener)
+
+def _emit_listing_change(event_type: str, listing_id: int = None, listing: dict = None):
+    event = {"type": event_type, "listing_id": listing_id, "listing": listing, "version": _store.version()}
+    for listener in list(_listing_listeners):
+        try:
+            listener(event)
+        except Exception as e:
+            print(f"Listing change listener failed: {e}")
+
+def listings_version() -> int:
+    """A counter that changes whenever listings change, in this or another worker."""
+    return _store.version()
+
 def get_listing_by_id(listing_id: int) -> dict:
     """Get a listing by ID."""
-    listings = load_listings()
-    for listing in listings:
-        if listing.get("id") == listing_id:
-            return listing
-    return None
+    return _store.get(listing_id)
 
 def get_listings_by_email(email: str) -> list:
     """Get all listings by host email."""
-    listings = load_listings()
-    return [listing for listing in listings if listing.get("email") == email]
+    return _store.get_by_email(email)
 
 def get_listing_by_email(email: str) -> dict:
     """Get the first listing by host email (for backward compatibility)."""
@@ -74,33 +106,24 @@ def get_listing_by_email(email: str) -> dict:
 
 def update_listing(listing_id: int, updates: dict):
     """Update a listing."""
-    listings = load_listings()
-    for i, listing in enumerate(listings):
-        if listing.get("id") == listing_id:
-            listings[i].update(updates)
-            save_listings(listings)
-            return True
-    return False
+    updated = _store.modify(listing_id, lambda listing: listing.update(updates))
+    if updated:
+        _emit_listing_change("updated", listing_id, _store.get(listing_id))
+    return updated
 
 def add_image_to_listing(listing_id: int, image_path: str):
     """Add an image path to a listing."""
-    listings = load_listings()
-    for listing in listings:
-        if listing.get("id") == listing_id:
-            if "images" not in listing:
-                listing["images"] = []
-            listing["images"].append(image_path)
-            save_listings(listings)
-            return True
-    return False
+    def append_image(listing):
+        listing["images"] = list(listing.get("images", [])) + [image_path]
+    updated = _store.modify(listing_id, append_image)
+    if updated:
+        _emit_listing_change("updated", listing_id, _store.get(listing_id))
+    return updated
 
 def create_listing(email: str, name: str, description: str = "", available_dates: list = None, capacity: int = 1, dorm_vibe: str = "", interests: str = "") -> dict:
     """Create a new listing for a host. Hosts can have multiple listings."""
-    listings = load_listings()
-    
     # Find the next available ID
-    max_id = max([listing.get("id", 0) for listing in listings], default=100)
-    new_id = max_id + 1
+    new_id = _store.next_id()
     
     new_listing = {
         "id": new_id,
@@ -115,89 +138,295 @@ def create_listing(email: str, name: str, description: str = "", available_dates
         "reviews": []
     }
     
-    listings.append(new_listing)
-    save_listings(listings)
-    return new_listing
+    created = _store.insert(new_listing)
+    _emit_listing_change("created", created["id"], created)
+    return created
 
 def update_listing_details(listing_id: int, updates: dict):
     """Update listing details (description, dates, capacity, etc.)."""
-    listings = load_listings()
-    for i, listing in enumerate(listings):
-        if listing.get("id") == listing_id:
-            # Only update allowed fields
-            allowed_fields = ["description", "available_dates", "capacity", "dorm_vibe", "interests"]
-            for key, value in updates.items():
-                if key in allowed_fields or key in ["dorm_vibe", "interests"]:
-                    listings[i][key] = value
-            save_listings(listings)
-            return True
-    return False
+    # Only update allowed fields
+    allowed_fields = ["description", "available_dates", "capacity", "dorm_vibe", "interests"]
+    def apply_updates(listing):
+        for key, value in updates.items():
+            if key in allowed_fields:
+                listing[key] = value
+    updated = _store.modify(listing_id, apply_updates)
+    if updated:
+        _emit_listing_change("updated", listing_id, _store.get(listing_id))
+    return updated
 
 def add_review(listing_id: int, reviewer_name: str, rating: int, comment: str) -> bool:
     """Add a review to a listing."""
     if rating < 1 or rating > 5:
         return False
     
-    listings = load_listings()
-    for listing in listings:
-        if listing.get("id") == listing_id:
-            if "reviews" not in listing:
-                listing["reviews"] = []
-            
-            import datetime
-            review = {
-                "id": len(listing["reviews"]) + 1,
-                "reviewer_name": reviewer_name,
-                "rating": rating,
-                "comment": comment,
-                "date": datetime.datetime.now().isoformat()
-            }
-            
-            listing["reviews"].append(review)
-            save_listings(listings)
-            return True
-    return False
+    def make_review(review_id):
+        return {
+            "id": review_id,
+            "reviewer_name": reviewer_name,
+            "rating": rating,
+            "comment": comment,
+            "date": datetime.now().isoformat()
+        }
+    added = _store.append_review(listing_id, make_review)
+    if added:
+        _emit_listing_change("reviewed", listing_id)
+    return added
+
+def get_rating_summary(listing_id: int) -> dict:
+    """Get rating sum, review count and average for a listing in O(1)."""
+    return _store.rating_summary(listing_id)
+
+def get_rating_summaries(listing_ids: list) -> dict:
+    """Get rating summaries for many listings at once (id -> summary)."""
+    return _store.rating_summaries(listing_ids)
 
 def get_average_rating(listing_id: int) -> float:
     """Calculate average rating for a listing."""
-    listing = get_listing_by_id(listing_id)
-    if not listing or not listing.get("reviews"):
-        return 0.0
-    
-    reviews = listing["reviews"]
-    if len(reviews) == 0:
-        return 0.0
-    
-    total_rating = sum(review.get("rating", 0) for review in reviews)
-    return round(total_rating / len(reviews), 1)
+    return _store.rating_summary(listing_id)["average_rating"]
 
 def delete_listing(listing_id: int) -> bool:
     """Delete a listing by ID."""
-    listings = load_listings()
-    original_length = len(listings)
-    listings = [listing for listing in listings if listing.get("id") != listing_id]
+    deleted = _store.delete(listing_id)
+    if deleted:
+        _emit_listing_change("deleted", listing_id)
+    return deleted
+
+def parse_stay(visitor_date_range: str, check_out: str = None) -> list:
+    """
+    Turn a date or date range into the list of nights the visitor needs.
     
-    if len(listings) < original_length:
-        save_listings(listings)
-        return True
-    return False
+    Accepts '2025-11-08', '2025-11-08 to 2025-11-10' or '2025-11-08/2025-11-10'.
+    The check-out day itself is not a night, so a range covers check_in..check_out-1.
+    Strings that aren't ISO dates are returned as-is so they simply match nothing.
+    """
+    check_in = (visitor_date_range or "").strip()
+    if check_out is None:
+        for separator in (" to ", "/", ".."):
+            if separator in check_in:
+                check_in, check_out = [part.strip() for part in check_in.split(separator, 1)]
+                break
+    try:
+        start = datetime.strptime(check_in, "%Y-%m-%d")
+    except ValueError:
+        return [check_in]
+    if not check_out:
+        return [check_in]
+    try:
+        end = datetime.strptime(check_out.strip(), "%Y-%m-%d")
+    except ValueError:
+        return [check_in]
+    if end <= start:
+        return [check_in]
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((end - start).days)]
+
+def find_hosts_for_stay(check_in: str, check_out: str = None, min_capacity: int = 1) -> list:
+    """Get listings that cover every night from check_in up to (not including) check_out."""
+    return _store.get_available_for_nights(parse_stay(check_in, check_out), min_capacity)
 
 def find_available_hosts(visitor_date_range: str, min_capacity: int = 1) -> str:
     """
     Queries the listings database to find available hosts based on date and capacity.
     
     Args:
-        visitor_date_range: The dates the visitor needs accommodation (e.g., '2025-11-08').
+        visitor_date_range: The dates the visitor needs accommodation (e.g., '2025-11-08',
+            or a stay like '2025-11-08 to 2025-11-10' where every night must be covered).
         min_capacity: The minimum capacity required.
 
     Returns:
         A JSON string containing the list of available hosts and their profiles (interests/vibe).
     """
-    listings = load_listings()
+    available_hosts = find_hosts_for_stay(visitor_date_range, min_capacity=min_capacity)
     
-    available_hosts = [
-        host for host in listings 
-        if visitor_date_range in host.get("available_dates", []) and host.get("capacity", 0) >= min_capacity
-    ]
+    return json.dumps(available_hosts)
+
+# Sort keys supported by query_listings (ties are broken by listing id)
+LISTING_SORT_KEYS = {
+    "id": lambda listing: (listing.get("id") or 0,),
+    "rating": lambda listing: (listing.get("average_rating", 0.0), listing.get("id") or 0),
+    "review_count": lambda listing: (listing.get("review_count", 0), listing.get("id") or 0),
+}
+
+def _encode_cursor(sort: str, descending: bool, key: tuple) -> str:
+    payload = json.dumps([sort, descending, list(key)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor: str, sort: str, descending: bool) -> tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_descending, key = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    # Every sort key is a tuple of numbers of a fixed length: anything else can't be
+    # compared with the index keys
+    if (not isinstance(key, list) or len(key) != len(LISTING_SORT_KEYS[sort]({}))
+            or not all(isinstance(part, (int, float)) and not isinstance(part, bool) for part in key)):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or cursor_descending is not descending:
+        raise ValueError("Cursor does not match the requested sort order")
+    return tuple(key)
+
+def _listing_text(listing: dict) -> str:
+    return " ".join(
+        str(listing.get(field, "") or "") for field in ("name", "description", "dorm_vibe", "interests")
+    ).lower()
+
+class _ListingIndex:
+    """
+    Every listing's filter fields and its position in each sort order, for one
+    listings version. Built once per version, so a query bisects and slices instead
+    of loading and re-sorting the catalog.
+    """
     
-    return json.dumps(available_hosts)
\ No newline at end of file
+    def __init__(self, listings: list):
+        summaries = get_rating_summaries([listing.get("id") for listing in listings])
+        self.capacity = {}
+        self.text = {}
+        self.ratings = {}
+        for listing in listings:
+            listing_id = listing.get("id")
+            listing["average_rating"] = summaries[listing_id]["average_rating"]
+            listing["review_count"] = summaries[listing_id]["review_count"]
+            self.capacity[listing_id] = listing.get("capacity", 0)
+            self.text[listing_id] = _listing_text(listing)
+            self.ratings[listing_id] = (listing["average_rating"], listing["review_count"])
+        # (sort, descending) -> (ascending keys, listing ids in that order); keys are
+        # unique (ties broken by id), so descending is the ascending order reversed
+        self.orders = {}
+        for sort, sort_key in LISTING_SORT_KEYS.items():
+            ordered = sorted(((sort_key(listing), listing.get("id")) for listing in listings), key=lambda pair: pair[0])
+            self.orders[(sort, False)] = ([key for key, _ in ordered], [listing_id for _, listing_id in ordered])
+            ordered.reverse()
+            self.orders[(sort, True)] = (
+                [tuple(-part for part in key) for key, _ in ordered], [listing_id for _, listing_id in ordered]
+            )
+
+# (store, listings version, index) of the last index built
+_listing_index = (None, None, None)
+_listing_index_lock = threading.Lock()
+
+def _get_listing_index() -> _ListingIndex:
+    """The index for the current listings, rebuilt only when they changed."""
+    global _listing_index
+    store, version = _store, _store.version()
+    with _listing_index_lock:
+        cached_store, cached_version, index = _listing_index
+        if cached_store is not store or cached_version != version:
+            index = _ListingIndex(store.all())
+            _listing_index = (store, version, index)
+        return index
+
+def query_listings(date: str = None, check_out: str = None, min_capacity: int = None,
+                   min_rating: float = None, text: str = None, sort: str = "id",
+                   descending: bool = False, cursor: str = None, limit: int = None) -> dict:
+    """
+    Filter, sort and paginate listings, annotated with average_rating and review_count.
+    
+    Date filtering uses the date index (every night from date up to check_out must be
+    free); ratings come from the maintained aggregates. Each sort order is kept
+    presorted per listings version, so pagination is a bisect into it (keyset-based:
+    pass back `next_cursor` to continue after the last listing of the previous page)
+    and only the listings of the returned page are copied.
+    
+    Returns:
+        {"listings": [...], "next_cursor": str or None, "total_count": int}
+    
+    Raises:
+        ValueError: for an unknown sort key or a malformed cursor.
+    """
+    if sort not in LISTING_SORT_KEYS:
+        raise ValueError(f"sort must be one of: {', '.join(sorted(LISTING_SORT_KEYS))}")
+    
+    index = _get_listing_index()
+    
+    # Ids passing every filter; None means all listings
+    allowed = None
+    if date:
+        allowed = {listing.get("id") for listing in find_hosts_for_stay(date, check_out, min_capacity=min_capacity or 0)}
+    elif min_capacity:
+        allowed = {listing_id for listing_id, capacity in index.capacity.items() if capacity >= min_capacity}
+    if min_rating is not None:
+        allowed = {listing_id for listing_id in (index.ratings if allowed is None else allowed)
+                   if index.ratings.get(listing_id, (0.0, 0))[0] >= min_rating}
+    if text:
+        terms = text.lower().split()
+        allowed = {listing_id for listing_id in (index.text if allowed is None else allowed)
+                   if all(term in index.text.get(listing_id, "") for term in terms)}
+    
+    # Sorted ascending on a (negated, for descending) key so one bisect serves both orders
+    keys, ordered_ids = index.orders[(sort, descending)]
+    start = bisect_right(keys, _decode_cursor(cursor, sort, descending)) if cursor else 0
+    if allowed is None:
+        total_count = len(ordered_ids)
+        end = start + limit if limit else total_count
+        positions = range(start, min(end, total_count))
+        has_more = end < total_count
+    else:
+        total_count = len(allowed)
+        positions = []
+        for position in range(start, len(ordered_ids)):
+            if ordered_ids[position] in allowed:
+                if limit and len(positions) == limit:
+                    break
+                positions.append(position)
+        else:
+            position = len(ordered_ids)
+        has_more = position < len(ordered_ids)
+    
+    listings = []
+    for position in positions:
+        listing = _store.get(ordered_ids[position])
+        if listing is None:
+            continue  # Deleted since the index was built
+        listing["average_rating"], listing["review_count"] = index.ratings[ordered_ids[position]]
+        listings.append(listing)
+    next_cursor = _encode_cursor(sort, descending, keys[positions[-1]]) if has_more and positions else None
+    
+    return {
+        "listings": listings,
+        "next_cursor": next_cursor,
+        "total_count": total_count
+    }
+
+def project_listing(listing: dict, fields: list = None) -> dict:
+    """Keep only the requested fields of a listing (id is always kept). No fields means all."""
+    if not fields:
+        return listing
+    return {field: listing[field] for field in ["id"] + [f for f in fields if f != "id"] if field in listing}
+
+def get_listing_reviews(listing_id: int, cursor: str = None, limit: int = 20, descending: bool = False) -> dict:
+    """
+    Page through a listing's reviews ordered by review id (oldest first by default).
+    
+    `cursor` is the `next_cursor` of the previous page (the last review id seen).
+    
+    Returns:
+        {"reviews": [...], "next_cursor": str or None, "total_count": int}, or None if
+        the listing doesn't exist
+    
+    Raises:
+        ValueError: for a malformed cursor.
+    """
+    listing = get_listing_by_id(listing_id)
+    if not listing:
+        return None
+    
+    reviews = sorted(listing.get("reviews", []) or [], key=lambda review: review.get("id") or 0,
+                     reverse=descending)
+    keys = [-(review.get("id") or 0) if descending else (review.get("id") or 0) for review in reviews]
+    
+    start = 0
+    if cursor:
+        try:
+            last_id = int(cursor)
+        except ValueError:
+            raise ValueError("Invalid cursor")
+        start = bisect_right(keys, -last_id if descending else last_id)
+    end = start + limit
+    next_cursor = str(reviews[end - 1].get("id")) if end < len(reviews) else None
+    
+    return {
+        "reviews": reviews[start:end],
+        "next_cursor": next_cursor,
+        "total_count": len(reviews)
+    }